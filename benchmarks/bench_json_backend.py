@@ -0,0 +1,87 @@
+"""Benchmark of the json parser backends on a large array-of-records upload.
+
+Usage:
+    python benchmarks/bench_json_backend.py [--rows N] [--repeat N]
+
+Prints the best time of each backend for loading the file, and of a plain
+json.load for comparison, as json.
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fw_gear_file_validator import json_backend
+
+
+def make_records(n_rows: int, seed: int = 0) -> list:
+    """Makes NACC-like form records."""
+    rng = random.Random(seed)
+    return [
+        {
+            "naccid": f"NACC{rng.randrange(10**6):06d}",
+            "visitnum": rng.randrange(1, 20),
+            "visitdate": f"20{rng.randrange(10, 24)}-0{rng.randrange(1, 10)}-1{rng.randrange(10)}",
+            "birthyr": rng.randrange(1920, 2000),
+            "sex": rng.choice([1, 2]),
+            "educ": rng.randrange(0, 30),
+            "mocatots": rng.choice([None, rng.randrange(0, 31)]),
+            "weight": round(rng.uniform(40, 150), 1),
+            "notes": rng.choice(["", "follow up", "café ☃"]),
+            "drugs": [rng.randrange(10**5) for _ in range(rng.randrange(5))],
+        }
+        for _ in range(n_rows)
+    ]
+
+
+def json_load(path: Path) -> None:
+    """Loads the file the way it was loaded before the backends existed."""
+    with open(path, "r", encoding="UTF-8") as fp:
+        json.load(fp)
+
+
+def best_time(func, repeat: int) -> float:
+    """Returns the best time of a few calls to a function."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "records.json"
+        path.write_text(json.dumps(make_records(args.rows)), encoding="UTF-8")
+        results = {
+            "rows": args.rows,
+            "bytes": path.stat().st_size,
+            "seconds": {
+                "json.load": best_time(lambda: json_load(path), args.repeat),
+                **{
+                    backend: best_time(
+                        lambda backend=backend: json_backend.load_file(path, backend),
+                        args.repeat,
+                    )
+                    for backend in json_backend.BACKENDS
+                },
+            },
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Benchmark suite of the loaders, validators and error packaging.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000,100000,1000000]
+        [--formats csv,json] [--schemas flat,ref] [--error-rates 0.001,0.2]
+        [--engine row|columnar] [--workers N] [--output FILE] [--baseline FILE]
+
+Validates generated NACC-like uploads (see generate.py) for every combination
+of format, schema, size and error rate, each in its own process so its peak
+RSS is its own.  Each case reports the time of each stage:
+
+    compile: building the validator from the schema file
+    load: loading the file; for csv, one pass over the streamed rows
+    validate: validating, net of load and package
+    package: converting errors to the standard format
+             (err.validator_error_to_standard, in this process only)
+
+along with rows/sec of the whole run and the peak RSS.  The results are
+printed, or written to --output, as json.  With --baseline, the results of an
+earlier run, each case also gets its speedup over the same case in it.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import generate
+
+from fw_gear_file_validator import errors as err
+from fw_gear_file_validator.loader import Loader
+from fw_gear_file_validator.validator import initialize_validator
+
+CASE_KEYS = ("format", "schema", "rows", "error_rate", "engine", "workers")
+
+
+class PackageTimer:
+    """Accumulates the time spent in err.validator_error_to_standard."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.original = err.validator_error_to_standard
+
+    def __enter__(self) -> "PackageTimer":
+        def timed(schema_error):
+            start = time.perf_counter()
+            try:
+                return self.original(schema_error)
+            finally:
+                self.seconds += time.perf_counter() - start
+
+        err.validator_error_to_standard = timed
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        err.validator_error_to_standard = self.original
+
+
+def run_case(case: dict, work_dir: Path) -> dict:
+    """Validates one generated upload, returning the measurements."""
+    file_format = case["format"]
+    path = work_dir / f"upload.{file_format}"
+    generate.WRITERS[file_format](path, case["rows"], case["error_rate"])
+    top = "object" if file_format == "csv" else "array"
+    schema_path = work_dir / "schema.json"
+    schema_path.write_text(json.dumps(generate.make_schema(case["schema"], top)))
+    loader = Loader.factory(file_format, config={})
+
+    start = time.perf_counter()
+    validator = initialize_validator(
+        file_format,
+        schema_path,
+        config={"n_workers": case["workers"], "engine": case["engine"]},
+    )
+    compile_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    content, _ = loader.load_object(path)
+    if file_format == "csv":
+        for _ in content:
+            pass
+        content, _ = loader.load_object(path)
+    load_seconds = time.perf_counter() - start
+
+    with PackageTimer() as package:
+        start = time.perf_counter()
+        valid, errors = validator.validate(content)
+        run_seconds = time.perf_counter() - start
+
+    if file_format == "csv":
+        # The rows were streamed from the file again while being validated.
+        validate_seconds = run_seconds - load_seconds - package.seconds
+        total_seconds = compile_seconds + run_seconds
+    else:
+        validate_seconds = run_seconds - package.seconds
+        total_seconds = compile_seconds + load_seconds + run_seconds
+
+    return {
+        **case,
+        "bytes": path.stat().st_size,
+        "valid": valid,
+        "errors": len(errors),
+        "seconds": {
+            "compile": compile_seconds,
+            "load": load_seconds,
+            "validate": max(validate_seconds, 0.0),
+            "package": package.seconds,
+            "total": total_seconds,
+        },
+        "rows_per_sec": case["rows"] / total_seconds,
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (1024**2 if sys.platform == "darwin" else 1024),
+    }
+
+
+def spawn_case(case: dict) -> dict:
+    """Runs a case in a new process."""
+    result = subprocess.run(
+        [sys.executable, __file__, "--case", json.dumps(case)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def git_commit() -> str:
+    """Returns the commit of the working tree, if it's a git repository."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def add_speedups(results: list, baseline_path: Path) -> None:
+    """Adds the speedup of each case over the same case in an earlier run."""
+    baseline = json.loads(baseline_path.read_text())
+    previous = {
+        tuple(case[key] for key in CASE_KEYS): case for case in baseline["cases"]
+    }
+    for case in results:
+        before = previous.get(tuple(case[key] for key in CASE_KEYS))
+        if before:
+            case["speedup"] = case["rows_per_sec"] / before["rows_per_sec"]
+
+
+def csv_list(convert):
+    """Returns an argparse type for comma separated values."""
+    return lambda value: [convert(item) for item in value.split(",")]
+
+
+def main() -> None:
+    """Runs the benchmark suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=csv_list(int), default=[1000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--formats", type=csv_list(str), default=["csv", "json"])
+    parser.add_argument("--schemas", type=csv_list(str), default=["flat", "ref"])
+    parser.add_argument("--error-rates", type=csv_list(float), default=[0.001, 0.2])
+    parser.add_argument("--engine", choices=["row", "columnar"], default="row")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print(json.dumps(run_case(json.loads(args.case), Path(tmp_dir))))
+        return
+
+    cases = []
+    for file_format, schema, rows, error_rate in itertools.product(
+        args.formats, args.schemas, args.sizes, args.error_rates
+    ):
+        case = {
+            "format": file_format,
+            "schema": schema,
+            "rows": rows,
+            "error_rate": error_rate,
+            "engine": args.engine,
+            "workers": args.workers,
+        }
+        print(f"Running {case}", file=sys.stderr)
+        cases.append(spawn_case(case))
+    if args.baseline:
+        add_speedups(cases, args.baseline)
+
+    results = {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": cases,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
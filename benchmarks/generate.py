@@ -0,0 +1,165 @@
+"""Generators of synthetic NACC-like uploads and their validation schemas.
+
+Usage:
+    python benchmarks/generate.py csv|json ROWS ERROR_RATE OUTPUT [--schema flat|ref]
+
+Each record is a form visit with a dozen typed fields.  With probability
+error_rate a record gets one field set to a value the schema rejects, so the
+number of errors in a file is about rows * error_rate.  The same seed always
+gives the same file.
+"""
+
+import argparse
+import copy
+import csv
+import json
+import random
+import typing as t
+from pathlib import Path
+
+# The schema of each field.  Every schema has a "type", so csv values can be cast.
+FIELDS = {
+    "naccid": {"type": "string", "pattern": "^NACC[0-9]{6}$"},
+    "visitnum": {"type": "integer", "minimum": 1, "maximum": 20},
+    "visitdate": {"type": "string", "pattern": "^20[0-9]{2}-[01][0-9]-[0-3][0-9]$"},
+    "birthyr": {"type": "integer", "minimum": 1900, "maximum": 2010},
+    "sex": {"type": "integer", "enum": [1, 2]},
+    "race": {"type": "integer", "enum": [1, 2, 3, 4, 5, 6, 50, 99]},
+    "educ": {"type": "integer", "minimum": 0, "maximum": 36},
+    "mocatots": {"type": "integer", "minimum": 0, "maximum": 30},
+    "weight": {"type": "number", "minimum": 40, "maximum": 200},
+    "height": {"type": "number", "minimum": 36, "maximum": 88},
+    "memory": {"type": "integer", "enum": [0, 1, 2, 3]},
+    "notes": {"type": "string", "maxLength": 40},
+}
+REQUIRED = ["naccid", "visitnum", "visitdate", "birthyr", "sex"]
+
+# A value the schema of each field rejects.
+INVALID = {
+    "naccid": "NAC12",
+    "visitnum": 0,
+    "visitdate": "12/31/2020",
+    "birthyr": 1850,
+    "sex": 3,
+    "race": 7,
+    "educ": 40,
+    "mocatots": 31,
+    "weight": 12.5,
+    "height": 100.0,
+    "memory": 4,
+    "notes": "x" * 50,
+}
+
+
+def make_schema(kind: str, top: str = "object") -> dict:
+    """Returns the schema of a record.
+
+    Args:
+        kind: "flat" for inline field schemas, "ref" for field schemas in
+            definitions referenced with $ref, with the required fields and a
+            cross-field rule in an allOf
+        top: "object" for the schema of one record (a csv row), "array" for
+            the schema of a json array of records
+    """
+    if kind == "flat":
+        record = {
+            "type": "object",
+            "required": REQUIRED,
+            "properties": copy.deepcopy(FIELDS),
+        }
+        definitions = {}
+    elif kind == "ref":
+        definitions = copy.deepcopy(FIELDS)
+        record = {
+            "type": "object",
+            "properties": {name: {"$ref": f"#/definitions/{name}"} for name in FIELDS},
+            "allOf": [
+                {"required": REQUIRED},
+                {
+                    "if": {"properties": {"visitnum": {"const": 1}}},
+                    "then": {"required": ["race", "educ"]},
+                },
+            ],
+        }
+    else:
+        raise ValueError(f"Unknown schema kind {kind}")
+
+    if top == "array":
+        definitions["record"] = record
+        schema = {"type": "array", "items": {"$ref": "#/definitions/record"}}
+    else:
+        schema = record
+    return {
+        "$schema": "http://json-schema.org/draft-07/schema",
+        **schema,
+        "definitions": definitions,
+    }
+
+
+def make_records(
+    n_rows: int, error_rate: float, seed: int = 0
+) -> t.Iterator[t.Dict[str, t.Any]]:
+    """Yields NACC-like form records, with one invalid field in about error_rate of them."""
+    rng = random.Random(seed)
+    for _ in range(n_rows):
+        record = {
+            "naccid": f"NACC{rng.randrange(10**6):06d}",
+            "visitnum": rng.randrange(1, 21),
+            "visitdate": f"20{rng.randrange(10, 25)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+            "birthyr": rng.randrange(1920, 2000),
+            "sex": rng.choice([1, 2]),
+            "race": rng.choice([1, 2, 3, 4, 5, 6, 50, 99]),
+            "educ": rng.randrange(0, 37),
+            "mocatots": rng.choice([None, rng.randrange(0, 31)]),
+            "weight": round(rng.uniform(40, 200), 1),
+            "height": round(rng.uniform(36, 88), 1),
+            "memory": rng.randrange(0, 4),
+            "notes": rng.choice(["", "follow up", "café ☃", "phone visit"]),
+        }
+        if rng.random() < error_rate:
+            field = rng.choice(list(FIELDS))
+            record[field] = INVALID[field]
+        yield record
+
+
+def write_csv(path: Path, n_rows: int, error_rate: float, seed: int = 0) -> None:
+    """Writes a csv upload.  Missing values are written as empty cells."""
+    with open(path, "w", newline="", encoding="UTF-8") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(FIELDS)
+        for record in make_records(n_rows, error_rate, seed):
+            writer.writerow("" if value is None else value for value in record.values())
+
+
+def write_json(path: Path, n_rows: int, error_rate: float, seed: int = 0) -> None:
+    """Writes a json upload, an array of records.  Missing values are left out."""
+    with open(path, "w", encoding="UTF-8") as fp:
+        fp.write("[")
+        for index, record in enumerate(make_records(n_rows, error_rate, seed)):
+            record = {key: value for key, value in record.items() if value is not None}
+            fp.write(("," if index else "") + "\n" + json.dumps(record))
+        fp.write("\n]\n")
+
+
+WRITERS = {"csv": write_csv, "json": write_json}
+
+
+def main() -> None:
+    """Writes an upload and its schema next to it."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("format", choices=list(WRITERS))
+    parser.add_argument("rows", type=int)
+    parser.add_argument("error_rate", type=float)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--schema", choices=["flat", "ref"], default="flat")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    WRITERS[args.format](args.output, args.rows, args.error_rate, args.seed)
+    top = "object" if args.format == "csv" else "array"
+    schema_path = args.output.with_name(args.output.stem + ".schema.json")
+    schema_path.write_text(json.dumps(make_schema(args.schema, top), indent=2))
+
+
+if __name__ == "__main__":
+    main()
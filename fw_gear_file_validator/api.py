@@ -0,0 +1,271 @@
+"""api.py.
+
+Validates local files, without a gear context or a flywheel client.
+
+This is what the command line interface (cli.py) runs, and it can be used
+from Python as well, e.g. to check files before uploading them:
+
+    from fw_gear_file_validator import api
+
+    for result in api.validate_files("schema.json", ["uploads/**/*.csv"]):
+        print(result["path"], result["state"])
+
+Files can be validated in parallel, in a pool of processes that each load and
+compile the schema once.
+"""
+
+import csv
+import glob
+import logging
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from fw_gear_file_validator import errors as err
+from fw_gear_file_validator import parser, validator
+from fw_gear_file_validator.cache import SchemaCache
+from fw_gear_file_validator.loader import Loader
+from fw_gear_file_validator.report import ErrorReport, report_filename
+
+log = logging.getLogger(__name__)
+
+# The validator options of a gear run with the default config.
+DEFAULT_VALIDATOR_CONFIG = {
+    "n_workers": 1,
+    "engine": "row",
+    "error_limit": 0,
+    "aggregate_errors": False,
+    "fail_fast": False,
+}
+
+# What stops a file from being validated: it can't be read or parsed, or its
+# type isn't supported.  Other exceptions are bugs, and propagate.
+FILE_ERRORS = (OSError, TypeError, ValueError, csv.Error, err.FileFormatError)
+
+# The LocalValidator of a worker process, built once by _init_worker.
+_worker_validator = None
+
+
+def expand_paths(
+    patterns: t.Iterable[t.Union[Path, str]],
+    exclude: t.Iterable[t.Union[Path, str]] = (),
+) -> t.List[Path]:
+    """Expands glob patterns and directories into the files they hold.
+
+    Patterns are expanded recursively ("**" matches any number of
+    directories), and so are directories, to the json and csv files below
+    them.  Other paths are kept as they are, even if they don't exist, so
+    that they are reported.  A file matched more than once is only returned
+    once.
+
+    Files in exclude (e.g. the schema, when it is kept next to the files it
+    validates) are left out of the expanded patterns and directories, but
+    kept if they are given as a path.
+    """
+    excluded = {Path(path).resolve() for path in exclude}
+
+    def expanded(matches: t.Iterable[Path]) -> t.Iterator[t.Tuple[Path, None]]:
+        return ((path, None) for path in matches if path.resolve() not in excluded)
+
+    paths = {}
+    for pattern in map(str, patterns):
+        if any(char in pattern for char in "*?["):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                log.warning("No files match %s", pattern)
+            paths.update(expanded(map(Path, matches)))
+        elif Path(pattern).is_dir():
+            paths.update(
+                expanded(
+                    path
+                    for path in sorted(Path(pattern).rglob("*"))
+                    if path.suffix in parser.SUPPORTED_FILE_EXTENSIONS
+                    and path.is_file()
+                )
+            )
+        else:
+            paths[Path(pattern)] = None
+    return [path for path in paths if not path.is_dir()]
+
+
+def get_file_type(file_path: Path) -> str:
+    """Returns the loader type of a local file, from its extension."""
+    ext = parser.get_ext(file_path)
+    parser.validate_filetype(ext, None)
+    return parser.identify_file_type(ext)
+
+
+def local_report_name(file_path: Path) -> str:
+    """Returns the name of the error report of a local file.
+
+    The name holds the path of the file relative to the working directory, so
+    the reports of files with the same name in different directories are kept
+    apart.
+    """
+    file_path = file_path.resolve()
+    try:
+        parts = file_path.relative_to(Path.cwd()).parts
+    except ValueError:
+        parts = file_path.relative_to(file_path.anchor).parts
+    return report_filename("__".join(parts))
+
+
+class LocalValidator:
+    """Validates local files against one schema, reusing the loaders and validators.
+
+    Attributes:
+        schema_file_path: the path of the validation schema
+        validator_config: the validator options, as returned by
+            parser.parse_validator_config
+        loader_config: the loader options (e.g. "stream_json")
+        report_dir: if given, the errors of each file are written to an error
+            report in this directory rather than returned
+        cache: the schema cache
+    """
+
+    def __init__(
+        self,
+        schema_file_path: t.Union[Path, str],
+        validator_config: t.Optional[dict] = None,
+        loader_config: t.Optional[dict] = None,
+        report_dir: t.Union[Path, str, None] = None,
+        cache: SchemaCache = None,
+    ):
+        """Initializes a LocalValidator."""
+        self.schema_file_path = Path(schema_file_path)
+        self.validator_config = {**DEFAULT_VALIDATOR_CONFIG, **(validator_config or {})}
+        self.loader_config = loader_config or {}
+        self.report_dir = Path(report_dir) if report_dir is not None else None
+        self.cache = cache
+        self._loaders = {}
+        self._validators = {}
+
+    def get_validator(
+        self, loader_type: str
+    ) -> t.Union[validator.JsonValidator, validator.CsvValidator]:
+        """Returns the validator for a loader type, building it on first use."""
+        if loader_type not in self._validators:
+            self._validators[loader_type] = validator.initialize_validator(
+                loader_type,
+                self.schema_file_path,
+                config=self.validator_config,
+                cache=self.cache,
+            )
+        return self._validators[loader_type]
+
+    def get_loader(self, loader_type: str) -> Loader:
+        """Returns the loader for a loader type, building it on first use."""
+        if loader_type not in self._loaders:
+            self._loaders[loader_type] = Loader.factory(
+                loader_type, config=self.loader_config
+            )
+        return self._loaders[loader_type]
+
+    def validate_file(self, file_path: t.Union[Path, str]) -> dict:
+        """Validates a local file.
+
+        Problems that stop a file from being validated (e.g. an unsupported
+        file type) are logged and reported in its result.
+
+        Returns:
+            the file's result: its path, its state ("PASS", "FAIL" or "ERROR")
+            and its number of errors, with either its errors or the summary of
+            its error report
+
+        """
+        file_path = Path(file_path)
+        result = {"path": str(file_path)}
+        report = None
+        try:
+            loader_type = get_file_type(file_path)
+            d, errors = self.get_loader(loader_type).load_object(file_path)
+            if self.report_dir is not None:
+                report = ErrorReport(
+                    self.report_dir / local_report_name(file_path)
+                ).open()
+            if errors:
+                valid = False
+            else:
+                valid, errors = self.get_validator(loader_type).validate(
+                    d,
+                    fail_fast=self.validator_config["fail_fast"],
+                    report=report,
+                )
+
+            if report is not None:
+                with report:
+                    report.write_all(errors)
+                summary = report.summary()
+                result.update(n_errors=report.count, error_report=summary)
+            else:
+                errors = [dict(error) for error in errors]
+                result.update(n_errors=len(errors), errors=errors)
+            result["state"] = "PASS" if valid else "FAIL"
+        except FILE_ERRORS as e:
+            log.warning("Could not validate file %s: %s", file_path, e)
+            result.update(state="ERROR", message=str(e))
+        finally:
+            if report is not None:
+                report.close()
+        return result
+
+
+def _init_worker(local_validator: LocalValidator) -> None:
+    """Sets the LocalValidator of a worker process."""
+    global _worker_validator
+    _worker_validator = local_validator
+
+
+def _validate_in_worker(file_path: Path) -> dict:
+    """Validates a file in a worker process."""
+    return _worker_validator.validate_file(file_path)
+
+
+def validate_files(
+    schema_file_path: t.Union[Path, str],
+    paths: t.Iterable[t.Union[Path, str]],
+    validator_config: t.Optional[dict] = None,
+    loader_config: t.Optional[dict] = None,
+    report_dir: t.Union[Path, str, None] = None,
+    n_jobs: int = 1,
+    cache: SchemaCache = None,
+) -> t.Iterator[dict]:
+    """Validates local files against a schema.
+
+    Args:
+        schema_file_path: the path of the validation schema
+        paths: the files to validate, or glob patterns or directories holding
+            them.  The schema is left out of the files they hold.
+        validator_config: the validator options, see DEFAULT_VALIDATOR_CONFIG
+        loader_config: the loader options (e.g. "stream_json")
+        report_dir: if given, the errors of each file are written to an error
+            report in this directory rather than returned
+        n_jobs: the number of files validated at a time, each in its own process
+        cache: the schema cache
+
+    Yields:
+        dict: the result of each file, as returned by
+            LocalValidator.validate_file, in the order of the paths
+
+    """
+    file_paths = expand_paths(paths, exclude=[schema_file_path])
+    if report_dir is not None:
+        Path(report_dir).mkdir(parents=True, exist_ok=True)
+    local_validator = LocalValidator(
+        schema_file_path,
+        validator_config=validator_config,
+        loader_config=loader_config,
+        report_dir=report_dir,
+        cache=cache,
+    )
+    if n_jobs <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield local_validator.validate_file(file_path)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(n_jobs, len(file_paths)),
+        initializer=_init_worker,
+        initargs=(local_validator,),
+    ) as pool:
+        yield from pool.map(_validate_in_worker, file_paths)
@@ -0,0 +1,532 @@
+"""batch.py.
+
+Validates many files in one run.
+
+The validation schema is loaded and compiled once, and the files are then
+validated one at a time, each getting its own QC result and tags.  A summary
+of the run is written to the gear's output directory.
+
+With more than one batch worker, the files are validated in a pool of
+processes, while others are downloaded and have their results saved (see
+scheduler.py).
+"""
+
+import csv
+import fnmatch
+import functools
+import json
+import logging
+import shutil
+import typing as t
+from pathlib import Path
+from types import SimpleNamespace
+
+import flywheel
+from flywheel_gear_toolkit import GearToolkitContext
+
+from fw_gear_file_validator import errors as err
+from fw_gear_file_validator import parser, validator
+from fw_gear_file_validator.cache import ContainerCache, SchemaCache
+from fw_gear_file_validator.incremental import RowIndexStore
+from fw_gear_file_validator.loader import Loader
+from fw_gear_file_validator.metadata import MetadataWriter
+from fw_gear_file_validator.report import ErrorReport, open_report, report_filename
+from fw_gear_file_validator.scheduler import Scheduler
+from fw_gear_file_validator.utils import FwReference, add_tags_metadata, get_loader_type
+
+log = logging.getLogger(__name__)
+
+SUMMARY_FILENAME = "validation_summary.json"
+# What stops a file validated by a worker process from being validated: it
+# can't be downloaded, read or parsed, or its type isn't supported.  The file
+# gets an ERROR result; other exceptions stop the run.
+FILE_ERRORS = (
+    flywheel.ApiException,
+    OSError,
+    TypeError,
+    ValueError,
+    csv.Error,
+    err.FileFormatError,
+)
+
+# Container type: the finder of its child containers.
+CHILD_CONTAINERS = {
+    "group": "projects",
+    "project": "subjects",
+    "subject": "sessions",
+    "session": "acquisitions",
+}
+
+# The BatchValidator of a worker process, built once by _init_worker.
+_worker_validator = None
+
+
+def find_files(
+    container: t.Any,
+    files_tag: t.Optional[str] = None,
+    name_filter: t.Optional[str] = None,
+    container_cache: ContainerCache = None,
+) -> t.Iterator[flywheel.FileEntry]:
+    """Finds the files in a container and the containers below it.
+
+    Args:
+        container: the flywheel container to search
+        files_tag: if given, only files with this tag are returned
+        name_filter: if given, only files whose name matches this glob pattern
+            (e.g. "*.csv") are returned
+        container_cache: if given, the cached copies of the containers searched
+            are dropped if they have been modified since they were cached
+
+    Yields:
+        flywheel.FileEntry: the matching files
+
+    """
+    if container_cache is not None:
+        container_cache.observe(container.container_type, container)
+    for file_entry in getattr(container, "files", None) or []:
+        if files_tag and files_tag not in (file_entry.tags or []):
+            continue
+        if name_filter and not fnmatch.fnmatch(file_entry.name, name_filter):
+            continue
+        yield file_entry
+
+    children = CHILD_CONTAINERS.get(container.container_type)
+    if children:
+        for child in getattr(container, children).iter():
+            yield from find_files(child, files_tag, name_filter, container_cache)
+
+
+def init_file_reference(
+    client: flywheel.Client,
+    file_entry: flywheel.FileEntry,
+    content: str,
+    work_dir: Path,
+    container_cache: ContainerCache = None,
+) -> FwReference:
+    """Makes a FwReference to a file, downloading it if its content is validated.
+
+    Args:
+        client: a flywheel client
+        file_entry: the file
+        content: "file" or "flywheel", the validation level
+        work_dir: the directory to download the file to
+        container_cache: the cache for the file's parent containers
+
+    Returns:
+        FwReference
+
+    """
+    file_input = {
+        "object": {"file_id": file_entry.file_id, "mimetype": file_entry.mimetype},
+        "location": {"name": file_entry.name},
+    }
+    ext, mime = parser.get_filetype_data(file_input)
+    if content == "file":
+        parser.validate_filetype(ext, mime)
+        file_path = work_dir / file_entry.file_id / file_entry.name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_entry.download(str(file_path))
+        file_input["location"]["path"] = str(file_path)
+
+    return FwReference(
+        input_object=file_input,
+        id=file_entry.file_id,
+        type="file",
+        name=file_entry.name,
+        file_type=parser.identify_file_type(ext, mime),
+        _client=client,
+        parents=dict(file_entry.parents),
+        contents=content,
+        container_cache=container_cache,
+    )
+
+
+class BatchValidator:
+    """Validates files against one schema, reusing the loaders and validators.
+
+    Attributes:
+        context: the gear toolkit context
+        config: the batch options, as returned by parser.parse_batch_config
+        validator_config: the validator options, as returned by
+            parser.parse_validator_config
+        cache: the schema cache
+        container_cache: the cache of parent containers, shared by the files
+        row_store: where the row indexes of incremental validation are kept,
+            None if FW_FILE_VALIDATOR_ROW_INDEX_DIR isn't set
+        results: the summary of each validated file
+        workers: the throughput of each worker process, when the files are
+            validated in a pool of processes
+    """
+
+    def __init__(
+        self,
+        context: GearToolkitContext,
+        config: dict,
+        validator_config: t.Optional[dict] = None,
+        cache: SchemaCache = None,
+        container_cache: ContainerCache = None,
+    ):
+        """Initializes a BatchValidator."""
+        self.context = context
+        self.config = config
+        self.validator_config = validator_config or {}
+        self.cache = cache
+        self.container_cache = (
+            container_cache if container_cache is not None else ContainerCache()
+        )
+        self.row_store = RowIndexStore.default()
+        self.results = []
+        self.workers = []
+        self._loaders = {}
+        self._validators = {}
+
+    def get_validator(
+        self, loader_type: str
+    ) -> t.Union[validator.JsonValidator, validator.CsvValidator]:
+        """Returns the validator for a loader type, building it on first use."""
+        if loader_type not in self._validators:
+            self._validators[loader_type] = validator.initialize_validator(
+                loader_type,
+                self.config["schema_file_path"],
+                config=self.validator_config,
+                cache=self.cache,
+            )
+        return self._validators[loader_type]
+
+    def get_loader(self, loader_type: str) -> Loader:
+        """Returns the loader for a loader type, building it on first use."""
+        if loader_type not in self._loaders:
+            self._loaders[loader_type] = Loader.factory(
+                loader_type, config=self.config["loader_config"]
+            )
+        return self._loaders[loader_type]
+
+    def validate_content(
+        self,
+        fw_ref: FwReference,
+        loader_type: str,
+        content: t.Any,
+        report: ErrorReport = None,
+    ) -> t.Tuple[bool, t.List[t.Dict]]:
+        """Validates the loaded content of a file, incrementally if there is a row store.
+
+        With a report, the errors are written to it rather than returned.
+        """
+        file_validator = self.get_validator(loader_type)
+        options = {"fail_fast": self.validator_config.get("fail_fast", False)}
+        if report is not None:
+            options["report"] = report
+        if self.row_store is not None and loader_type == "csv":
+            options["row_index"] = self.row_store.open(fw_ref, file_validator)
+        valid, errors = file_validator.validate(content, **options)
+        if "row_index" in options:
+            self.row_store.save(options["row_index"])
+        return valid, errors
+
+    def validate_file(self, file_entry: flywheel.FileEntry) -> dict:
+        """Validates a file and saves its QC result and tags.
+
+        Problems that stop a file from being validated (e.g. an unsupported
+        file type) are logged and reported in its result, rather than ending
+        the batch.
+
+        Returns:
+            the file's result, for the summary
+
+        """
+        result = {"file_id": file_entry.file_id, "name": file_entry.name}
+        work_dir = Path(self.context.work_dir)
+        report = None
+        try:
+            fw_ref = init_file_reference(
+                self.context.client,
+                file_entry,
+                self.config["validation_level"],
+                work_dir,
+                container_cache=self.container_cache,
+            )
+            loader_type = get_loader_type(fw_ref)
+            d, errors = self.get_loader(loader_type).load_object(fw_ref.loc)
+            if self.validator_config.get("error_report"):
+                report = open_report(
+                    Path(self.context.output_dir)
+                    / report_filename(fw_ref.name, file_entry.file_id),
+                    fw_ref,
+                )
+            if errors:
+                valid = False
+            else:
+                valid, errors = self.validate_content(
+                    fw_ref, loader_type, d, report=report
+                )
+            result.update(
+                self.save_result(file_entry, fw_ref, valid, errors, report=report)
+            )
+        except Exception as e:
+            log.exception("Could not validate file %s", file_entry.name)
+            result.update(state="ERROR", message=str(e))
+        finally:
+            if report is not None:
+                report.close()
+            shutil.rmtree(work_dir / file_entry.file_id, ignore_errors=True)
+        self.results.append(result)
+        return result
+
+    def save_result(
+        self,
+        file_entry: "flywheel.FileEntry",
+        fw_ref: FwReference,
+        valid: bool,
+        errors: t.List[t.Dict],
+        report: ErrorReport = None,
+        error_report: t.Optional[dict] = None,
+    ) -> dict:
+        """Saves the QC result and tags of a validated file.
+
+        Args:
+            file_entry: the file
+            fw_ref: the FwReference of the file
+            valid: whether the file is valid
+            errors: the errors of the file, or those left to write to its report
+            report: the open error report of the file, if any
+            error_report: the summary of the file's error report, if it was
+                already written (e.g. by a worker process)
+
+        Returns:
+            the file's state and number of errors, for its result
+
+        """
+        if report is not None:
+            with report:
+                report.write_all(errors)
+            errors, error_report = [], report.summary()
+        elif error_report is None:
+            errors = err.add_flywheel_location_to_errors(fw_ref, errors)
+        # The QC result and tags are written together.
+        writer = MetadataWriter(self.context, file_entry)
+        err.save_errors_metadata(
+            errors,
+            fw_ref,
+            self.context,
+            file_entry=file_entry,
+            error_report=error_report,
+            writer=writer,
+        )
+        add_tags_metadata(
+            self.context,
+            fw_ref,
+            valid,
+            self.config["tag"],
+            file_entry=file_entry,
+            writer=writer,
+        )
+        writer.flush()
+        return {
+            "state": "PASS" if valid else "FAIL",
+            "n_errors": len(errors)
+            if error_report is None
+            else error_report["n_errors"],
+        }
+
+    def prepare_file(
+        self, file_entry: "flywheel.FileEntry"
+    ) -> t.Tuple[FwReference, dict]:
+        """Downloads a file, or loads its flywheel object, for a worker to validate it.
+
+        Returns:
+            the FwReference of the file, and the task validate_task runs
+
+        """
+        fw_ref = init_file_reference(
+            self.context.client,
+            file_entry,
+            self.config["validation_level"],
+            Path(self.context.work_dir),
+            container_cache=self.container_cache,
+        )
+        loader_type = get_loader_type(fw_ref)
+        task = {
+            "loader_type": loader_type,
+            # All the row index of incremental validation needs of the file.
+            "file_ref": SimpleNamespace(
+                parent_type=fw_ref.parent_type,
+                parent_id=fw_ref.parent_id,
+                name=fw_ref.name,
+            ),
+            "report": None,
+        }
+        if fw_ref.contents == "file":
+            task["path"] = fw_ref.loc
+            if self.validator_config.get("error_report"):
+                # Workers can't look the file up, so its location is resolved here.
+                task["report"] = {
+                    "path": Path(self.context.output_dir)
+                    / report_filename(fw_ref.name, file_entry.file_id),
+                    "location": err.file_location(fw_ref),
+                }
+        else:
+            # Loading flywheel objects takes API calls, so they are loaded here.
+            task["content"], task["errors"] = self.get_loader(loader_type).load_object(
+                fw_ref.loc
+            )
+        return fw_ref, task
+
+    def validate_task(
+        self, task: dict
+    ) -> t.Tuple[bool, t.List[t.Dict], t.Union[dict, None]]:
+        """Loads and validates a file, as prepared by prepare_file, in a worker process.
+
+        Returns:
+            whether the file is valid, its errors, and the summary of its error
+            report if the errors were written to one rather than returned
+
+        """
+        loader_type = task["loader_type"]
+        if "path" in task:
+            d, errors = self.get_loader(loader_type).load_object(task["path"])
+        else:
+            d, errors = task["content"], task["errors"]
+        report = None
+        if task["report"] is not None:
+            report = ErrorReport(
+                task["report"]["path"],
+                prepare=functools.partial(err.set_location, task["report"]["location"]),
+            ).open()
+        try:
+            if errors:
+                valid = False
+            else:
+                valid, errors = self.validate_content(
+                    task["file_ref"], loader_type, d, report=report
+                )
+            if report is None:
+                return valid, errors, None
+            with report:
+                report.write_all(errors)
+            return valid, [], report.summary()
+        finally:
+            if report is not None:
+                report.close()
+
+    def finish_file(
+        self,
+        file_entry: "flywheel.FileEntry",
+        fw_ref: t.Union[FwReference, None],
+        outcome: t.Union[tuple, Exception],
+    ) -> dict:
+        """Saves the result of a file validated by a worker process.
+
+        Args:
+            file_entry: the file
+            fw_ref: the FwReference of the file, None if it couldn't be prepared
+            outcome: what validate_task returned, or the exception raised
+                while preparing or validating the file
+
+        Returns:
+            the file's result, for the summary
+
+        """
+        result = {"file_id": file_entry.file_id, "name": file_entry.name}
+        report = None
+        try:
+            if isinstance(outcome, Exception):
+                raise outcome
+            valid, errors, error_report = outcome
+            if error_report is None and self.validator_config.get("error_report"):
+                report = open_report(
+                    Path(self.context.output_dir)
+                    / report_filename(fw_ref.name, file_entry.file_id),
+                    fw_ref,
+                )
+            result.update(
+                self.save_result(
+                    file_entry,
+                    fw_ref,
+                    valid,
+                    errors,
+                    report=report,
+                    error_report=error_report,
+                )
+            )
+        except Exception as e:
+            log.exception("Could not validate file %s", file_entry.name)
+            result.update(state="ERROR", message=str(e))
+        finally:
+            if report is not None:
+                report.close()
+            shutil.rmtree(
+                Path(self.context.work_dir) / file_entry.file_id, ignore_errors=True
+            )
+        return result
+
+    def run(self, files: t.Iterable[flywheel.FileEntry]) -> dict:
+        """Validates files, then writes the summary report.
+
+        Args:
+            files: the files to validate
+
+        Returns:
+            the summary report
+
+        """
+        n_workers = self.config.get("n_workers", 1)
+        if n_workers > 1:
+            scheduler = Scheduler(
+                n_workers,
+                initializer=_init_worker,
+                initargs=(self.config, self.validator_config, self.cache),
+                handled=FILE_ERRORS,
+            )
+            for result in scheduler.run(
+                files, self.prepare_file, _validate_in_worker, self.finish_file
+            ):
+                self.results.append(result)
+                log.info("%s: %s", result["name"], result["state"])
+            scheduler.log_summary()
+            self.workers = scheduler.summary()
+        else:
+            for file_entry in files:
+                result = self.validate_file(file_entry)
+                log.info("%s: %s", file_entry.name, result["state"])
+
+        summary = self.summary()
+        output_path = Path(self.context.output_dir) / SUMMARY_FILENAME
+        with open(output_path, "w", encoding="UTF-8") as fp:
+            json.dump(summary, fp, indent=2)
+        log.info(
+            "Validated %d files: %d passed, %d failed, %d could not be validated.",
+            summary["total"],
+            summary["passed"],
+            summary["failed"],
+            summary["errored"],
+        )
+        return summary
+
+    def summary(self) -> dict:
+        """Returns the summary report of the files validated so far."""
+        states = [result["state"] for result in self.results]
+        summary = {
+            "total": len(states),
+            "passed": states.count("PASS"),
+            "failed": states.count("FAIL"),
+            "errored": states.count("ERROR"),
+            "files": self.results,
+        }
+        if self.workers:
+            summary["workers"] = self.workers
+        return summary
+
+
+def _init_worker(
+    config: dict, validator_config: dict, cache: t.Union[SchemaCache, None]
+) -> None:
+    """Builds the BatchValidator (and its compiled validators) of a worker process."""
+    global _worker_validator
+    _worker_validator = BatchValidator(None, config, validator_config, cache=cache)
+
+
+def _validate_in_worker(
+    task: dict,
+) -> t.Tuple[bool, t.List[t.Dict], t.Union[dict, None]]:
+    """Validates a file in a worker process."""
+    return _worker_validator.validate_task(task)
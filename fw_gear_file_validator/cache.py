@@ -0,0 +1,400 @@
+"""cache.py.
+
+Caches of schemas and flywheel containers.
+
+SchemaCache holds parsed and compiled schemas, keyed by the SHA-256 of the
+schema file and of CACHE_VERSION.  Files are usually validated against a handful of schemas, so
+rather than parsing the schema, resolving its `$ref`s and compiling its row
+checks for every file, they are kept in memory and reused whenever a schema
+with the same bytes is seen again.  This is where most of the benefit is: a
+batch run, or the command line validating many files, builds each validator
+once.
+
+What is derived from the schema (its csv column types and compiled row
+checks) is also stored in a cache directory, so it is reused between
+processes.  The parsed schema itself is not: reading it back from a cache
+file costs as much as parsing the schema file.  The default directory is
+local to the machine (and to the container of a gear job), set
+FW_FILE_VALIDATOR_CACHE_DIR to a persistent directory to share it between
+runs.
+
+ContainerCache holds the parent containers (project, subject, session, ...)
+fetched for flywheel-object validation, so the files of a session or project
+don't each fetch the same parents again.  It keeps them in memory, or in a
+local directory shared between batch runs.  Only batch runs use the
+directory: they list the containers they search, which is how the cached
+copies of modified containers are found (see ContainerCache.observe).  A
+single-file run has nothing to check its parents against, so it keeps them
+in memory.
+
+Both caches are best effort: if their directory can't be read or written, the
+schema or container is simply processed or fetched again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = "FW_FILE_VALIDATOR_CACHE_DIR"
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "fw_gear_file_validator"
+# Bump when the layout of the cache entries, or what the compiler builds
+# (e.g. the row plan), changes, so entries written by older versions are ignored.
+CACHE_VERSION = 1
+# Total size of the cache files, beyond which the least recently used are removed.
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+# Number of entries kept in memory.
+MAX_MEMORY_ENTRIES = 32
+# Artifacts only kept in memory, which are as cheap to rebuild as to read back.
+MEMORY_ONLY_ARTIFACTS = ("schema",)
+
+CONTAINER_CACHE_DIR_ENV = "FW_FILE_VALIDATOR_CONTAINER_CACHE_DIR"
+# Seconds a cached container is used for before it's fetched again.
+CONTAINER_TTL = 600
+# Number of containers kept by a container store.
+MAX_CONTAINERS = 1024
+
+
+class SchemaCache:
+    """LRU cache of schema artifacts, stored as json files named by schema hash.
+
+    An entry is a dict of json-serializable artifacts, e.g.:
+        {
+            "schema": the parsed schema, only kept in memory
+            "column_types": {column: python type name},
+            "row_plan": the compiler's plan, or None if the schema can't be compiled,
+        }
+    """
+
+    def __init__(
+        self,
+        directory: t.Union[Path, str, None] = None,
+        max_bytes: t.Optional[int] = None,
+    ):
+        """Initializes a SchemaCache.
+
+        Args:
+            directory: the cache directory.  Defaults to the directory in the
+                FW_FILE_VALIDATOR_CACHE_DIR environment variable, or
+                ~/.cache/fw_gear_file_validator.
+            max_bytes: the size cap of the cache directory, MAX_CACHE_BYTES by default
+        """
+        if directory is None:
+            directory = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes or MAX_CACHE_BYTES
+        self._memory = OrderedDict()
+
+    @staticmethod
+    def key(schema_bytes: bytes) -> str:
+        """Returns the cache key of a schema: the SHA-256 of the cache version and its bytes."""
+        return hashlib.sha256(f"{CACHE_VERSION}\0".encode() + schema_bytes).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def lookup(self, schema_bytes: bytes) -> t.Tuple[str, dict]:
+        """Looks up the cached artifacts of a schema.
+
+        Args:
+            schema_bytes: the content of the schema file
+
+        Returns:
+            the schema's cache key, and its cached artifacts ({} on a miss)
+
+        """
+        key = self.key(schema_bytes)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return key, self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="UTF-8") as fp:
+                entry = json.load(fp)
+            # Touching the file marks it as recently used for eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            entry = {}
+        except (OSError, ValueError) as e:
+            log.debug("Ignoring unreadable schema cache file %s: %s", path, e)
+            entry = {}
+        self._remember(key, entry)
+        return key, entry
+
+    def store(self, key: str, entry: dict) -> None:
+        """Stores the artifacts of a schema, then evicts entries over the size cap.
+
+        The cache file is only written if the artifacts stored on disk (those
+        not in MEMORY_ONLY_ARTIFACTS) changed.
+
+        Args:
+            key: the schema's cache key, as returned by lookup
+            entry: the artifacts to store
+
+        """
+        previous = self._memory.get(key, {})
+        self._remember(key, entry)
+        entry = _persisted(entry)
+        if entry == _persisted(previous):
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so readers never see partial entries.
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.directory, suffix=".tmp", delete=False, encoding="UTF-8"
+            ) as fp:
+                json.dump(entry, fp)
+            os.replace(fp.name, self._path(key))
+            self.evict()
+        except (OSError, TypeError, ValueError) as e:
+            log.debug("Could not write schema cache entry %s: %s", key, e)
+
+    def evict(self) -> None:
+        """Removes the least recently used cache files until the cache fits its size cap."""
+        files = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def _remember(self, key: str, entry: dict) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > MAX_MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+
+def _persisted(entry: dict) -> dict:
+    """Returns the artifacts of a schema cache entry that are stored on disk."""
+    return {
+        name: artifact
+        for name, artifact in entry.items()
+        if name not in MEMORY_ONLY_ARTIFACTS
+    }
+
+
+def _field(container: t.Any, name: str) -> t.Any:
+    """Returns a field of a flywheel container, or of a container's dict."""
+    if isinstance(container, dict):
+        return container.get(name)
+    return getattr(container, name, None)
+
+
+def _json_default(val: t.Any) -> t.Any:
+    """Serializes the datetimes of flywheel containers."""
+    if hasattr(val, "isoformat"):
+        return val.isoformat()
+    raise TypeError(f"{type(val).__name__} is not JSON serializable")
+
+
+class MemoryContainerStore:
+    """Keeps cached containers in memory, evicting the least recently used.
+
+    The hierarchy levels are fetched from several threads, hence the lock.
+    """
+
+    def __init__(self, max_entries: int = MAX_CONTAINERS):
+        """Initializes a MemoryContainerStore."""
+        self.max_entries = max_entries
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> t.Union[dict, None]:
+        """Returns the record stored under a key, or None."""
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+            return record
+
+    def set(self, key: str, record: dict) -> None:
+        """Stores a record under a key."""
+        with self._lock:
+            self._records[key] = record
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Removes the record stored under a key, if any."""
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class DiskContainerStore:
+    """Keeps cached containers as json files in a directory, shared between runs.
+
+    Containers are stored as the dict of their fields, and rebuilt as the same
+    flywheel model when loaded.  Their datetimes (e.g. `modified`) are loaded
+    back as ISO 8601 strings.
+    """
+
+    def __init__(
+        self, directory: t.Union[Path, str], max_entries: int = MAX_CONTAINERS
+    ):
+        """Initializes a DiskContainerStore."""
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> t.Union[dict, None]:
+        """Returns the record stored under a key, or None."""
+        import flywheel.models
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="UTF-8") as fp:
+                record = json.load(fp)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.debug("Ignoring unreadable container cache file %s: %s", path, e)
+            return None
+        model = getattr(flywheel.models, record.pop("model"), None)
+        data = record["container"]
+        record["container"] = model(**data) if model else data
+        return record
+
+    def set(self, key: str, record: dict) -> None:
+        """Stores a record under a key, then evicts the least recently used."""
+        container = record["container"]
+        record = {
+            **record,
+            "model": type(container).__name__,
+            "container": container.to_dict()
+            if hasattr(container, "to_dict")
+            else container,
+        }
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.directory, suffix=".tmp", delete=False, encoding="UTF-8"
+            ) as fp:
+                json.dump(record, fp, default=_json_default)
+            os.replace(fp.name, self._path(key))
+            self.evict()
+        except (OSError, TypeError, ValueError) as e:
+            log.debug("Could not write container cache entry %s: %s", key, e)
+
+    def delete(self, key: str) -> None:
+        """Removes the record stored under a key, if any."""
+        self._path(key).unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        """Removes the least recently used files beyond max_entries."""
+        files = []
+        for path in self.directory.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        for _, path in sorted(files)[: max(len(files) - self.max_entries, 0)]:
+            path.unlink(missing_ok=True)
+
+
+class ContainerCache:
+    """TTL cache of flywheel containers, keyed by container type and id.
+
+    A cached container is used until it's older than the TTL, or until a newer
+    version of it is seen (i.e. one with a different `modified` timestamp, see
+    observe).
+    """
+
+    def __init__(
+        self,
+        store: t.Union[MemoryContainerStore, DiskContainerStore] = None,
+        ttl: float = CONTAINER_TTL,
+    ):
+        """Initializes a ContainerCache.
+
+        Args:
+            store: where the containers are kept, in memory by default
+            ttl: the seconds a cached container is used for
+        """
+        self.store = store if store is not None else MemoryContainerStore()
+        self.ttl = ttl
+
+    @classmethod
+    def default(cls) -> "ContainerCache":
+        """Returns a cache on disk in FW_FILE_VALIDATOR_CONTAINER_CACHE_DIR if it's set, else in memory.
+
+        Only meant for batch runs, which observe the containers they search.
+        """
+        directory = os.environ.get(CONTAINER_CACHE_DIR_ENV)
+        if directory:
+            return cls(DiskContainerStore(directory))
+        return cls()
+
+    @staticmethod
+    def key(container_type: str, container_id: str) -> str:
+        """Returns the cache key of a container."""
+        return f"{container_type}-{container_id}"
+
+    def get(
+        self, container_type: str, container_id: str, fetch: t.Callable[[], t.Any]
+    ) -> t.Any:
+        """Returns a container, fetching it if it isn't cached or has expired.
+
+        Args:
+            container_type: the container type, e.g. "session"
+            container_id: the container id
+            fetch: the function fetching the container from flywheel
+
+        Returns:
+            the container
+
+        """
+        key = self.key(container_type, container_id)
+        record = self.store.get(key)
+        if record is not None and time.time() - record["stored_at"] < self.ttl:
+            return record["container"]
+
+        container = fetch()
+        if container is not None:
+            self.store.set(
+                key,
+                {
+                    "stored_at": time.time(),
+                    "modified": self._modified(container),
+                    "container": container,
+                },
+            )
+        return container
+
+    def observe(self, container_type: str, container: t.Any) -> None:
+        """Drops the cached copy of a container if it has since been modified.
+
+        Args:
+            container_type: the container type
+            container: an up to date version of the container, e.g. from a listing
+
+        """
+        key = self.key(container_type, _field(container, "id"))
+        record = self.store.get(key)
+        if record is not None and record["modified"] != self._modified(container):
+            self.store.delete(key)
+
+    @staticmethod
+    def _modified(container: t.Any) -> t.Union[str, None]:
+        modified = _field(container, "modified")
+        return _json_default(modified) if hasattr(modified, "isoformat") else modified
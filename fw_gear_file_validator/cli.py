@@ -0,0 +1,126 @@
+"""cli.py.
+
+Command line interface to validate local files, e.g. before uploading them:
+
+    fw-file-validator schema.json "uploads/**/*.csv" --jobs 4
+
+The result of each file is printed as a line of json.  The exit status is 0
+if every file is valid, 1 otherwise.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import typing as t
+
+from fw_gear_file_validator import api
+from fw_gear_file_validator.cache import SchemaCache
+from fw_gear_file_validator.validator import CSV_ENGINES
+
+log = logging.getLogger(__name__)
+
+
+def make_parser() -> argparse.ArgumentParser:
+    """Returns the parser of the command line arguments."""
+    arg_parser = argparse.ArgumentParser(
+        prog="fw-file-validator",
+        description="Validates local json and csv files against a json schema.",
+    )
+    arg_parser.add_argument("schema", help="the json schema to validate against")
+    arg_parser.add_argument(
+        "paths",
+        nargs="+",
+        help='files, directories or glob patterns (e.g. "uploads/**/*.csv")',
+    )
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of files validated at a time, each in its own process",
+    )
+    arg_parser.add_argument(
+        "--report-dir",
+        help="write the errors of each file to a gzipped json lines report "
+        "in this directory, rather than printing them",
+    )
+    arg_parser.add_argument(
+        "--summary",
+        action="store_true",
+        help="print the number of errors of each file, but not the errors",
+    )
+    arg_parser.add_argument("--csv-engine", choices=CSV_ENGINES, default="row")
+    arg_parser.add_argument(
+        "--n-workers",
+        type=int,
+        default=1,
+        help="number of processes validating the rows of a csv file",
+    )
+    arg_parser.add_argument(
+        "--error-limit",
+        type=int,
+        default=0,
+        help="maximum number of errors reported per file, 0 for no limit",
+    )
+    arg_parser.add_argument("--aggregate-errors", action="store_true")
+    arg_parser.add_argument("--fail-fast", action="store_true")
+    arg_parser.add_argument("--stream-json", action="store_true")
+    arg_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="don't use the schema cache",
+    )
+    arg_parser.add_argument("-v", "--verbose", action="store_true")
+    return arg_parser
+
+
+def main(argv: t.Optional[t.Sequence[str]] = None) -> int:
+    """Validates the files given on the command line.
+
+    Returns:
+        the exit status: 0 if every file is valid, 1 otherwise
+
+    """
+    args = make_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    validator_config = {
+        "n_workers": args.n_workers,
+        "engine": args.csv_engine,
+        "error_limit": args.error_limit,
+        "aggregate_errors": args.aggregate_errors,
+        "fail_fast": args.fail_fast,
+    }
+    results = api.validate_files(
+        args.schema,
+        args.paths,
+        validator_config=validator_config,
+        loader_config={"stream_json": args.stream_json},
+        report_dir=args.report_dir,
+        n_jobs=args.jobs,
+        cache=None if args.no_cache else SchemaCache(),
+    )
+    states = []
+    for result in results:
+        states.append(result["state"])
+        if args.summary:
+            result.pop("errors", None)
+        print(json.dumps(result), flush=True)
+
+    log.info(
+        "Validated %d files: %d passed, %d failed, %d could not be validated.",
+        len(states),
+        states.count("PASS"),
+        states.count("FAIL"),
+        states.count("ERROR"),
+    )
+    if not states:
+        log.error("No files to validate.")
+    return 0 if states and all(state == "PASS" for state in states) else 1
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""columnar.py.
+
+Columnar csv validation engine using NumPy.
+
+Rows are read in chunks, and each chunk is transposed into columns.  Numeric
+columns made of plain decimal strings are parsed into NumPy arrays, and their
+`type`, `enum`, `minimum`/`maximum` and length constraints are evaluated as
+whole-column boolean masks.  Only the rows with a failing cell are then passed
+to the row engine, which produces exactly the errors it would have reported
+for them.
+
+The engine only handles schemas the compiler fully compiles: schemas with
+`if`/`then`, `allOf` or other cross-field keywords are validated by the row
+engine instead.  NumPy is a dependency of the gear, but the package still
+works without it (e.g. installed with --no-deps), using the row engine.
+"""
+
+import logging
+import typing as t
+
+from fw_gear_file_validator import compiler, parallel, utils
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from fw_gear_file_validator.validator import CsvValidator
+
+log = logging.getLogger(__name__)
+
+# Number of rows transposed into columns at a time.
+CHUNK_SIZE = 10000
+# Longest integer string parsed by NumPy; longer ones may not compare exactly
+# with float bounds.
+MAX_INT_DIGITS = 15
+
+
+def supports(csv_validator: "CsvValidator") -> bool:
+    """Returns True if the columnar engine can validate with the given validator."""
+    if np is None:
+        log.warning("numpy is not installed, the columnar engine is unavailable.")
+        return False
+    row_validator = csv_validator.row_validator
+    if row_validator is None or None in row_validator.plan["columns"].values():
+        log.info("Schema has keywords the columnar engine can't handle.")
+        return False
+    return True
+
+
+def _only_strings(values: t.Sequence) -> bool:
+    """Returns True if every value is a plain str without NUL characters.
+
+    NumPy drops trailing NULs from strings, which would change their lengths.
+    """
+    return set(map(type, values)) <= {str} and "\x00" not in "".join(values)
+
+
+def _parse_numbers(
+    values: t.Sequence, present: "np.ndarray", cast_type: type
+) -> t.Union["np.ndarray", None]:
+    """Parses a column of csv strings into a numeric array.
+
+    Only columns where every present value is a plain decimal number (with an
+    optional sign, and for floats an optional ".") are parsed, since those
+    cast identically with python's int() or float() and with NumPy.
+
+    Returns:
+        the int64 or float64 array, or None if the column can't be parsed.
+
+    """
+    if not _only_strings(values):
+        return None
+    strings = np.array(values, dtype=str)
+    strings[~present] = "0"
+    n_signs = np.char.count(strings, "-") + np.char.count(strings, "+")
+    digits = np.char.lstrip(strings, "+-")
+    if cast_type is int:
+        plain = np.char.str_len(digits) <= MAX_INT_DIGITS
+        dtype = np.int64
+    else:
+        plain = np.char.count(digits, ".") <= 1
+        digits = np.char.replace(digits, ".", "", count=1)
+        dtype = np.float64
+    if not np.all((n_signs <= 1) & plain & np.char.isdecimal(digits)):
+        return None
+    try:
+        return strings.astype(dtype)
+    except ValueError:
+        return None
+
+
+def _types(types: t.Union[str, t.List[str]]) -> t.Set[str]:
+    return set(types) if isinstance(types, list) else {types}
+
+
+def _numeric_members(values: t.List) -> t.List:
+    return [
+        v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)
+    ]
+
+
+def _string_members(values: t.List) -> t.List:
+    return [v for v in values if isinstance(v, str)]
+
+
+# (kind of column, keyword): function(values, value) returning a mask of valid
+# cells, or None when the check has to be run on each cell.
+VECTOR_CHECKS = {
+    ("str", "type"): lambda a, v: True if "string" in _types(v) else None,
+    ("str", "enum"): lambda a, v: np.isin(a, _string_members(v)),
+    ("str", "const"): lambda a, v: np.isin(a, _string_members([v])),
+    ("str", "minLength"): lambda a, v: ~(np.char.str_len(a) < v),
+    ("str", "maxLength"): lambda a, v: ~(np.char.str_len(a) > v),
+    ("str", "minimum"): lambda a, v: True,
+    ("str", "maximum"): lambda a, v: True,
+    ("str", "exclusiveMinimum"): lambda a, v: True,
+    ("str", "exclusiveMaximum"): lambda a, v: True,
+    ("int", "type"): lambda a, v: True if {"number", "integer"} & _types(v) else None,
+    ("float", "type"): lambda a, v: (
+        True
+        if "number" in _types(v)
+        else np.isfinite(a) & (a == np.floor(a))
+        if "integer" in _types(v)
+        else None
+    ),
+    ("num", "enum"): lambda a, v: np.isin(a, _numeric_members(v)),
+    ("num", "const"): lambda a, v: np.isin(a, _numeric_members([v])),
+    ("num", "minimum"): lambda a, v: ~(a < v),
+    ("num", "maximum"): lambda a, v: ~(a > v),
+    ("num", "exclusiveMinimum"): lambda a, v: ~(a <= v),
+    ("num", "exclusiveMaximum"): lambda a, v: ~(a >= v),
+    ("num", "minLength"): lambda a, v: True,
+    ("num", "maxLength"): lambda a, v: True,
+    ("num", "pattern"): lambda a, v: True,
+}
+
+
+def valid_cells(
+    values: t.Sequence,
+    present: "np.ndarray",
+    checks: t.List[t.List],
+    cast_type: type,
+) -> "np.ndarray":
+    """Evaluates a column's compiled checks on all of its cells at once.
+
+    Args:
+        values: the raw csv values of the column
+        present: mask of the cells that have a value
+        checks: the column's [keyword, value] checks, from the compiler's plan
+        cast_type: the type the column's values are cast to
+
+    Returns:
+        a boolean mask of the cells that passed every check
+
+    """
+    caster = utils.make_csv_caster(cast_type)
+    array, cast_values = None, None
+    if cast_type is str and _only_strings(values):
+        array, kind, cast_values = np.array(values, dtype=str), "str", values
+    elif cast_type in (int, float):
+        array = _parse_numbers(values, present, cast_type)
+        kind = "int" if cast_type is int else "float"
+        if array is not None:
+            cast_values = array.tolist()
+
+    if array is None:
+        # Values that don't all cast the same way: check each cell.
+        check = compiler.build_column_check(checks)
+        return np.fromiter(
+            (not p or check(caster(v)) for v, p in zip(values, present)),
+            dtype=bool,
+            count=len(values),
+        )
+
+    valid = np.ones(len(values), dtype=bool)
+    for keyword, value in checks:
+        vector_check = VECTOR_CHECKS.get((kind, keyword))
+        if vector_check is None and kind != "str":
+            vector_check = VECTOR_CHECKS.get(("num", keyword))
+        mask = None if vector_check is None else vector_check(array, value)
+        if mask is None:
+            check = compiler.build_column_check([[keyword, value]])
+            mask = np.fromiter(map(check, cast_values), dtype=bool, count=len(values))
+        valid &= mask
+    return valid
+
+
+def find_invalid_rows(
+    rows: t.List[t.Dict], plan: dict, column_types: dict, drop_empty: bool
+) -> t.Sequence[int]:
+    """Finds the rows of a chunk that have at least one invalid cell.
+
+    Args:
+        rows: the chunk of csv rows
+        plan: the compiler's plan for the schema
+        column_types: the column datatypes, as returned by get_column_dtypes
+        drop_empty: if True, empty values are treated as missing
+
+    Returns:
+        the indexes of the invalid rows in the chunk
+
+    """
+    columns = tuple(rows[0])
+    if any(tuple(row) != columns for row in rows):
+        return range(len(rows))
+    if not set(plan["required"]) <= set(columns):
+        return range(len(rows))
+
+    required = set(plan["required"])
+    invalid = np.zeros(len(rows), dtype=bool)
+    for column, values in zip(columns, zip(*(row.values() for row in rows))):
+        checks = plan["columns"].get(column)
+        if not checks and column not in required:
+            continue
+        if drop_empty:
+            present = np.array(values, dtype=object).astype(bool)
+        else:
+            present = np.ones(len(values), dtype=bool)
+        if column in required:
+            invalid |= ~present
+        if checks:
+            cast_type = column_types.get(column, str)
+            invalid |= present & ~valid_cells(values, present, checks, cast_type)
+    return np.flatnonzero(invalid).tolist()
+
+
+def iter_columnar_errors(
+    csv_validator: "CsvValidator",
+    rows: t.Iterable[t.Dict],
+    drop_empty: bool,
+    chunk_size: t.Optional[int] = None,
+) -> t.Iterator[t.Dict]:
+    """Validates csv rows column by column, yielding errors in row order.
+
+    Args:
+        csv_validator: the validator, whose row engine reports the errors
+        rows: the csv row dictionaries to validate
+        drop_empty: if True, remove empty columns from each row before validating
+        chunk_size: the number of rows to validate at a time, CHUNK_SIZE by default
+
+    Yields:
+        dict: a packaged error, with its csv location already set
+
+    """
+    plan = csv_validator.row_validator.plan
+    column_types = csv_validator.get_column_dtypes()
+    for first_row, chunk in parallel.iter_chunks(rows, chunk_size or CHUNK_SIZE):
+        invalid = find_invalid_rows(chunk, plan, column_types, drop_empty)
+        yield from csv_validator.iter_row_errors(
+            [chunk[i] for i in invalid],
+            drop_empty,
+            row_nums=[first_row + i for i in invalid],
+        )
@@ -0,0 +1,383 @@
+"""compiler.py.
+
+Compiles flat csv schemas into specialized per-column checks.
+
+Most csv schemas are a flat set of `properties` using only simple keywords
+(`type`, `enum`, `pattern`, `minimum`, ...).  Running the generic jsonschema
+keyword dispatcher on every cell of every row is slow, so for those schemas
+each column's keywords are compiled into a single check function.
+
+The compiled checks only decide whether a cell is valid.  Cells that fail
+them, and columns using keywords the compiler doesn't support, are handed to
+jsonschema, so the errors reported are exactly the ones jsonschema would
+report.  Compiled checks must therefore never accept a value jsonschema would
+reject; when in doubt they reject it and let jsonschema decide.
+"""
+
+import numbers
+import re
+import typing as t
+from collections import deque
+
+import jsonschema
+from jsonschema.exceptions import ValidationError
+
+# Top level keywords that can be handled by the compiled row validator.
+SCHEMA_KEYWORDS = {"type", "properties", "required"}
+
+SCALAR_TYPES = (str, int, float, type(None))
+
+TYPE_CHECKS = {
+    "string": lambda v: type(v) is str,
+    "number": lambda v: type(v) is int or type(v) is float,
+    "integer": lambda v: type(v) is int or (type(v) is float and v.is_integer()),
+    "boolean": lambda v: type(v) is bool,
+    "null": lambda v: v is None,
+    "array": lambda v: type(v) is list,
+    "object": lambda v: type(v) is dict,
+}
+
+
+def _not_a_number(val: t.Any) -> bool:
+    """Returns True for values numeric keywords don't apply to (bools count as non-numbers)."""
+    return isinstance(val, bool) or not isinstance(val, numbers.Number)
+
+
+def _is_scalar(val: t.Any) -> bool:
+    """Returns True for the json scalars that can be compared by hashing."""
+    return isinstance(val, SCALAR_TYPES) and not isinstance(val, bool)
+
+
+def _is_number(val: t.Any) -> bool:
+    """Returns True for int and float values, excluding bools."""
+    return isinstance(val, (int, float)) and not isinstance(val, bool)
+
+
+def _is_length(val: t.Any) -> bool:
+    """Returns True for values that can be used as a minLength/maxLength."""
+    return isinstance(val, int) and not isinstance(val, bool)
+
+
+def _is_pattern(val: t.Any) -> bool:
+    """Returns True for strings that compile as regular expressions."""
+    if not isinstance(val, str):
+        return False
+    try:
+        re.compile(val)
+    except re.error:
+        return False
+    return True
+
+
+def _is_types(val: t.Any) -> bool:
+    """Returns True for a json type name, or list of type names."""
+    types = val if isinstance(val, list) else [val]
+    return bool(types) and all(
+        isinstance(t_, str) and t_ in TYPE_CHECKS for t_ in types
+    )
+
+
+def _make_type_check(types: t.Union[str, t.List[str]]) -> t.Callable[[t.Any], bool]:
+    if not isinstance(types, list):
+        return TYPE_CHECKS[types]
+    checks = tuple(TYPE_CHECKS[t_] for t_ in types)
+    return lambda v: any(check(v) for check in checks)
+
+
+def _make_enum_check(values: t.List[t.Any]) -> t.Callable[[t.Any], bool]:
+    members = frozenset(values)
+
+    def check(val):
+        # jsonschema never considers bools equal to numbers, unlike python.
+        if isinstance(val, bool):
+            return False
+        try:
+            return val in members
+        except TypeError:
+            return False
+
+    return check
+
+
+def _make_const_check(value: t.Any) -> t.Callable[[t.Any], bool]:
+    return _make_enum_check([value])
+
+
+def _make_pattern_check(pattern: str) -> t.Callable[[t.Any], bool]:
+    search = re.compile(pattern).search
+    return lambda v: not isinstance(v, str) or search(v) is not None
+
+
+def _make_minimum_check(minimum: float) -> t.Callable[[t.Any], bool]:
+    def check(val):
+        if type(val) is int or type(val) is float:
+            return not val < minimum
+        return _not_a_number(val)
+
+    return check
+
+
+def _make_maximum_check(maximum: float) -> t.Callable[[t.Any], bool]:
+    def check(val):
+        if type(val) is int or type(val) is float:
+            return not val > maximum
+        return _not_a_number(val)
+
+    return check
+
+
+def _make_exclusive_minimum_check(minimum: float) -> t.Callable[[t.Any], bool]:
+    def check(val):
+        if type(val) is int or type(val) is float:
+            return not val <= minimum
+        return _not_a_number(val)
+
+    return check
+
+
+def _make_exclusive_maximum_check(maximum: float) -> t.Callable[[t.Any], bool]:
+    def check(val):
+        if type(val) is int or type(val) is float:
+            return not val >= maximum
+        return _not_a_number(val)
+
+    return check
+
+
+def _make_min_length_check(length: int) -> t.Callable[[t.Any], bool]:
+    return lambda v: not isinstance(v, str) or not len(v) < length
+
+
+def _make_max_length_check(length: int) -> t.Callable[[t.Any], bool]:
+    return lambda v: not isinstance(v, str) or not len(v) > length
+
+
+# keyword: (is the keyword's value compilable, check builder)
+COLUMN_KEYWORDS = {
+    "type": (_is_types, _make_type_check),
+    "enum": (
+        lambda v: isinstance(v, list) and all(_is_scalar(e) for e in v),
+        _make_enum_check,
+    ),
+    "const": (_is_scalar, _make_const_check),
+    "pattern": (_is_pattern, _make_pattern_check),
+    "minimum": (_is_number, _make_minimum_check),
+    "maximum": (_is_number, _make_maximum_check),
+    "exclusiveMinimum": (_is_number, _make_exclusive_minimum_check),
+    "exclusiveMaximum": (_is_number, _make_exclusive_maximum_check),
+    "minLength": (_is_length, _make_min_length_check),
+    "maxLength": (_is_length, _make_max_length_check),
+}
+
+
+def is_annotation(keyword: str, validator: jsonschema.Draft7Validator) -> bool:
+    """Returns True for keywords jsonschema doesn't validate with (e.g. title)."""
+    if keyword == "format":
+        return validator.format_checker is None
+    return keyword not in validator.VALIDATORS
+
+
+def analyze_property(
+    subschema: t.Any,
+    validator: jsonschema.Draft7Validator,
+    resolve: t.Callable[[str], dict],
+) -> t.Union[t.List[t.List], None]:
+    """Works out the compiled checks for a single column's subschema.
+
+    Args:
+        subschema: the column's subschema, from the schema's properties
+        validator: the validator the schema belongs to
+        resolve: a function resolving a `$ref` to the subschema it points at
+
+    Returns:
+        a list of [keyword, value] checks to compile, or None if the column
+        must be validated by jsonschema
+
+    """
+    if subschema is True:
+        return []
+    if not isinstance(subschema, dict):
+        return None
+    if "$ref" in subschema:
+        # Draft 7 ignores the siblings of a $ref.
+        try:
+            subschema = resolve(subschema["$ref"])
+        except Exception:
+            return None
+        if not isinstance(subschema, dict) or "$ref" in subschema:
+            return None
+
+    checks = []
+    for keyword, value in subschema.items():
+        if is_annotation(keyword, validator):
+            continue
+        if keyword not in COLUMN_KEYWORDS:
+            return None
+        is_compilable, _ = COLUMN_KEYWORDS[keyword]
+        if not is_compilable(value):
+            return None
+        checks.append([keyword, value])
+    return checks
+
+
+def analyze_schema(
+    validator: jsonschema.Draft7Validator, resolve: t.Callable[[str], dict]
+) -> t.Union[dict, None]:
+    """Works out how a schema can be compiled into a row validator.
+
+    The result only holds plain data, so it can be stored and used to rebuild
+    the row validator later without analyzing the schema again.
+
+    Args:
+        validator: the validator for the schema
+        resolve: a function resolving a `$ref` to the subschema it points at
+
+    Returns:
+        {"required": [...], "columns": {column: checks or None}}, or None if
+        the schema is not a flat schema that can be compiled
+
+    """
+    schema = validator.schema
+    if not isinstance(schema, dict):
+        return None
+    for keyword, value in schema.items():
+        if keyword in SCHEMA_KEYWORDS or is_annotation(keyword, validator):
+            continue
+        return None
+    if schema.get("type", "object") not in ("object", ["object"]):
+        return None
+    return analyze_properties(validator, resolve)
+
+
+def analyze_properties(
+    validator: jsonschema.Draft7Validator, resolve: t.Callable[[str], dict]
+) -> t.Union[dict, None]:
+    """Works out the compiled checks of the `required` and `properties` of a schema.
+
+    Unlike analyze_schema, the other keywords of the schema are ignored, so
+    a row validator built from the plan only finds some of the errors of a
+    schema with other keywords (e.g. cross-field rules in an allOf).  The
+    errors it finds are all errors jsonschema would report.
+
+    Args:
+        validator: the validator for the schema
+        resolve: a function resolving a `$ref` to the subschema it points at
+
+    Returns:
+        {"required": [...], "columns": {column: checks or None}}, or None if
+        the schema has no `properties` or `required` that can be checked
+
+    """
+    schema = validator.schema
+    if not isinstance(schema, dict):
+        return None
+    required = schema.get("required", [])
+    if not isinstance(required, list) or not all(isinstance(r, str) for r in required):
+        return None
+    properties = schema.get("properties", {})
+    if not isinstance(properties, dict):
+        return None
+
+    return {
+        "required": required,
+        "columns": {
+            column: analyze_property(subschema, validator, resolve)
+            for column, subschema in properties.items()
+        },
+    }
+
+
+def build_column_check(checks: t.List[t.List]) -> t.Callable[[t.Any], bool]:
+    """Builds a single check function for a column from its [keyword, value] checks."""
+    funcs = tuple(COLUMN_KEYWORDS[keyword][1](value) for keyword, value in checks)
+    if not funcs:
+        return lambda v: True
+    if len(funcs) == 1:
+        return funcs[0]
+
+    def check(val):
+        for func in funcs:
+            if not func(val):
+                return False
+        return True
+
+    return check
+
+
+class RowValidator:
+    """Validates flat rows with checks compiled from a schema.
+
+    Attributes:
+        validator: the jsonschema validator, used for anything that isn't compiled
+        plan: the plan the checks were built from, as made by analyze_schema
+        columns: {column: (subschema, compiled check or None)} for every property
+    """
+
+    def __init__(self, validator: jsonschema.Draft7Validator, plan: dict):
+        """Builds the compiled checks from a plan made by analyze_schema."""
+        self.validator = validator
+        self.plan = plan
+        self.required = tuple(plan["required"])
+        properties = validator.schema.get("properties", {})
+        self.columns = {
+            column: (
+                properties[column],
+                None if checks is None else build_column_check(checks),
+            )
+            for column, checks in plan["columns"].items()
+        }
+
+    def iter_errors(self, row: t.Any) -> t.Iterator[ValidationError]:
+        """Yields the errors jsonschema would find in a row.
+
+        The errors are yielded in an order that sorts by path to the same order
+        as the ones from jsonschema.Draft7Validator.iter_errors.
+        """
+        if type(row) is not dict:
+            yield from self.validator.iter_errors(row)
+            return
+
+        schema = self.validator.schema
+        for column in self.required:
+            if column not in row:
+                yield ValidationError(
+                    f"{column!r} is a required property",
+                    validator="required",
+                    validator_value=schema["required"],
+                    instance=row,
+                    schema=schema,
+                    schema_path=deque(["required"]),
+                )
+
+        columns = self.columns
+        for column, value in row.items():
+            compiled = columns.get(column)
+            if compiled is None:
+                continue
+            subschema, check = compiled
+            if check is not None and check(value):
+                continue
+            for error in self.validator.descend(
+                value, subschema, path=column, schema_path=column
+            ):
+                error.schema_path.appendleft("properties")
+                yield error
+
+
+def compile_row_validator(
+    validator: jsonschema.Draft7Validator, resolve: t.Callable[[str], dict]
+) -> t.Union[RowValidator, None]:
+    """Compiles a schema into a RowValidator.
+
+    Args:
+        validator: the validator for the schema
+        resolve: a function resolving a `$ref` to the subschema it points at
+
+    Returns:
+        the RowValidator, or None if the schema can't be compiled
+
+    """
+    plan = analyze_schema(validator, resolve)
+    if plan is None:
+        return None
+    return RowValidator(validator, plan)
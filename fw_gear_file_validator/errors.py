@@ -5,15 +5,16 @@ Functions related to errors.
 
 import logging
 import typing as t
+from collections.abc import MutableMapping
 from datetime import datetime
-from typing import Any, Literal, Optional
 
-from flywheel_gear_toolkit import GearToolkitContext
 from jsonschema.exceptions import ValidationError
-from pydantic import BaseModel, ConfigDict, Field
 
 from fw_gear_file_validator.utils import PARENT_ORDER, FwReference
 
+if t.TYPE_CHECKING:  # pragma: no cover
+    from flywheel_gear_toolkit import GearToolkitContext
+
 log = logging.getLogger(__name__)
 
 # Globals:
@@ -22,58 +23,218 @@ RUNTIME = datetime.now()
 TIMESTAMP = RUNTIME.strftime(TIMEFORMAT)
 
 
-class FileError(BaseModel):
-    """Represents an error that might be found in file."""
+class FileFormatError(Exception):
+    """Raised when a file that is being streamed turns out to be malformed.
 
-    model_config = ConfigDict(populate_by_name=True)
-    type: Literal["alert", "error"] = Field(serialization_alias="type")
-    code: str = Field(serialization_alias="code")
-    location: Optional[Any] = None
-    value: Optional[str] = None
-    expected: Optional[str] = None
-    message: str = None
-    timestamp: Optional[str] = None
+    Structural problems in a csv (e.g. a row with the wrong number of fields)
+    can only be found part way through reading it, after validation of the
+    earlier rows has already started.
+    """
 
-    def model_post_init(self, __context) -> None:
-        """Logic to be carried out after initialization."""
-        # handle the error location options
-        if self.location == [""]:
-            self.location = ""
-        else:
-            self.location = {
-                "key_path": ".".join([str(loc) for loc in self.location][:-1])
-            }
+    def __init__(self, error: ValidationError):
+        """Initializes the exception from the ValidationError describing the problem."""
+        super().__init__(error.message)
+        self.error = error
+
+
+def __getattr__(name: str) -> t.Any:
+    """Imports the pydantic FileError model on first use.
+
+    Errors are packaged as ErrorRecords, so pydantic is only imported by the
+    code that still uses FileError.
+    """
+    if name == "FileError":
+        from fw_gear_file_validator.models import FileError
 
-        # handle required:
-        if self.code == "required":
-            key = self.message[1 : self.message.find("' is a required property")]
-            self.location = {"key_path": key}
-            self.value = ""
-            self.expected = ""
+        return FileError
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-def validator_error_to_standard(schema_error: ValidationError) -> dict:
+class ErrorRecord(MutableMapping):
+    """A packaged error in the standard flywheel error format.
+
+    A lightweight equivalent of the dict FileError.model_dump returns: its
+    fields are slots, so packaging an error is a single object creation, and
+    the strings it shares with other errors (e.g. the expected subschema) are
+    shared objects.  It can be read and updated like that dict, compares
+    equal to it, and is converted to it with to_dict when it is output.
+    """
+
+    # The fields of FileError, in its order.
+    FIELDS = (
+        "type",
+        "code",
+        "location",
+        "value",
+        "expected",
+        "message",
+        "timestamp",
+    )
+    __slots__ = (
+        "_extra",
+        "code",
+        "expected",
+        "location",
+        "message",
+        "timestamp",
+        "type",
+        "value",
+    )
+
+    def __init__(
+        self,
+        type: str,
+        code: str,
+        location: t.Any = None,
+        value: t.Optional[str] = None,
+        expected: t.Optional[str] = None,
+        message: t.Optional[str] = None,
+        timestamp: t.Optional[str] = None,
+    ):
+        """Initializes an ErrorRecord from the packaged values of its fields."""
+        self.type = type
+        self.code = code
+        self.location = location
+        self.value = value
+        self.expected = expected
+        self.message = message
+        self.timestamp = timestamp
+        # Keys added after packaging (e.g. flywheel_path), created when needed.
+        self._extra = None
+
+    def __getitem__(self, key: str) -> t.Any:
+        """Returns the value of a field or added key."""
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: t.Any) -> None:
+        """Sets the value of a field, or adds a key."""
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        """Removes an added key.  Fields can't be removed."""
+        if key in self.FIELDS or self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self) -> t.Iterator[str]:
+        """Iterates over the fields, then the added keys."""
+        yield from self.FIELDS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        """Returns the number of fields and added keys."""
+        return len(self.FIELDS) + len(self._extra or ())
+
+    def __repr__(self) -> str:
+        """Returns the repr of the equivalent dict."""
+        return f"ErrorRecord({self.to_dict()!r})"
+
+    def __reduce__(self):
+        """Pickles the record (e.g. to return it from a worker process) as its fields."""
+        return _rebuild_record, (self.to_dict(),)
+
+    def to_dict(self) -> dict:
+        """Returns the error as a dict, the way it is output."""
+        record = {
+            "type": self.type,
+            "code": self.code,
+            "location": self.location,
+            "value": self.value,
+            "expected": self.expected,
+            "message": self.message,
+            "timestamp": self.timestamp,
+        }
+        if self._extra:
+            record.update(self._extra)
+        return record
+
+
+def _rebuild_record(fields: dict) -> ErrorRecord:
+    record = ErrorRecord(**{key: fields[key] for key in ErrorRecord.FIELDS})
+    for key in fields.keys() - set(ErrorRecord.FIELDS):
+        record[key] = fields[key]
+    return record
+
+
+# Maximum number of strings kept by each cache below.
+MAX_CACHED_STRINGS = 4096
+# str() of each subschema errors were found against, keyed by the subschema's id
+# and stored with it, so the id isn't reused by another subschema while cached.
+_EXPECTED = {}
+# The key path of each schema path.
+_KEY_PATHS = {}
+
+
+def expected_string(schema: t.Any) -> str:
+    """Returns str(schema), cached and shared by all the errors found against the schema."""
+    cached = _EXPECTED.get(id(schema))
+    if cached is not None and cached[0] is schema:
+        return cached[1]
+    if len(_EXPECTED) >= MAX_CACHED_STRINGS:
+        _EXPECTED.clear()
+    expected = str(schema)
+    _EXPECTED[id(schema)] = (schema, expected)
+    return expected
+
+
+def key_path(schema_path: t.Iterable) -> str:
+    """Returns the key path of a location: its schema path without the failed keyword."""
+    path = tuple(schema_path)
+    cached = _KEY_PATHS.get(path)
+    if cached is None:
+        if len(_KEY_PATHS) >= MAX_CACHED_STRINGS:
+            _KEY_PATHS.clear()
+        cached = _KEY_PATHS[path] = ".".join([str(loc) for loc in path][:-1])
+    return cached
+
+
+def validator_error_to_standard(schema_error: ValidationError) -> ErrorRecord:
     """Converts a ValiationError from the json library to a custom error format for fw.
 
+    The error is packaged the way a FileError is, as an ErrorRecord rather
+    than a model, to keep errors cheap when there are millions of them.
+
     Args:
         schema_error: the ValdationError generated by the schema
 
     Returns:
-        a dictionary representation of a flywheel FileError
+        an ErrorRecord, which reads like the dict representation of a flywheel FileError
     """
-    fwerror = FileError(
-        **{
-            "type": "error",  # For now, jsonValidaor can only produce errors.
-            "code": str(schema_error.validator),
-            "location": schema_error.schema_path,
-            "value": str(schema_error.instance),
-            "expected": str(schema_error.schema),
-            "message": schema_error.message,
-            "timestamp": TIMESTAMP,
-        }
+    code = str(schema_error.validator)
+    message = schema_error.message
+    if code == "required":
+        key = message[1 : message.find("' is a required property")]
+        return ErrorRecord("error", code, {"key_path": key}, "", "", message, TIMESTAMP)
+    if schema_error.schema_path == [""]:
+        location = ""
+    else:
+        location = {"key_path": key_path(schema_error.schema_path)}
+    return ErrorRecord(
+        "error",  # For now, jsonValidaor can only produce errors.
+        code,
+        location,
+        str(schema_error.instance),
+        expected_string(schema_error.schema),
+        message,
+        TIMESTAMP,
     )
 
-    return fwerror.model_dump()
+
+def to_dicts(errors: t.Iterable[t.Mapping]) -> t.List[t.Dict]:
+    """Returns packaged errors as plain dicts, for output."""
+    return [
+        error.to_dict() if isinstance(error, ErrorRecord) else error for error in errors
+    ]
 
 
 def make_empty_file_error() -> ValidationError:
@@ -199,39 +360,177 @@ def make_bad_file_error() -> ValidationError:
     )
 
 
+def make_error_limit_error(limit: int) -> ValidationError:
+    """Makes an error for a file whose validation stopped at the error limit.
+
+    Args:
+        limit: the maximum number of errors reported
+
+    Returns:
+        ValidationError with validator = "error-limit"
+
+    """
+    return ValidationError(
+        **{
+            "validator": "error-limit",
+            "schema_path": [""],
+            "instance": "",
+            "schema": "",
+            "message": f"Validation stopped after {limit} errors, the file may have more.",
+            "path": "",
+        }
+    )
+
+
+# Maximum number of line numbers and of sample values kept for aggregated errors.
+AGGREGATE_LINES = 10
+AGGREGATE_SAMPLES = 5
+
+
+class ErrorAggregator:
+    """Groups packaged errors by code, column (or key path) and expected value.
+
+    Each group is reported as a single error, with the message of its first
+    error, the number of errors in it, the first line numbers they were found
+    on (for csv files) and a few distinct sample values.
+
+    Attributes:
+        total: the number of errors added
+    """
+
+    def __init__(
+        self, max_lines: int = AGGREGATE_LINES, max_samples: int = AGGREGATE_SAMPLES
+    ):
+        """Initializes an ErrorAggregator."""
+        self.max_lines = max_lines
+        self.max_samples = max_samples
+        self.total = 0
+        self.groups = {}
+
+    def add(self, error: t.Mapping) -> None:
+        """Adds a packaged error to its group."""
+        self.total += 1
+        location = error["location"]
+        line = None
+        if isinstance(location, dict) and "line" in location:
+            # The location of a csv error, without its row.
+            line = location["line"]
+            location = {"column_name": location["column_name"]}
+        field = (
+            location.get("column_name", location.get("key_path"))
+            if isinstance(location, dict)
+            else location
+        )
+        key = (error["code"], field, error["expected"])
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {
+                "type": error["type"],
+                "code": error["code"],
+                "location": location,
+                "value": error["value"],
+                "expected": error["expected"],
+                "message": error["message"],
+                "timestamp": error["timestamp"],
+                "count": 0,
+                "lines": [],
+                "sample_values": [],
+            }
+        group["count"] += 1
+        if line is not None and len(group["lines"]) < self.max_lines:
+            group["lines"].append(line)
+        samples = group["sample_values"]
+        if len(samples) < self.max_samples and error["value"] not in samples:
+            samples.append(error["value"])
+
+    def errors(self) -> t.List[t.Dict]:
+        """Returns an error for each group, in the order their first error was added."""
+        return list(self.groups.values())
+
+
 def add_flywheel_location_to_errors(fw_ref: FwReference, packaged_errors: list):
     """Takes a set of packaged errors and adds flywheel hierarchy info to them."""
-    hierarchy = fw_ref.hierarchy_objects
-    fw_url = fw_ref.get_lookup_path()
+    if not packaged_errors:
+        # The hierarchy is only fetched to locate errors.
+        return packaged_errors
     if fw_ref.contents == "file":
-        for e in packaged_errors:
-            e["flywheel_path"] = fw_url
-            e["container_id"] = hierarchy["file"]["file_id"]
-    else:
-        for e in packaged_errors:
-            location = e["location"].split(".")[0]
-            if location not in PARENT_ORDER:
-                raise ValueError(
-                    f"Value {location} not valid flywheel hierarchy location"
-                )
-            e["flywheel_path"] = fw_ref.get_lookup_path(level=location)
-            id_loc = "file_id" if location == "file" else "id"
-            e["container_id"] = hierarchy[location][id_loc]
+        return set_location(file_location(fw_ref), packaged_errors)
+    hierarchy = fw_ref.hierarchy_objects
+    for e in packaged_errors:
+        location = e["location"].split(".")[0]
+        if location not in PARENT_ORDER:
+            raise ValueError(f"Value {location} not valid flywheel hierarchy location")
+        e["flywheel_path"] = fw_ref.get_lookup_path(level=location)
+        id_loc = "file_id" if location == "file" else "id"
+        e["container_id"] = hierarchy[location][id_loc]
 
     return packaged_errors
 
 
+def file_location(fw_ref: FwReference) -> dict:
+    """Returns the flywheel location of the errors found in the content of a file."""
+    hierarchy = fw_ref.hierarchy_objects
+    return {
+        "flywheel_path": fw_ref.get_lookup_path(),
+        "container_id": hierarchy["file"]["file_id"],
+    }
+
+
+def set_location(location: dict, packaged_errors: list) -> list:
+    """Adds a flywheel location, as returned by file_location, to packaged errors."""
+    for e in packaged_errors:
+        e.update(location)
+    return packaged_errors
+
+
 def save_errors_metadata(
-    errors: t.List[t.Dict], input_file: FwReference, gtk_context: GearToolkitContext
+    errors: t.List[t.Dict],
+    input_file: FwReference,
+    gtk_context: "GearToolkitContext",
+    file_entry: t.Any = None,
+    profile: t.Optional[t.Dict] = None,
+    error_report: t.Optional[t.Dict] = None,
+    writer: t.Any = None,
 ):
-    """Saves the packaged errors to file metadata."""
-    if not errors:
+    """Saves the packaged errors to file metadata.
+
+    Args:
+        errors: the packaged errors
+        input_file: the validated file
+        gtk_context: the gear toolkit context
+        file_entry: the flywheel.FileEntry of a file that isn't a gear input
+            (e.g. in batch mode).  Its QC result is written through the SDK,
+            since .metadata.json can only describe the gear's inputs.
+        profile: the measurements of the run, as returned by
+            instrumentation.Profiler.summary, to add to the QC result
+        error_report: the summary of the ErrorReport the errors were written
+            to, as returned by report.ErrorReport.summary.  The QC result then
+            holds the summary instead of the errors.
+        writer: the metadata.MetadataWriter collecting the updates of the
+            file.  The QC result is added to it, to be written with the
+            file's tags, instead of being written right away.
+
+    """
+    if error_report is not None:
+        state = "FAIL" if errors or error_report["n_errors"] else "PASS"
+        meta_dict = {"error_report": error_report}
+    elif not errors:
         state = "PASS"
         meta_dict = {}
     else:
         state = "FAIL"
-        meta_dict = {"data": errors}
-
+        meta_dict = {"data": to_dicts(errors)}
+    if profile is not None:
+        meta_dict["profile"] = profile
+
+    if writer is not None:
+        writer.add_qc_result("validation", state=state, **meta_dict)
+        return
+    if file_entry is not None:
+        gtk_context.metadata.add_qc_result_via_sdk(
+            file_entry, "validation", state=state, **meta_dict
+        )
+        return
     gtk_context.metadata.add_qc_result(
         input_file.name, "validation", state=state, **meta_dict
     )
@@ -0,0 +1,272 @@
+"""incremental.py.
+
+Incremental re-validation of csv files.
+
+Sites often re-upload a csv after fixing a few of its rows.  Each row of a csv
+is validated on its own, so the errors of a row only depend on its values,
+the columns of the file and the schema.  A RowIndex keeps the fingerprint of
+every row validated, with the errors found in it.  When the same file
+(identified by its lineage: its parent container and name) is validated
+against the same schema again, rows whose fingerprint is in the previous
+index reuse its errors, and only new or changed rows are validated.
+
+Indexes are kept in a RowIndexStore, a directory shared between runs.  A
+gear job runs in a new container each time, so there is no default
+directory: incremental validation is enabled by setting
+FW_FILE_VALIDATOR_ROW_INDEX_DIR to a directory that persists between runs
+(e.g. a mounted volume).  A fingerprint is 8 bytes, so the index of a
+million-row file takes about 11 MB on disk, plus the errors, which is too
+much to keep in a file's flywheel metadata.  Like the other caches, the
+store is best effort: if it can't be read or written, every row is simply
+validated.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import typing as t
+from pathlib import Path
+
+from fw_gear_file_validator.cache import SchemaCache
+
+log = logging.getLogger(__name__)
+
+ROW_INDEX_DIR_ENV = "FW_FILE_VALIDATOR_ROW_INDEX_DIR"
+# Number of indexes kept by a store, beyond which the least recently used are removed.
+MAX_INDEXES = 256
+# Bump when the layout of stored indexes changes, so older ones are ignored.
+INDEX_VERSION = 1
+FINGERPRINT_SIZE = 8
+
+
+def fingerprint(row: t.Dict[str, str]) -> bytes:
+    """Returns the fingerprint of the values of a csv row, as read from the file."""
+    return hashlib.blake2b(
+        "\0".join(row.values()).encode("UTF-8", "surrogatepass"),
+        digest_size=FINGERPRINT_SIZE,
+    ).digest()
+
+
+def schema_key(validator: t.Any) -> str:
+    """Returns the hash of a validator's schema: its schema cache key if it has one."""
+    if validator.cache_key is not None:
+        return validator.cache_key
+    schema = validator.validator.schema
+    return SchemaCache.key(json.dumps(schema, sort_keys=True).encode("UTF-8"))
+
+
+def lineage(fw_ref: t.Any) -> str:
+    """Returns what identifies the successive uploads of a file: its parent and name."""
+    return f"{fw_ref.parent_type}-{fw_ref.parent_id}/{fw_ref.name}"
+
+
+class RowIndex:
+    """The fingerprints of the rows of a file, with the errors found in each.
+
+    The errors of a row are stored without their line, so they can be reused
+    wherever the row moved to.
+
+    Attributes:
+        key: the key of the index in its store
+        previous: the index of the previous validation of the file, if any
+        context: what the results of the rows depend on besides their values
+            (the columns, and whether empty values are dropped)
+        valid: the fingerprints of the rows without errors
+        errors: the errors of the rows with errors, by fingerprint
+        reused: the number of rows whose errors were taken from the previous index
+    """
+
+    def __init__(
+        self, previous: t.Optional["RowIndex"] = None, key: t.Optional[str] = None
+    ):
+        """Initializes a RowIndex."""
+        self.key = key
+        self.previous = previous
+        self.context = None
+        self.valid: t.Set[bytes] = set()
+        self.errors: t.Dict[bytes, t.List[t.Dict]] = {}
+        self.reused = 0
+
+    def __len__(self) -> int:
+        """Returns the number of distinct rows in the index."""
+        return len(self.valid) + len(self.errors)
+
+    def start(self, context: t.Sequence) -> None:
+        """Sets the context the rows are validated in.
+
+        The previous results are only reused if they were found in the same
+        context.  A new context (e.g. other columns) clears the index.
+        """
+        context = list(context)
+        if context == self.context:
+            return
+        if self.context is not None:
+            self.valid, self.errors = set(), {}
+        self.context = context
+        if self.previous is not None and self.previous.context != context:
+            log.info("The columns of the file changed, validating every row.")
+            self.previous = None
+
+    def lookup(self, row_fingerprint: bytes) -> t.Union[t.List[t.Dict], None]:
+        """Returns the errors of a row in the previous index, None if it isn't in it.
+
+        The row is added to this index if it is found.
+        """
+        previous = self.previous
+        if previous is None:
+            return None
+        if row_fingerprint in previous.valid:
+            self.valid.add(row_fingerprint)
+            self.reused += 1
+            return []
+        errors = previous.errors.get(row_fingerprint)
+        if errors is not None:
+            self.errors[row_fingerprint] = errors
+            self.reused += 1
+        return errors
+
+    def add(self, row_fingerprint: bytes, errors: t.List[t.Mapping]) -> None:
+        """Adds a validated row, with its packaged errors (csv location set)."""
+        if not errors:
+            self.valid.add(row_fingerprint)
+            return
+        self.errors[row_fingerprint] = [
+            {**error, "location": without_line(error["location"])} for error in errors
+        ]
+
+    def to_dict(self) -> dict:
+        """Returns the index as a json-serializable dict."""
+        return {
+            "version": INDEX_VERSION,
+            "context": self.context,
+            "valid": base64.b64encode(b"".join(sorted(self.valid))).decode("ascii"),
+            "errors": {fp.hex(): errors for fp, errors in self.errors.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RowIndex":
+        """Returns an index from its dict, as returned by to_dict."""
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported row index version {data.get('version')}")
+        index = cls()
+        index.context = data["context"]
+        valid = base64.b64decode(data["valid"])
+        index.valid = {
+            valid[start : start + FINGERPRINT_SIZE]
+            for start in range(0, len(valid), FINGERPRINT_SIZE)
+        }
+        index.errors = {
+            bytes.fromhex(fp): errors for fp, errors in data["errors"].items()
+        }
+        return index
+
+
+def without_line(location: t.Any) -> t.Any:
+    """Returns a csv error location without its line."""
+    if not isinstance(location, dict):
+        return location
+    return {key: value for key, value in location.items() if key != "line"}
+
+
+def place_errors(errors: t.List[t.Dict], row_num: int) -> t.List[t.Dict]:
+    """Returns copies of the stored errors of a row, located at a row of the file."""
+    return [
+        {
+            **error,
+            "location": {"line": row_num + 1, **error["location"]}
+            if error["location"]
+            else error["location"],
+        }
+        for error in errors
+    ]
+
+
+class RowIndexStore:
+    """Keeps row indexes as json files in a directory, shared between runs."""
+
+    def __init__(self, directory: t.Union[Path, str], max_indexes: int = MAX_INDEXES):
+        """Initializes a RowIndexStore.
+
+        Args:
+            directory: the store directory, which must persist between runs
+            max_indexes: the number of indexes kept
+        """
+        self.directory = Path(directory)
+        self.max_indexes = max_indexes
+
+    @classmethod
+    def default(cls) -> t.Union["RowIndexStore", None]:
+        """Returns a store in FW_FILE_VALIDATOR_ROW_INDEX_DIR, None if it isn't set."""
+        directory = os.environ.get(ROW_INDEX_DIR_ENV)
+        if directory:
+            return cls(directory)
+        return None
+
+    @staticmethod
+    def key(file_lineage: str, schema_hash: str) -> str:
+        """Returns the key of the index of a file validated against a schema."""
+        return hashlib.sha256(f"{file_lineage}\0{schema_hash}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def open(self, fw_ref: t.Any, csv_validator: t.Any) -> RowIndex:
+        """Returns a new index for a file, holding the previous one if it was stored.
+
+        Args:
+            fw_ref: the FwReference of the file
+            csv_validator: the CsvValidator the file is validated with
+        """
+        key = self.key(lineage(fw_ref), schema_key(csv_validator))
+        return RowIndex(previous=self.get(key), key=key)
+
+    def get(self, key: str) -> t.Union[RowIndex, None]:
+        """Returns the index stored under a key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="UTF-8") as fp:
+                index = RowIndex.from_dict(json.load(fp))
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            log.debug("Ignoring unreadable row index %s: %s", path, e)
+            return None
+        return index
+
+    def save(self, index: RowIndex) -> None:
+        """Stores an index under its key, then evicts the least recently used.
+
+        Empty indexes (e.g. of files that couldn't be read) aren't stored.
+        """
+        if index.key is None or not len(index):
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.directory, suffix=".tmp", delete=False, encoding="UTF-8"
+            ) as fp:
+                json.dump(index.to_dict(), fp)
+            os.replace(fp.name, self._path(index.key))
+            self.evict()
+        except (OSError, TypeError, ValueError) as e:
+            log.debug("Could not write row index %s: %s", index.key, e)
+        log.info(
+            "Reused the results of %d rows from the previous validation, %d distinct rows indexed.",
+            index.reused,
+            len(index),
+        )
+
+    def evict(self) -> None:
+        """Removes the least recently used files beyond max_indexes."""
+        files = []
+        for path in self.directory.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        for _, path in sorted(files)[: max(len(files) - self.max_indexes, 0)]:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,177 @@
+"""instrumentation.py.
+
+Measurements of the stages of a run.
+
+Each stage of a run (parsing the config, fetching the Flywheel objects,
+loading, validating, saving the metadata...) is measured by running it in a
+Profiler.stage block.  The wall time, CPU time and peak memory of the stage
+are recorded along with the number of rows and errors it handled, and logged
+at debug level.
+
+A disabled Profiler measures nothing: its stages are a shared no-op context
+manager and its rows aren't counted, so instrumented code runs as fast as
+it would without it.
+"""
+
+import contextlib
+import json
+import logging
+import resource
+import sys
+import time
+import typing as t
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+PROFILE_FILENAME = "validation_profile.json"
+# "log" logs the stages at debug level, "qc" also adds them to the QC result,
+# "file" also writes them to PROFILE_FILENAME in the output directory.
+PROFILE_MODES = ("off", "log", "qc", "file")
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident memory of the process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS.
+    return peak / (1024**2 if sys.platform == "darwin" else 1024)
+
+
+@dataclass
+class Stage:
+    """The measurements of a stage of a run.
+
+    Attributes:
+        name: the name of the stage
+        wall_seconds: the elapsed time
+        cpu_seconds: the CPU time of the process (not of worker processes)
+        peak_rss_mb: the peak resident memory of the process at the end of the stage
+        rss_growth_mb: how much the stage raised the peak resident memory
+        rows: the number of rows or items handled, if counted
+        errors: the number of errors found, if counted
+    """
+
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    rss_growth_mb: float = 0.0
+    rows: t.Optional[int] = None
+    errors: t.Optional[int] = None
+
+    def to_dict(self) -> dict:
+        """Returns the measurements that were taken, as a dict."""
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+
+# What a disabled Profiler's stages yield.  Counts set on it are discarded.
+_DISABLED_STAGE = contextlib.nullcontext(Stage("disabled"))
+
+
+class CountedRows:
+    """An iterator over rows that counts them, and proxies the other attributes."""
+
+    def __init__(self, rows: t.Iterable):
+        """Initializes CountedRows."""
+        self.rows = rows
+        self.iterator = iter(rows)
+        self.count = 0
+
+    def __iter__(self) -> "CountedRows":
+        """Returns the rows, which are an iterator."""
+        return self
+
+    def __next__(self) -> t.Any:
+        """Returns the next row."""
+        row = next(self.iterator)
+        self.count += 1
+        return row
+
+    def __getattr__(self, name: str) -> t.Any:
+        """Returns the attributes of the wrapped rows (e.g. CsvRows.byte_offset)."""
+        return getattr(self.rows, name)
+
+
+class Profiler:
+    """Measures the stages of a run.
+
+    Attributes:
+        enabled: whether the stages are measured
+        stages: the measured stages, in the order they ended
+    """
+
+    def __init__(self, enabled: bool = False):
+        """Initializes a Profiler."""
+        self.enabled = enabled
+        self.stages: t.List[Stage] = []
+
+    def stage(self, name: str) -> t.ContextManager[Stage]:
+        """Returns a context manager that measures the stage run in it.
+
+        The Stage it yields can be given the number of rows and errors of the
+        stage.  Its measurements are filled in when the block exits.
+        """
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return self._measure(name)
+
+    @contextlib.contextmanager
+    def _measure(self, name: str) -> t.Iterator[Stage]:
+        stage = Stage(name)
+        rss = peak_rss_mb()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield stage
+        finally:
+            stage.wall_seconds = time.perf_counter() - wall
+            stage.cpu_seconds = time.process_time() - cpu
+            stage.peak_rss_mb = peak_rss_mb()
+            stage.rss_growth_mb = stage.peak_rss_mb - rss
+            self.stages.append(stage)
+            log.debug(
+                "Stage %s: %.3fs wall, %.3fs cpu, peak rss %.1f MB (+%.1f MB)%s%s",
+                name,
+                stage.wall_seconds,
+                stage.cpu_seconds,
+                stage.peak_rss_mb,
+                stage.rss_growth_mb,
+                "" if stage.rows is None else f", {stage.rows} rows",
+                "" if stage.errors is None else f", {stage.errors} errors",
+            )
+
+    def count_rows(self, rows: t.Any) -> t.Any:
+        """Returns the rows, wrapped to be counted as they are read if they are an iterator.
+
+        Use rows_read to get the count.  Rows are only wrapped when the
+        Profiler is enabled.
+        """
+        if not self.enabled or not isinstance(rows, t.Iterator):
+            return rows
+        return CountedRows(rows)
+
+    @staticmethod
+    def rows_read(rows: t.Any) -> t.Optional[int]:
+        """Returns the number of rows of a document, or read from rows returned by count_rows."""
+        if isinstance(rows, CountedRows):
+            return rows.count
+        if isinstance(rows, (list, dict)):
+            return len(rows)
+        return None
+
+    def summary(self) -> dict:
+        """Returns the measured stages and their totals."""
+        return {
+            "stages": [stage.to_dict() for stage in self.stages],
+            "total": {
+                "wall_seconds": sum(stage.wall_seconds for stage in self.stages),
+                "cpu_seconds": sum(stage.cpu_seconds for stage in self.stages),
+                "peak_rss_mb": peak_rss_mb(),
+            },
+        }
+
+    def write(self, path: Path) -> None:
+        """Writes the summary to a json file."""
+        with open(path, "w") as fp:
+            json.dump(self.summary(), fp, indent=2)
@@ -0,0 +1,131 @@
+"""json_backend.py.
+
+Json parsing for schemas and input files.
+
+Files are memory-mapped and parsed from the mapped bytes with orjson when it
+is installed, which is faster than the stdlib json module and avoids decoding
+the whole file into a str first.  Without orjson, or when the stdlib is
+selected, the stdlib json module is used.  Garbage collection is paused while
+parsing, since the collector would otherwise repeatedly scan the millions of
+containers a large document is made of.
+
+Both backends return the same objects for any document.  orjson is stricter
+than the stdlib (e.g. it rejects NaN, and lone surrogates in strings) and
+turns integers too large for 64 bits into floats, so documents it rejects or
+that contain such integers are parsed by the stdlib instead.  Errors are
+therefore always the ones the stdlib raises.
+"""
+
+import gc
+import json
+import mmap
+import os
+import typing as t
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+BACKEND_ENV = "FW_FILE_VALIDATOR_JSON_BACKEND"
+
+# Integer literals this long may not fit in 64 bits.
+LONG_DIGITS = 19
+# Maps digits to "0" and everything else to " ", to find runs of digits quickly.
+DIGITS_TABLE = bytes(
+    ord("0") if chr(i) in "0123456789" else ord(" ") for i in range(256)
+)
+# Number of bytes scanned for long digit runs at a time.
+SCAN_SIZE = 1024 * 1024
+
+
+def _has_long_digits(data: t.Union[bytes, memoryview]) -> bool:
+    """Returns True if the data has a run of LONG_DIGITS digits or more."""
+    run = b"0" * LONG_DIGITS
+    with memoryview(data) as view:
+        for start in range(0, len(view), SCAN_SIZE):
+            # Overlap the chunks so runs split across them are found.
+            chunk = view[max(start - LONG_DIGITS + 1, 0) : start + SCAN_SIZE]
+            if run in chunk.tobytes().translate(DIGITS_TABLE):
+                return True
+    return False
+
+
+def _stdlib_loads(data: t.Union[bytes, memoryview]) -> t.Any:
+    """Parses json like json.load does on a file opened as UTF-8 text."""
+    return json.loads(bytes(data).decode("UTF-8"))
+
+
+def _orjson_loads(data: t.Union[bytes, memoryview]) -> t.Any:
+    """Parses json with orjson, falling back to the stdlib where they differ."""
+    if _has_long_digits(data):
+        return _stdlib_loads(data)
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return _stdlib_loads(data)
+
+
+BACKENDS = {"stdlib": _stdlib_loads}
+if orjson is not None:
+    BACKENDS["orjson"] = _orjson_loads
+
+
+def default_backend() -> str:
+    """Returns the backend set in FW_FILE_VALIDATOR_JSON_BACKEND, else the fastest one installed."""
+    backend = os.environ.get(BACKEND_ENV)
+    if backend:
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown json backend {backend}, expected one of {list(BACKENDS)}"
+            )
+        return backend
+    return "orjson" if "orjson" in BACKENDS else "stdlib"
+
+
+def loads(data: t.Union[bytes, memoryview], backend: t.Optional[str] = None) -> t.Any:
+    """Parses a json document from its bytes.
+
+    Args:
+        data: the UTF-8 encoded json document
+        backend: the parser to use, see BACKENDS.  Defaults to default_backend().
+
+    Returns:
+        the parsed document
+
+    Raises:
+        json.JSONDecodeError: if the document isn't valid json
+        UnicodeDecodeError: if the document isn't valid UTF-8
+
+    """
+    parse = BACKENDS[backend or default_backend()]
+    # Parsing creates many containers, which would trigger garbage collection
+    # passes over every object created so far.  None of them can be garbage.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return parse(data)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def load_file(file_path: t.Union[Path, str], backend: t.Optional[str] = None) -> t.Any:
+    """Parses a json file from a memory map of it.
+
+    Args:
+        file_path: the path of the json file
+        backend: the parser to use, see BACKENDS.  Defaults to default_backend().
+
+    Returns:
+        the parsed document
+
+    """
+    with open(file_path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            # Empty files can't be mapped.
+            return loads(b"", backend)
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as data:
+                return loads(data, backend)
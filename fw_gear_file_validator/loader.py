@@ -10,9 +10,11 @@ import typing as t
 from abc import ABC, abstractmethod
 from pathlib import Path
 
-from flywheel_gear_toolkit.utils.datatypes import Container
-
 import fw_gear_file_validator.errors as err
+from fw_gear_file_validator import json_backend
+from fw_gear_file_validator.mapped_csv import MappedCsv
+from fw_gear_file_validator.streaming import JsonStream
+from fw_gear_file_validator.utils import PARENT_ORDER, FwReference
 
 PARENT_INCLUDE = [
     # General values
@@ -34,6 +36,103 @@ PARENT_INCLUDE = [
     "lastname",
 ]
 
+# Schema keywords that only constrain the members an object has through
+# `properties` and `required`.  A schema with any other keyword (e.g.
+# additionalProperties, allOf) may depend on every member.
+PROJECTABLE_KEYWORDS = {
+    "$schema",
+    "$id",
+    "$comment",
+    "title",
+    "description",
+    "default",
+    "examples",
+    "definitions",
+    "type",
+    "properties",
+    "required",
+}
+
+
+def schema_projection(schema: t.Any) -> t.Union[t.Dict[str, t.Optional[set]], None]:
+    """Works out which hierarchy levels, and which of their fields, a schema references.
+
+    The levels are the members of the schema's top level `properties` and
+    `required`.  The fields of a level are the members of its own
+    `properties` and `required`, or all of them if its schema constrains
+    them in other ways.  Local `$ref`s to the definitions are followed.
+
+    Args:
+        schema: the validation schema of the flywheel hierarchy
+
+    Returns:
+        {level: the referenced fields, or None for all the fields}, or None
+        if the schema may reference any level (i.e. every level is needed)
+
+    """
+    if not isinstance(schema, dict) or not set(schema) <= PROJECTABLE_KEYWORDS:
+        return None
+    properties = schema.get("properties", {})
+    levels = [
+        level
+        for level in PARENT_ORDER
+        if level in properties or level in schema.get("required", [])
+    ]
+    projection = {}
+    for level in levels:
+        subschema = properties.get(level, {})
+        ref = subschema.get("$ref") if isinstance(subschema, dict) else None
+        if ref is not None and len(subschema) == 1:
+            subschema = _resolve_definition(schema, ref)
+        if isinstance(subschema, dict) and set(subschema) <= PROJECTABLE_KEYWORDS:
+            projection[level] = set(subschema.get("properties", {})) | set(
+                subschema.get("required", [])
+            )
+        else:
+            projection[level] = None
+    return projection
+
+
+def _resolve_definition(schema: dict, ref: str) -> t.Any:
+    """Returns the definition a local `$ref` points at, or None if it isn't one."""
+    prefix = "#/definitions/"
+    if not ref.startswith(prefix):
+        return None
+    return schema.get("definitions", {}).get(ref[len(prefix) :])
+
+
+def project_container(
+    container: t.Any, fields: t.Optional[t.Iterable[str]] = None
+) -> dict:
+    """Returns the fields of a container that are validated, as its to_dict() has them.
+
+    Only the requested fields are converted, rather than serializing the
+    whole container (its files, notes, permissions...) and filtering it.
+
+    Args:
+        container: a flywheel container, or the dict of one
+        fields: the fields to keep, all of PARENT_INCLUDE by default
+
+    Returns:
+        the fields of the container, among PARENT_INCLUDE
+
+    """
+    if fields is None:
+        keep = PARENT_INCLUDE
+    else:
+        keep = [name for name in PARENT_INCLUDE if name in fields]
+    if isinstance(container, dict):
+        return {name: container[name] for name in keep if name in container}
+    swagger_types = getattr(type(container), "swagger_types", None)
+    if swagger_types is None:
+        return {k: v for k, v in container.to_dict().items() if k in keep}
+    projected = {}
+    for name in keep:
+        if name in swagger_types:
+            value = getattr(container, name)
+            projected[name] = value.to_dict() if hasattr(value, "to_dict") else value
+    return projected
+
 
 class Loader(ABC):
     """Abstract base class for loaders.
@@ -45,7 +144,9 @@ class Loader(ABC):
     has_config = False
 
     @classmethod
-    def factory(cls, name: str, config: t.Dict[str, t.Any] = None) -> "Loader":
+    def factory(
+        cls, name: str, config: t.Optional[t.Dict[str, t.Any]] = None
+    ) -> "Loader":
         """Returns a configured loader based on the name and config provided."""
         loader = None
         for subclass in cls.__subclasses__():
@@ -92,21 +193,31 @@ class JsonLoader(Loader):
     """Loads a JSON file."""
 
     name = "json"
-    has_config = False
+    has_config = True
 
-    def __init__(self):
-        """Yet another extremely complicated function worthy of a docstring."""
+    def __init__(self, config: t.Optional[t.Dict[str, t.Any]] = None):
+        """Initializes a JsonLoader object.
+
+        Args:
+            config: the loader config.  With "stream_json" set, load_object
+                returns a JsonStream, which is read and validated one top level
+                item at a time instead of being loaded whole.
+        """
         super().__init__()
+        self.stream = bool((config or {}).get("stream_json"))
 
-    def load_object(self, file_path: Path) -> t.Tuple[dict, t.List[t.Dict]]:
-        """Returns the content of the JSON file as a dict."""
+    def load_object(
+        self, file_path: Path
+    ) -> t.Tuple[t.Union[dict, JsonStream], t.List[t.Dict]]:
+        """Returns the content of the JSON file as a dict, or as a JsonStream."""
         try:
             # Check for empty file
             format_errors = self.validate_file_format(file_path)
             if format_errors:
                 return None, format_errors
-            with open(file_path, "r", encoding="UTF-8") as fp:
-                content = json.load(fp)
+            if self.stream:
+                return JsonStream(file_path), None
+            content = json_backend.load_file(file_path)
             return content, None
         except (FileNotFoundError, json.JSONDecodeError) as e:
             raise ValueError(f"Error loading JSON object: {e}")
@@ -140,26 +251,56 @@ class FwLoader(Loader):
         this initializes an object for loading a flywheel object,
         with or without its parents.
 
+        If the config has the schema the objects are validated against, only
+        the hierarchy levels and the fields the schema references are loaded
+        (see schema_projection).
+
         Args:
             config: the loader config
         """
         self.add_parents = config.get("add_parents")
+        self.projection = None
+        schema_file_path = config.get("schema_file_path")
+        if schema_file_path is not None:
+            schema, _ = self.load_schema(schema_file_path)
+            self.projection = schema_projection(schema)
 
-    def load_object(self, fw_hierarchy: dict) -> t.Tuple[dict, t.List[t.Dict]]:
-        """Returns the content of the Flywheel reference as a dict."""
-        # currently no validation here
+    def get_levels(self) -> t.Union[t.List[str], None]:
+        """Returns the hierarchy levels to load, None for all of them.
+
+        Without the parents, the file is always loaded, even if the schema
+        doesn't name it.  Only the parents the schema doesn't need are skipped.
+        """
         if not self.add_parents:
-            fw_hierarchy = {"file": fw_hierarchy["file"]}
+            return ["file"]
+        if self.projection is None:
+            return None
+        return [level for level in PARENT_ORDER if level in self.projection]
 
-        for k, container in fw_hierarchy.items():
-            fw_hierarchy[k] = self._filter_container(container)
-        return fw_hierarchy, None
+    def load_object(
+        self, fw_hierarchy: t.Union[FwReference, dict]
+    ) -> t.Tuple[dict, t.List[t.Dict]]:
+        """Returns the content of the Flywheel reference as a dict.
 
-    @staticmethod
-    def _filter_container(container: Container):
-        """Filters the container to remove unwanted fields."""
-        cont_f = {k: v for k, v in container.to_dict().items() if k in PARENT_INCLUDE}
-        return cont_f
+        Args:
+            fw_hierarchy: the reference of the flywheel object, whose
+                hierarchy levels are fetched as needed, or the hierarchy
+                already fetched
+
+        """
+        # currently no validation here
+        levels = self.get_levels()
+        if isinstance(fw_hierarchy, FwReference):
+            fw_hierarchy = fw_hierarchy.get_hierarchy(levels)
+        elif not self.add_parents:
+            fw_hierarchy = {"file": fw_hierarchy["file"]}
+        projection = self.projection or {}
+
+        return {
+            level: project_container(container, projection.get(level))
+            for level, container in fw_hierarchy.items()
+            if levels is None or level in levels
+        }, None
 
 
 class CsvLoader(Loader):
@@ -172,34 +313,46 @@ class CsvLoader(Loader):
         """Surprisingly this does not initialize this class.  NO, OF COURSE IT DOES, WHY DO I NEED A DOCSTRING?"""
         super().__init__()
 
-    def load_object(self, file_path: Path) -> t.Tuple[t.List[t.Dict], t.List[t.Dict]]:
-        """Returns the content of the csv file as a list of dicts."""
+    def load_object(self, file_path: Path) -> t.Tuple["CsvRows", t.List[t.Dict]]:
+        """Returns the content of the csv file as a stream of row dicts.
+
+        The file is memory-mapped and tokenized exactly once.  The header is
+        checked for emptiness and duplicate columns up front, and every
+        following row has its field count checked as it is streamed to the
+        validator.  A malformed row found part way through raises
+        err.FileFormatError from the stream.
+        """
         try:
-            format_errors = self.validate_file_format(file_path)
-            if format_errors:
-                return None, format_errors
-            with open(file_path) as csv_file:
-                csv_dict = csv.DictReader(csv_file)
-                return list(csv_dict), None
-        except (FileNotFoundError, TypeError) as e:
-            raise ValueError(f"Error loading CSV object: {e}")
+            source = MappedCsv(file_path).open()
+        except Exception as e:
+            unknown_error = err.make_malformed_file_error()
+            unknown_error.message = str(e)
+            return None, self.handle_errors([unknown_error])
+
+        records = iter(source)
+        header, header_error = self.read_header(records)
+        if header_error:
+            source.close()
+            return None, self.handle_errors([header_error])
+
+        return CsvRows(source, records, header), None
 
     def validate_file_format(
         self, csv_path: Path
     ) -> t.Union[err.ValidationError, None]:
-        """Validates some basic file format items."""
+        """Validates some basic file format items in a single pass over the file."""
         errors = []
         try:
             with open(csv_path) as csv_file:
-                # First check to see if we have the correct number of commas in each row
-                syntax_errors = self.validate_num_commas(csv_file)
-                if syntax_errors:
-                    errors.append(syntax_errors)
-                # Then check to see if any headers are duplicated
-                csv_file.seek(0)
-                header_errors = self.validate_file_header(csv_file)
-                if header_errors:
-                    errors.append(header_errors)
+                reader = csv.reader(csv_file)
+                header, header_error = self.read_header(reader)
+                if header_error:
+                    errors.append(header_error)
+                else:
+                    for _ in self.check_rows(reader, len(header)):
+                        pass
+        except err.FileFormatError as e:
+            errors.append(e.error)
         # If we had an error here loading the file or otherwise, captuer that.
         except Exception as e:
             unknown_error = err.make_malformed_file_error()
@@ -211,38 +364,122 @@ class CsvLoader(Loader):
         return None
 
     @staticmethod
-    def validate_num_commas(
-        csv_file: io.TextIOWrapper,
-    ) -> t.Union[err.ValidationError, None]:
-        """Validates that the number of fields in each row is consistent.
+    def read_header(
+        reader: t.Iterator,
+    ) -> t.Tuple[t.List[str], t.Union[err.ValidationError, None]]:
+        """Reads the header row from a csv reader and checks that it is valid.
+
+        Args:
+            reader: a csv.reader positioned at the start of the file
+
+        Returns:
+            the header, and an error if it is missing or has duplicate columns
+
+        """
+        try:
+            header = next(reader, [])
+        except (csv.Error, ValueError) as e:
+            error = err.make_malformed_file_error()
+            error.message = f"CSV parsing error: {str(e)}"
+            return [], error
+        if not "".join(header).strip():
+            return header, err.make_empty_file_error()
+        if len(header) != len(set(header)):
+            return header, err.make_duplicate_header_error()
+        return header, None
+
+    @staticmethod
+    def check_rows(reader: t.Iterator, expected_fields: int) -> t.Iterator[t.List]:
+        """Yields the rows of a csv reader, checking each has as many fields as the header.
 
         Properly handles quoted fields that may contain commas.
+
+        Args:
+            reader: a csv.reader positioned just after the header
+            expected_fields: the number of fields in the header
+
+        Raises:
+            err.FileFormatError: on the first row that is malformed.
+
         """
-        csv_file.seek(0)  # Ensure we're at the start of the file
         try:
-            reader = csv.reader(csv_file)
-            header = next(reader)
-            expected_fields = len(header)
             for line_num, row in enumerate(reader, start=1):
                 if len(row) != expected_fields:
                     error = err.make_malformed_file_error()
                     error.message = f"Row {line_num} has {len(row)} fields while the header has {expected_fields} fields."
-                    return error
-            return None
-        except csv.Error as e:
+                    raise err.FileFormatError(error)
+                yield row
+        except (csv.Error, ValueError) as e:
             error = err.make_malformed_file_error()
             error.message = f"CSV parsing error: {str(e)}"
-            return error
+            raise err.FileFormatError(error)
 
-    @staticmethod
+    @classmethod
+    def validate_num_commas(
+        cls,
+        csv_file: io.TextIOWrapper,
+    ) -> t.Union[err.ValidationError, None]:
+        """Validates that the number of fields in each row is consistent.
+
+        Properly handles quoted fields that may contain commas.
+        """
+        csv_file.seek(0)  # Ensure we're at the start of the file
+        reader = csv.reader(csv_file)
+        header, header_error = cls.read_header(reader)
+        if header_error and header_error.validator == "malformed-file":
+            return header_error
+        try:
+            for _ in cls.check_rows(reader, len(header)):
+                pass
+        except err.FileFormatError as e:
+            return e.error
+        return None
+
+    @classmethod
     def validate_file_header(
+        cls,
         csv_file: io.TextIOWrapper,
     ) -> t.Union[err.ValidationError, None]:
         """Validates that the first row of a csv is a valid header/exists."""
-        first_line = csv_file.readline().strip()
-        if not first_line:
-            return err.make_empty_file_error()
-        csv_headers = first_line.split(",")
-        if len(csv_headers) != len(set(csv_headers)):
-            return err.make_duplicate_header_error()
-        return None
+        _, header_error = cls.read_header(csv.reader(csv_file))
+        return header_error
+
+
+class CsvRows:
+    """An iterator over the checked rows of a memory-mapped csv file, as dicts.
+
+    The file is closed once all the rows have been read.  The byte offset of
+    the rows read can be looked up to locate errors.
+    """
+
+    def __init__(
+        self, source: MappedCsv, records: t.Iterator[t.List[str]], header: t.List[str]
+    ):
+        """Initializes CsvRows.
+
+        Args:
+            source: the open csv file
+            records: the records of the file, positioned just after the header
+            header: the header of the file
+        """
+        self.source = source
+        self.header = header
+        self._rows = self._stream_rows(records)
+
+    def __iter__(self) -> "CsvRows":
+        """Returns the rows, which are an iterator."""
+        return self
+
+    def __next__(self) -> t.Dict:
+        """Returns the next checked row."""
+        return next(self._rows)
+
+    def _stream_rows(self, records: t.Iterator[t.List[str]]) -> t.Iterator[t.Dict]:
+        """Yields the checked rows as dicts, closing the file when done."""
+        with self.source:
+            for row in CsvLoader.check_rows(records, len(self.header)):
+                yield dict(zip(self.header, row))
+
+    def byte_offset(self, line: int) -> t.Union[int, None]:
+        """Returns the byte offset of a row, numbered from 0 for the header."""
+        return self.source.byte_offset(line)
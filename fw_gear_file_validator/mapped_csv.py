@@ -0,0 +1,183 @@
+"""mapped_csv.py.
+
+Memory-mapped reading of csv files.
+
+The file is memory-mapped and handed to the csv module one block of whole
+lines at a time, so it is never read into Python buffers as a whole and the
+tokenizer never sees a partial line.  Each block is decoded at once, and the
+quote-aware splitting of rows and fields is left to the C tokenizer of the
+csv module, which is faster than splitting and decoding the fields of each
+row in Python.  Lines are split like a file opened in text mode splits them,
+so the rows are the same as csv.reader(open(file_path)) returns.
+
+The byte offset of every row is available to locate errors.  Only the offset
+of each block and the rows whose quoted fields span several lines are kept
+while reading; the lines of a block are located when an offset in it is
+asked for.
+"""
+
+import bisect
+import csv
+import io
+import locale
+import mmap
+import os
+import re
+import typing as t
+from array import array
+from pathlib import Path
+
+# Number of bytes handed to the csv tokenizer at a time.
+BLOCK_SIZE = 1024 * 1024
+
+# Line breaks of a file opened in text mode (universal newlines).
+LINE_BREAK = re.compile(rb"\r\n|\r|\n")
+
+
+class MappedCsv:
+    """A memory-mapped csv file, read as csv records.
+
+    Records are numbered from 0, the header.  A record can span several lines
+    when a quoted field has line breaks in it.
+
+    Attributes:
+        file_path: the path of the csv file
+        block_size: the number of bytes handed to the csv tokenizer at a time
+        encoding: the encoding of the file, by default the one open() uses
+    """
+
+    def __init__(
+        self,
+        file_path: t.Union[Path, str],
+        block_size: t.Optional[int] = None,
+        encoding=None,
+    ):
+        """Initializes a MappedCsv."""
+        self.file_path = Path(file_path)
+        self.block_size = block_size or BLOCK_SIZE
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.size = 0
+        self._file = None
+        self._mapped = None
+        # Byte offsets and index of the first line of each block read so far.
+        self._block_offsets = array("q")
+        self._block_ends = array("q")
+        self._block_lines = array("q")
+        # The records from which the first line of a record is not its index,
+        # with the difference, which changes after each multi-line record.
+        self._shift_records = array("q", [0])
+        self._shifts = array("q", [0])
+        # Line starts of the last block an offset was looked up in.
+        self._line_starts = (None, None)
+
+    def open(self) -> "MappedCsv":
+        """Opens and maps the file.
+
+        Raises:
+            OSError: if the file can't be opened
+        """
+        # The handle is owned by the MappedCsv, and closed by close() (or __exit__).
+        self._file = open(self.file_path, "rb")  # noqa: SIM115
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            if self.size:
+                # Empty files can't be mapped.
+                self._mapped = mmap.mmap(
+                    self._file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def close(self) -> None:
+        """Unmaps and closes the file.  Byte offsets can still be looked up."""
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "MappedCsv":
+        """Opens the file if it isn't open yet."""
+        return self if self._file is not None else self.open()
+
+    def __exit__(self, *exc_info) -> None:
+        """Closes the file."""
+        self.close()
+
+    def _lines(self) -> t.Iterator[str]:
+        """Yields the lines of the mapped file, one block at a time."""
+        pos = 0
+        lines = 0
+        while pos < self.size:
+            # Blocks end just after a "\n", so a "\r\n" or a multi-byte
+            # character is never split between two blocks.
+            end = self._mapped.find(b"\n", min(pos + self.block_size, self.size) - 1)
+            end = self.size if end < 0 else end + 1
+            block = self._mapped[pos:end]
+            self._block_offsets.append(pos)
+            self._block_ends.append(end)
+            self._block_lines.append(lines)
+            lines += block.count(b"\n") + block.count(b"\r") - block.count(b"\r\n")
+            if not block.endswith((b"\n", b"\r")):
+                lines += 1
+            yield from io.StringIO(block.decode(self.encoding), newline=None)
+            pos = end
+
+    def __iter__(self) -> t.Iterator[t.List[str]]:
+        """Yields the records of the file, the header first.
+
+        Raises:
+            csv.Error: if the file can't be tokenized
+            ValueError: if the file can't be decoded
+        """
+        if self._file is None:
+            raise ValueError(f"{self.file_path} is not open")
+        reader = csv.reader(self._lines())
+        shift = 0
+        for record, row in enumerate(reader):
+            yield row
+            if reader.line_num != record + 1 + shift:
+                shift = reader.line_num - record - 1
+                self._shift_records.append(record + 1)
+                self._shifts.append(shift)
+
+    def byte_offset(self, record: int) -> t.Union[int, None]:
+        """Returns the byte offset in the file of a record already read.
+
+        Args:
+            record: the index of the record, 0 being the header
+
+        Returns:
+            the offset of the first byte of the record, None if it wasn't read
+        """
+        if record < 0:
+            return None
+        index = bisect.bisect_right(self._shift_records, record) - 1
+        line = record + self._shifts[index]
+        block = bisect.bisect_right(self._block_lines, line) - 1
+        if block < 0:
+            return None
+        starts = self._block_line_starts(block)
+        within = line - self._block_lines[block]
+        if within >= len(starts):
+            return None
+        return self._block_offsets[block] + starts[within]
+
+    def _block_line_starts(self, block: int) -> array:
+        """Returns the offsets of the lines of a block, relative to the block."""
+        cached_block, starts = self._line_starts
+        if cached_block == block:
+            return starts
+        start = self._block_offsets[block]
+        with open(self.file_path, "rb") as fp:
+            fp.seek(start)
+            data = fp.read(self._block_ends[block] - start)
+        starts = array("q", [0])
+        starts.extend(match.end() for match in LINE_BREAK.finditer(data))
+        if starts[-1] == len(data):
+            starts.pop()
+        self._line_starts = (block, starts)
+        return starts
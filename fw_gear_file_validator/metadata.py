@@ -0,0 +1,120 @@
+"""metadata.py.
+
+Consolidated metadata updates of a validated file.
+
+A validated file gets a QC result and a PASS or FAIL tag, replacing the tag
+of an earlier run.  Written with one toolkit helper each, they took several
+metadata operations per file, and an API call to fetch the file's current
+tags.  A MetadataWriter collects the tag changes and QC results of a file,
+then writes them in one update:
+
+    - the gear's input file gets a single entry in .metadata.json, holding
+      both its info and its tags
+    - other files (e.g. in batch mode) are updated through the SDK, with one
+      call for their info, and one to set their tags if they changed.  The
+      API has no call updating both.
+
+The current tags of a file are taken from the gear input object, or from
+its FileEntry, which already hold them.  The file is only fetched if the
+input object doesn't list its tags.
+"""
+
+import logging
+import typing as t
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    import flywheel
+    from flywheel_gear_toolkit import GearToolkitContext
+
+log = logging.getLogger(__name__)
+
+
+class MetadataWriter:
+    """Collects the metadata updates of a file, and writes them in one go.
+
+    Attributes:
+        context: the gear toolkit context
+        file: the gear input object of the file (as in config.json), or its
+            FileEntry for files that aren't gear inputs
+        tags: the tags of the file, with the changes made so far
+        qc_results: the QC results to add, as (name, state, data) tuples
+    """
+
+    def __init__(
+        self,
+        context: "GearToolkitContext",
+        file: t.Union[dict, "flywheel.FileEntry"],
+    ):
+        """Initializes a MetadataWriter."""
+        self.context = context
+        self.file = file
+        if isinstance(file, dict):
+            file_object = file.get("object", {})
+            tags = file_object.get("tags")
+            if tags is None:
+                # Without them, setting the tags would drop those the file has.
+                log.debug("The input object has no tags, fetching the file.")
+                tags = context.client.get_file(file_object["file_id"]).tags
+            self._original_tags = list(tags or [])
+        else:
+            self._original_tags = list(file.tags or [])
+        self.tags = list(self._original_tags)
+        self.qc_results = []
+
+    @property
+    def is_input(self) -> bool:
+        """Returns True if the file is the gear's input, written to .metadata.json."""
+        return isinstance(self.file, dict)
+
+    def add_tag(self, tag: str) -> None:
+        """Adds a tag to the file."""
+        if tag not in self.tags:
+            self.tags.append(tag)
+
+    def remove_tag(self, tag: str) -> None:
+        """Removes a tag from the file, if it has it."""
+        self.tags = [file_tag for file_tag in self.tags if file_tag != tag]
+
+    def add_qc_result(self, name: str, state: str, **data) -> None:
+        """Adds a QC result to the file, like GearToolkitContext.metadata.add_qc_result."""
+        self.qc_results.append((name, state, data))
+
+    def flush(self) -> None:
+        """Writes the collected updates, then clears them."""
+        from flywheel_gear_toolkit.utils.metadata import File, create_qc_result_dict
+
+        metadata = self.context.metadata
+        if self.is_input:
+            file_obj = File.from_config(self.file)
+        else:
+            file_obj = File.from_sdk(self.file)
+        info = None
+        for name, state, data in self.qc_results:
+            info = metadata.add_gear_info(
+                "qc", file_obj, **create_qc_result_dict(name, state, **data)
+            )
+        tags_changed = self.tags != self._original_tags
+
+        if self.is_input:
+            update = {}
+            if info is not None:
+                update["info"] = info
+            if tags_changed:
+                update["tags"] = self.tags
+            if update:
+                metadata.update_file_metadata(
+                    self.file, container_type=file_obj.parent_type, **update
+                )
+        else:
+            if info is not None:
+                metadata.modify_container_file_info(file_obj, **info)
+            if tags_changed:
+                self.context.client.set_file_tags(self.file.file_id, self.tags)
+        log.debug(
+            "Wrote %d QC results%s to %s",
+            len(self.qc_results),
+            " and tags" if tags_changed else "",
+            file_obj.name,
+        )
+        self._original_tags = list(self.tags)
+        self.qc_results = []
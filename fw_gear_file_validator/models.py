@@ -0,0 +1,38 @@
+"""models.py.
+
+The pydantic model of a file error.
+"""
+
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class FileError(BaseModel):
+    """Represents an error that might be found in file."""
+
+    model_config = ConfigDict(populate_by_name=True)
+    type: Literal["alert", "error"] = Field(serialization_alias="type")
+    code: str = Field(serialization_alias="code")
+    location: Optional[Any] = None
+    value: Optional[str] = None
+    expected: Optional[str] = None
+    message: str = None
+    timestamp: Optional[str] = None
+
+    def model_post_init(self, __context) -> None:
+        """Logic to be carried out after initialization."""
+        # handle the error location options
+        if self.location == [""]:
+            self.location = ""
+        else:
+            self.location = {
+                "key_path": ".".join([str(loc) for loc in self.location][:-1])
+            }
+
+        # handle required:
+        if self.code == "required":
+            key = self.message[1 : self.message.find("' is a required property")]
+            self.location = {"key_path": key}
+            self.value = ""
+            self.expected = ""
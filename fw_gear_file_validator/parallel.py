@@ -0,0 +1,91 @@
+"""parallel.py.
+
+Validates csv rows in chunks across multiple processes.
+"""
+
+import itertools
+import typing as t
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Number of rows sent to a worker at a time.
+CHUNK_SIZE = 1000
+# Number of chunks queued per worker, bounding how much of the file is in memory.
+CHUNKS_PER_WORKER = 2
+
+# The validator of a worker process, built once by _init_worker.
+_worker_validator = None
+
+
+def _init_worker(schema: dict) -> None:
+    """Builds the CsvValidator (and its compiled row checks) for a worker process."""
+    from fw_gear_file_validator.validator import CsvValidator
+
+    global _worker_validator
+    _worker_validator = CsvValidator(schema)
+
+
+def _validate_chunk(
+    rows: t.List[t.Dict], drop_empty: bool, first_row: int
+) -> t.List[t.Dict]:
+    """Validates a chunk of rows in a worker process."""
+    return list(_worker_validator.iter_row_errors(rows, drop_empty, first_row))
+
+
+def iter_chunks(
+    rows: t.Iterable[t.Dict], chunk_size: int
+) -> t.Iterator[t.Tuple[int, t.List[t.Dict]]]:
+    """Splits a stream of rows into chunks.
+
+    Args:
+        rows: the rows to split
+        chunk_size: the maximum number of rows in a chunk
+
+    Yields:
+        the index of the chunk's first row in the stream, and the chunk
+
+    """
+    rows = iter(rows)
+    first_row = 0
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        yield first_row, chunk
+        first_row += len(chunk)
+
+
+def iter_chunked_errors(
+    schema: dict,
+    rows: t.Iterable[t.Dict],
+    drop_empty: bool,
+    n_workers: int,
+    chunk_size: t.Optional[int] = None,
+) -> t.Iterator[t.Dict]:
+    """Validates csv rows in a pool of processes, yielding errors in row order.
+
+    Only a bounded number of chunks is submitted ahead of the one whose errors
+    are being yielded, so the row stream is never read far ahead of validation.
+
+    Args:
+        schema: the validation schema
+        rows: the csv row dictionaries to validate
+        drop_empty: if True, remove empty columns from each row before validating
+        n_workers: the number of worker processes
+        chunk_size: the number of rows to validate per task, CHUNK_SIZE by default
+
+    Yields:
+        dict: a packaged error, with its csv location already set
+
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    pool = ProcessPoolExecutor(
+        max_workers=n_workers, initializer=_init_worker, initargs=(schema,)
+    )
+    pending = deque()
+    try:
+        for first_row, chunk in iter_chunks(rows, chunk_size):
+            pending.append(pool.submit(_validate_chunk, chunk, drop_empty, first_row))
+            if len(pending) >= n_workers * CHUNKS_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
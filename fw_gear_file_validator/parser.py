@@ -1,19 +1,21 @@
 """Parser module to parse gear config.json."""
 
 from pathlib import Path
-from typing import Tuple, Union
-
-from flywheel_gear_toolkit import GearToolkitContext
+from typing import TYPE_CHECKING, Tuple, Union
 
+from fw_gear_file_validator.instrumentation import PROFILE_MODES
 from fw_gear_file_validator.utils import FwReference
 
+if TYPE_CHECKING:  # pragma: no cover
+    from flywheel_gear_toolkit import GearToolkitContext
+
 level_dict = {"Validate File Contents": "file", "Validate Flywheel Objects": "flywheel"}
 SUPPORTED_FILE_EXTENSIONS = {".json": "json", ".csv": "csv"}
 SUPPORTED_FLYWHEEL_MIMETYPES = {"application/json": "json", "text/csv": "csv"}
 
 
 def parse_config(
-    context: GearToolkitContext,
+    context: "GearToolkitContext",
 ) -> Tuple[bool, str, Path, FwReference, dict]:
     """Parses necessary items out of the context object."""
     debug = context.config.get("debug")
@@ -44,11 +46,74 @@ def parse_config(
         # No need to validate file type if we're not validating the file contents.
         validate_filetype(ext, mime)
 
-    loader_config = {"add_parents": add_parents}
+    loader_config = {
+        "add_parents": add_parents,
+        "stream_json": context.config.get("stream_json", False),
+        "schema_file_path": schema_file_path,
+    }
 
     return debug, tag, schema_file_path, fw_ref, loader_config
 
 
+def parse_validator_config(context: "GearToolkitContext") -> dict:
+    """Parses the validator options out of the context object."""
+    return {
+        "n_workers": context.config.get("n_workers", 1),
+        "engine": context.config.get("csv_engine", "row"),
+        "error_limit": context.config.get("error_limit", 0),
+        "aggregate_errors": context.config.get("aggregate_errors", False),
+        "fail_fast": context.config.get("fail_fast", False),
+        "error_report": context.config.get("error_report", False),
+    }
+
+
+def parse_profile_config(context: "GearToolkitContext") -> str:
+    """Parses the profiling mode out of the context object, one of PROFILE_MODES."""
+    profile = context.config.get("profile") or "off"
+    if profile not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile {profile}, expected one of {PROFILE_MODES}")
+    return profile
+
+
+def parse_batch_config(context: "GearToolkitContext") -> Union[dict, None]:
+    """Parses the batch mode options out of the context object.
+
+    Batch mode is enabled by setting batch_tag and/or batch_name_filter, in
+    which case the files to validate are found in the gear's destination
+    container instead of being given as input_file.
+
+    Returns:
+        the batch options, or None if the gear isn't running in batch mode
+
+    """
+    files_tag = context.config.get("batch_tag")
+    name_filter = context.config.get("batch_name_filter")
+    if not files_tag and not name_filter:
+        return None
+    if context.get_input("input_file"):
+        raise ValueError("input_file can't be given when running in batch mode")
+
+    validation_level = level_dict[context.config.get("validation_level")]
+    add_parents = context.config.get("add_parents")
+    if validation_level == "file" and add_parents:
+        raise ValueError("Cannot attach flywheel parents to file-content validation")
+
+    schema_file_path = Path(context.get_input_path("validation_schema"))
+    return {
+        "files_tag": files_tag or None,
+        "name_filter": name_filter or None,
+        "tag": context.config.get("tag"),
+        "schema_file_path": schema_file_path,
+        "validation_level": validation_level,
+        "n_workers": context.config.get("batch_workers", 1),
+        "loader_config": {
+            "add_parents": add_parents,
+            "stream_json": context.config.get("stream_json", False),
+            "schema_file_path": schema_file_path,
+        },
+    }
+
+
 def get_fw_type_info(input_file: dict) -> tuple[str, str]:
     """Gets a mimetype from a flywheel config input file object, and extracts the local path of that file."""
     mime = input_file.get("object", {}).get("mimetype")
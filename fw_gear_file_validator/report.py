@@ -0,0 +1,134 @@
+"""report.py.
+
+Streamed error reports.
+
+A file can have millions of errors.  Rather than holding them all until the
+end of the run and writing them into the QC result of .metadata.json, an
+ErrorReport writes each error to a gzipped JSON Lines file as soon as it is
+found, and only keeps their count per error code.  The QC result then holds
+that summary and the name of the report, which is uploaded with the gear's
+other outputs.
+"""
+
+import functools
+import gzip
+import json
+import logging
+import typing as t
+from collections import Counter
+from pathlib import Path
+
+from fw_gear_file_validator.errors import ErrorRecord, add_flywheel_location_to_errors
+
+log = logging.getLogger(__name__)
+
+REPORT_SUFFIX = ".errors.jsonl.gz"
+# Errors are written to the compressed stream in batches of this many lines.
+WRITE_BATCH = 1024
+# zlib's default level: about as small as the maximum (gzip's default), faster.
+COMPRESS_LEVEL = 6
+
+
+def report_filename(name: str, file_id: t.Optional[str] = None) -> str:
+    """Returns the name of the error report of a file.
+
+    Args:
+        name: the name of the validated file
+        file_id: the id of the validated file, to tell apart files with the same name
+    """
+    return f"{file_id}-{name}{REPORT_SUFFIX}" if file_id else f"{name}{REPORT_SUFFIX}"
+
+
+def open_report(path: t.Union[Path, str], fw_ref: t.Any) -> "ErrorReport":
+    """Opens the error report of a flywheel file, which adds the flywheel location of its errors."""
+    return ErrorReport(
+        path, prepare=functools.partial(add_flywheel_location_to_errors, fw_ref)
+    ).open()
+
+
+class ErrorReport:
+    """Writes errors to a gzipped JSON Lines file as they are found.
+
+    Attributes:
+        path: the path of the report
+        prepare: applied to each batch of errors before they are written, e.g.
+            to add their flywheel location.  It can modify the errors in place.
+        count: the number of errors written
+        codes: the number of errors written, by error code
+    """
+
+    def __init__(
+        self,
+        path: t.Union[Path, str],
+        prepare: t.Optional[t.Callable[[t.List[t.Dict]], t.List[t.Dict]]] = None,
+    ):
+        """Initializes an ErrorReport."""
+        self.path = Path(path)
+        self.prepare = prepare
+        self.count = 0
+        self.codes = Counter()
+        self._fp = None
+
+    def open(self) -> "ErrorReport":
+        """Creates the report file, replacing any previous one."""
+        # Errors are written to the report as they are found, across calls, so
+        # it owns the handle, closed by close() (or __exit__).
+        self._fp = gzip.open(  # noqa: SIM115
+            self.path, "wt", encoding="UTF-8", compresslevel=COMPRESS_LEVEL
+        )
+        return self
+
+    def close(self) -> None:
+        """Closes the report file."""
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __enter__(self) -> "ErrorReport":
+        """Opens the report if it isn't open yet."""
+        return self if self._fp is not None else self.open()
+
+    def __exit__(self, *exc_info) -> None:
+        """Closes the report."""
+        self.close()
+
+    def clear(self) -> None:
+        """Removes the errors written so far."""
+        self.close()
+        self.count = 0
+        self.codes = Counter()
+        self.open()
+
+    def write_all(self, errors: t.Iterable[t.Mapping]) -> None:
+        """Writes errors to the report, consuming them as they come."""
+        if self._fp is None:
+            raise ValueError(f"{self.path} is not open")
+        batch = []
+        for error in errors:
+            batch.append(error)
+            if len(batch) >= WRITE_BATCH:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+
+    def _write_batch(self, errors: t.List[t.Mapping]) -> None:
+        if self.prepare is not None:
+            errors = self.prepare(errors)
+        lines = []
+        for error in errors:
+            if isinstance(error, ErrorRecord):
+                error = error.to_dict()
+            self.codes[error.get("code")] += 1
+            lines.append(json.dumps(error))
+        lines.append("")
+        self._fp.write("\n".join(lines))
+        self.count += len(errors)
+
+    def summary(self) -> dict:
+        """Returns the summary of the report, for the QC result."""
+        return {
+            "report": self.path.name,
+            "n_errors": self.count,
+            "codes": dict(self.codes.most_common()),
+        }
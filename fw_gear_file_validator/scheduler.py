@@ -0,0 +1,173 @@
+"""scheduler.py.
+
+Overlaps the validation of many files with the I/O around it.
+
+Validating a file is CPU bound, but in batch mode each file is also
+downloaded before it is validated, and its QC result and tags are saved
+after, which are API calls.  A Scheduler runs each file through three
+stages:
+
+    prepare, in a thread: e.g. downloads the file, and returns the task that
+        validates it
+    validate, in a worker process: validates the task.  Workers are set up
+        once, by the pool initializer, so they keep their compiled
+        validators from one file to the next.
+    finish, in a thread: e.g. saves the QC result and tags
+
+Files are downloaded and their results saved while others are validated.
+The stages are linked by bounded queues: only max_pending files are in the
+pipeline at a time, so downloads don't run far ahead of validation, and at
+most one task per thread is queued for the workers.
+"""
+
+import logging
+import os
+import threading
+import time
+import typing as t
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# Number of threads for the I/O stages, beyond one per worker process.
+IO_THREADS = 4
+# Number of files in the pipeline per thread.
+PENDING_PER_THREAD = 2
+
+
+def _run_task(validate: t.Callable, task: t.Any) -> t.Tuple[int, float, t.Any]:
+    """Runs a task in a worker process, timing it."""
+    start = time.perf_counter()
+    outcome = validate(task)
+    return os.getpid(), time.perf_counter() - start, outcome
+
+
+class Scheduler:
+    """Validates items in a pool of processes, and prepares and finishes them in threads.
+
+    Attributes:
+        n_workers: the number of worker processes
+        n_threads: the number of threads running the prepare and finish stages
+        max_pending: the maximum number of items in the pipeline
+        initializer: called with initargs when a worker process starts, to
+            build what the workers reuse between tasks
+        initargs: the arguments of initializer
+        handled: the exceptions of prepare and validate that are passed on to
+            finish, as the item's outcome.  Others are logged, and raised by run.
+        workers: the number of tasks run and the time spent running them, by
+            worker process id
+    """
+
+    def __init__(
+        self,
+        n_workers: int = 1,
+        n_threads: t.Optional[int] = None,
+        max_pending: t.Optional[int] = None,
+        initializer: t.Optional[t.Callable] = None,
+        initargs: t.Tuple = (),
+        handled: t.Tuple[t.Type[Exception], ...] = (),
+    ):
+        """Initializes a Scheduler."""
+        self.n_workers = max(n_workers, 1)
+        self.n_threads = n_threads or self.n_workers + IO_THREADS
+        self.max_pending = max_pending or self.n_threads * PENDING_PER_THREAD
+        self.initializer = initializer
+        self.initargs = initargs
+        self.handled = handled
+        self.workers: t.Dict[int, t.List] = {}
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        items: t.Iterable,
+        prepare: t.Callable[[t.Any], t.Tuple[t.Any, t.Any]],
+        validate: t.Callable[[t.Any], t.Any],
+        finish: t.Callable[[t.Any, t.Any, t.Any], t.Any],
+    ) -> t.Iterator:
+        """Runs items through the stages, yielding the result of each in order.
+
+        Args:
+            items: the items to process
+            prepare: returns what finish needs of an item, and the task that
+                validates it.  Only the task is sent to the workers, so it
+                must be picklable.
+            validate: validates a task in a worker, must be picklable (i.e. a
+                module level function)
+            finish: called with the item, what prepare returned for it (None
+                if it failed) and the outcome of its validation, or the
+                exception raised by prepare or validate, if it is one of
+                handled.  Returns the item's result.
+
+        Yields:
+            the result of finish for each item
+
+        Raises:
+            Exception: the first exception raised by prepare or validate that
+                isn't handled, or raised by finish
+
+        """
+        with (
+            ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=self.initializer,
+                initargs=self.initargs,
+            ) as pool,
+            ThreadPoolExecutor(max_workers=self.n_threads) as threads,
+        ):
+            pending = deque()
+            for item in items:
+                if len(pending) >= self.max_pending:
+                    yield pending.popleft().result()
+                pending.append(
+                    threads.submit(self._process, pool, item, prepare, validate, finish)
+                )
+            while pending:
+                yield pending.popleft().result()
+
+    def _process(
+        self,
+        pool: ProcessPoolExecutor,
+        item: t.Any,
+        prepare: t.Callable,
+        validate: t.Callable,
+        finish: t.Callable,
+    ) -> t.Any:
+        """Runs an item through the stages, in a thread."""
+        prepared = None
+        try:
+            prepared, task = prepare(item)
+            pid, elapsed, outcome = pool.submit(_run_task, validate, task).result()
+            with self._lock:
+                stats = self.workers.setdefault(pid, [0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
+        except self.handled as e:
+            outcome = e
+        except Exception:
+            log.exception("Could not process %s", item)
+            raise
+        return finish(item, prepared, outcome)
+
+    def summary(self) -> t.List[dict]:
+        """Returns the throughput of each worker process."""
+        return [
+            {
+                "worker": pid,
+                "tasks": n_tasks,
+                "seconds": round(seconds, 3),
+                "tasks_per_second": round(n_tasks / seconds, 2) if seconds else None,
+            }
+            for pid, (n_tasks, seconds) in sorted(self.workers.items())
+        ]
+
+    def log_summary(self) -> None:
+        """Logs the throughput of each worker process."""
+        for worker in self.summary():
+            log.info(
+                "Worker %d validated %d files in %.2f s (%s files/s).",
+                worker["worker"],
+                worker["tasks"],
+                worker["seconds"],
+                worker["tasks_per_second"],
+            )
@@ -0,0 +1,266 @@
+"""streaming.py.
+
+Streaming validation of large json files.
+
+A json file whose top level is an array (e.g. an export of records) or an
+object is read one array item or object member at a time, and each one is
+validated against its `items` or `properties` subschema as soon as it has
+been parsed.  Only about one item is held in memory at a time.
+
+Only schemas whose top level keywords can be checked one item at a time are
+streamed: `type`, `items` and `properties`/`required`.  Keywords that need the
+whole document (e.g. `maxItems`, `uniqueItems` or `allOf`) make the file be
+loaded and validated as a whole instead.  The errors are the ones jsonschema
+reports when validating the whole document, except that members repeated in
+an object are each validated, where json.load would only keep the last one.
+"""
+
+import json
+import re
+import typing as t
+from collections import deque
+from pathlib import Path
+
+import jsonschema
+from jsonschema.exceptions import ValidationError
+
+from fw_gear_file_validator import compiler, json_backend
+
+# Number of characters read from the file at a time.
+CHUNK_SIZE = 1024 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER_CHARS = re.compile(r"[0-9.eE+-]*")
+
+# Top level keywords that can be validated one item at a time.
+ARRAY_KEYWORDS = {"type", "items"}
+OBJECT_KEYWORDS = {"type", "properties", "required"}
+
+
+class JsonStream:
+    """A json file whose top level array items or object members are read one at a time.
+
+    Attributes:
+        file_path: the path of the json file
+        chunk_size: the number of characters read from the file at a time
+    """
+
+    def __init__(self, file_path: Path, chunk_size: t.Optional[int] = None):
+        """Initializes a JsonStream."""
+        self.file_path = Path(file_path)
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self._decoder = json.JSONDecoder()
+
+    def __bool__(self) -> bool:
+        """Returns False for an empty document, like an empty dict or list is falsy."""
+        kind = self.kind
+        if kind is None:
+            return bool(self.load())
+        closing = "]" if kind == "array" else "}"
+        with open(self.file_path, "r", encoding="UTF-8") as fp:
+            reader = _Reader(fp, self._decoder, self.chunk_size)
+            reader.expect("[{")
+            return reader.peek() != closing
+
+    @property
+    def kind(self) -> t.Union[str, None]:
+        """Returns "array" or "object" for the top level, None for anything else."""
+        with open(self.file_path, "r", encoding="UTF-8") as fp:
+            while chunk := fp.read(self.chunk_size):
+                stripped = chunk.lstrip(" \t\n\r")
+                if stripped:
+                    return {"[": "array", "{": "object"}.get(stripped[0])
+        return None
+
+    def load(self) -> t.Any:
+        """Loads the whole document."""
+        try:
+            return json_backend.load_file(self.file_path)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error loading JSON object: {e}")
+
+    def __iter__(self) -> t.Iterator[t.Tuple[t.Union[int, str], t.Any]]:
+        """Yields (index, item) for an array, or (key, value) for an object."""
+        with open(self.file_path, "r", encoding="UTF-8") as fp:
+            try:
+                yield from _Reader(fp, self._decoder, self.chunk_size).members()
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Error loading JSON object: {e}")
+
+
+class _Reader:
+    """Incremental parser of the top level of a json document."""
+
+    def __init__(self, fp: t.TextIO, decoder: json.JSONDecoder, chunk_size: int):
+        self.fp = fp
+        self.decoder = decoder
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, size: t.Optional[int] = None) -> bool:
+        """Appends the next characters of the file to the buffer, dropping the consumed ones."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character ("" at the end of the file)."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.read_more():
+                return self.buffer[self.pos : self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        """Consumes the next character, which must be one of chars."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self.buffer, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def value(self) -> t.Any:
+        """Decodes the next json value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may be cut off by the end of the buffer.  The buffer
+                # grows geometrically so large values are decoded a few times at most.
+                if self.read_more(max(self.chunk_size, len(self.buffer) - self.pos)):
+                    continue
+                raise
+            # A number may continue in the next chunk (e.g. "1" of "1.5e3").
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                tail = NUMBER_CHARS.match(self.buffer, end).end()
+                if tail == len(self.buffer) and self.read_more():
+                    continue
+            self.pos = end
+            return value
+
+    def members(self) -> t.Iterator[t.Tuple[t.Union[int, str], t.Any]]:
+        """Yields the items of a top level array, or the members of a top level object."""
+        opening = self.expect("[{")
+        closing = "]" if opening == "[" else "}"
+        index = 0
+        if self.peek() == closing:
+            self.pos += 1
+        else:
+            while True:
+                if opening == "[":
+                    yield index, self.value()
+                else:
+                    if self.peek() != '"':
+                        raise json.JSONDecodeError(
+                            "Expecting property name enclosed in double quotes",
+                            self.buffer,
+                            self.pos,
+                        )
+                    key = self.value()
+                    self.expect(":")
+                    yield key, self.value()
+                index += 1
+                if self.expect("," + closing) == closing:
+                    break
+        if self.peek():
+            raise json.JSONDecodeError("Extra data", self.buffer, self.pos)
+
+
+def is_streamable(
+    schema: t.Any, kind: str, validator: jsonschema.Draft7Validator
+) -> bool:
+    """Returns True if a schema can be validated one top level item at a time.
+
+    Args:
+        schema: the validation schema
+        kind: "array" or "object", the top level of the document
+        validator: the validator for the schema
+    """
+    if not isinstance(schema, dict):
+        return False
+    keywords = ARRAY_KEYWORDS if kind == "array" else OBJECT_KEYWORDS
+    for keyword in schema:
+        if keyword not in keywords and not compiler.is_annotation(keyword, validator):
+            return False
+    # A type mismatch is reported with the whole document as its value.
+    types = schema.get("type", kind)
+    if kind not in (types if isinstance(types, list) else [types]):
+        return False
+    if kind == "array" and isinstance(schema.get("items"), list):
+        return "additionalItems" not in schema
+    required = schema.get("required", [])
+    return isinstance(required, list) and isinstance(schema.get("properties", {}), dict)
+
+
+def iter_stream_errors(
+    validator: jsonschema.Draft7Validator, stream: JsonStream
+) -> t.Iterator[ValidationError]:
+    """Yields the errors jsonschema would find in a streamed json document.
+
+    The errors are yielded in an order that sorts by path to the same order
+    as the ones from jsonschema.Draft7Validator.iter_errors.
+
+    Args:
+        validator: the validator for the schema
+        stream: the json document
+
+    Yields:
+        ValidationError: the schema errors
+
+    """
+    schema = validator.schema
+    kind = stream.kind
+    if kind is None or not is_streamable(schema, kind, validator):
+        yield from validator.iter_errors(stream.load())
+        return
+
+    if kind == "array":
+        items = schema.get("items", True)
+        for index, item in stream:
+            if isinstance(items, list):
+                if index >= len(items):
+                    continue
+                errors = validator.descend(
+                    item, items[index], path=index, schema_path=index
+                )
+            else:
+                errors = validator.descend(item, items, path=index)
+            for error in errors:
+                error.schema_path.appendleft("items")
+                yield error
+        return
+
+    properties = schema.get("properties", {})
+    seen = set()
+    for key, value in stream:
+        seen.add(key)
+        if key not in properties:
+            continue
+        for error in validator.descend(
+            value, properties[key], path=key, schema_path=key
+        ):
+            error.schema_path.appendleft("properties")
+            yield error
+
+    for key in schema.get("required", []):
+        if key not in seen:
+            # The instance would be the whole document; it isn't reported
+            # for required errors anyway.
+            yield ValidationError(
+                f"{key!r} is a required property",
+                validator="required",
+                validator_value=schema["required"],
+                instance=None,
+                schema=schema,
+                schema_path=deque(["required"]),
+            )
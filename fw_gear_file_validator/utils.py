@@ -3,15 +3,22 @@
 Commonly used functions to aid in the execution of the main code.
 """
 
+import functools
 import logging
 import typing as t
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
 
-import flywheel
-import flywheel_gear_toolkit
-from flywheel_gear_toolkit.utils.datatypes import Container
+from fw_gear_file_validator.cache import ContainerCache
+from fw_gear_file_validator.metadata import MetadataWriter
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    # The SDK is slow to import, and file content validation doesn't need it.
+    import flywheel
+    import flywheel_gear_toolkit
+    from flywheel_gear_toolkit.utils.datatypes import Container
 
 PARENT_ORDER = [
     "group",
@@ -45,6 +52,8 @@ class FwReference:
         is_file: bool, True if the object is a file, False otherwise
         ref: dict, the reference to the object, basically the parent dictionary plus the object itself.
         _client: flywheel.Client, the flywheel client
+        container_cache: ContainerCache, if set, the parent containers are
+            looked up in this cache before being fetched
 
     Properties (cached):
         parent_type: str, container type of the object's parent
@@ -56,9 +65,9 @@ class FwReference:
 
     id: str = None
     input_object: t.Union[
-        flywheel.ContainerReference,
-        flywheel.FileReference,
-        flywheel.JobFileInput,
+        "flywheel.ContainerReference",
+        "flywheel.FileReference",
+        "flywheel.JobFileInput",
         dict,
     ] = None
     type: str = None
@@ -66,15 +75,18 @@ class FwReference:
     name: str = None
     file_type: str = None
     ref: dict = None
-    _client: flywheel.Client = None
+    _client: "flywheel.Client" = None
     contents: str = None
+    container_cache: ContainerCache = None
+    # The hierarchy levels fetched so far, None for levels that don't exist.
+    _levels: dict = field(default_factory=dict, init=False, repr=False)
 
     @classmethod
     def init_from_gear_input(
         cls,
-        fw_client: flywheel.Client,
-        gear_input: t.Union[dict, flywheel.models.JobFileInput],
-        content: str = None,
+        fw_client: "flywheel.Client",
+        gear_input: t.Union[dict, "flywheel.models.JobFileInput"],
+        content: t.Optional[str] = None,
     ):
         """Initialize a flywheel reference object from a gear input file.
 
@@ -139,27 +151,31 @@ class FwReference:
                 return self.parents[p]
 
     @property
-    def loc(self) -> t.Union[Path, dict]:
-        """Returns location of the object."""
+    def loc(self) -> t.Union[Path, "FwReference"]:
+        """Returns location of the object.
+
+        That is the path of the file for file contents, or the reference
+        itself for flywheel objects, whose hierarchy the FwLoader fetches.
+        """
         if self.contents == "file":
             if self.file_path:
                 return self.file_path
             return Path("")
         elif self.contents == "flywheel":
-            return self.hierarchy_objects
+            return self
 
     @property
-    def client(self) -> flywheel.Client:
+    def client(self) -> "flywheel.Client":
         """Returns the Flywheel client."""
         if not self._client:
             raise ValueError("Client not set. Use set_client() to set the client.")
         return self._client
 
-    def set_client(self, client: flywheel.Client):
+    def set_client(self, client: "flywheel.Client"):
         """Sets the Flywheel client as attribute."""
         self._client = client
 
-    def get_lookup_path(self, level: str = None) -> str:
+    def get_lookup_path(self, level: t.Optional[str] = None) -> str:
         """Returns the Flywheel path of the Flywheel object."""
         hierarchy_parts = []
         for k in PARENT_ORDER:
@@ -173,70 +189,110 @@ class FwReference:
         return "fw://" + "/".join(hierarchy_parts)
 
     @cached_property
-    def fw_object(self) -> Container:
+    def fw_object(self) -> "Container":
         """Returns the container for the provided Flywheel reference."""
         return self.get_level_object(self.type)
 
     @cached_property
     def hierarchy_objects(self) -> dict:
         """Loads the full representation of fw objects in a hierarchy."""
+        return self.get_hierarchy()
+
+    def get_hierarchy(self, levels: t.Optional[t.Iterable[str]] = None) -> dict:
+        """Loads the full representation of some levels of the hierarchy.
+
+        Each level is a separate API call, so they are all issued concurrently
+        and the hierarchy costs about one round trip to load.  Levels are
+        only fetched once, whichever call fetches them first.
+
+        Args:
+            levels: the levels to load, all the levels of the hierarchy by default
+
+        Returns:
+            the objects of the levels that exist, in hierarchy order
+        """
+        ordered = [level for level in PARENT_ORDER if level in self.ref]
+        ordered += [level for level in self.ref if level not in PARENT_ORDER]
+        if levels is not None:
+            levels = set(levels)
+            ordered = [level for level in ordered if level in levels]
+        missing = [level for level in ordered if level not in self._levels]
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+                fw_objects = list(pool.map(self.get_level_object, missing))
+        else:
+            fw_objects = [self.get_level_object(level) for level in missing]
+        self._levels.update(zip(missing, fw_objects))
+
         hierarchy = {}
-        for level in self.ref.keys():
-            fw_object = self.get_level_object(level)
+        for level in ordered:
+            fw_object = self._levels[level]
             if fw_object is None:
                 continue
             hierarchy[level] = fw_object
         return hierarchy
 
-    def get_level_object(self, level) -> t.Union[dict, Container, flywheel.Group, None]:
+    def get_level_object(
+        self, level
+    ) -> t.Union[dict, "Container", "flywheel.Group", None]:
         """Returns all the parent containers."""
         if level not in self.ref.keys():
             return None
         if level == "group":
+            import flywheel
+
             return flywheel.Group(label=self.parents["group"])
 
         p_id = self.ref[level]
         getter = getattr(self.client, f"get_{level}")
-        fw_object = getter(p_id)
-        return fw_object
+        # The file itself is what's being validated, so it's always fetched.
+        if self.container_cache is None or level == "file":
+            return getter(p_id)
+        return self.container_cache.get(level, p_id, lambda: getter(p_id))
 
 
 def add_tags_metadata(
-    context: flywheel_gear_toolkit.GearToolkitContext,
+    context: "flywheel_gear_toolkit.GearToolkitContext",
     fw_ref: FwReference,
     valid,
     tag,
+    file_entry: t.Optional["flywheel.FileEntry"] = None,
+    writer: MetadataWriter = None,
 ) -> None:
     """Add gear completion tags to metadata.
 
     Add the specified base tag to the target fw object's metadata,
-    appended with "-PASS" if the validation succeeded, "-FAIL" otherwise
+    appended with "-PASS" if the validation succeeded, "-FAIL" otherwise,
+    and remove the tag of the other state.  The current tags of the file are
+    taken from the gear input object (or file_entry), not fetched again.
 
     Args:
         context: the gear toolkit context
         fw_ref: the object to append the tag to
         valid: True if validation passed, else False
         tag: the base to use for the tag
+        file_entry: the file to tag, if it isn't the gear's input file (e.g. in
+            batch mode).  Its tags are updated through the SDK.
+        writer: the MetadataWriter collecting the updates of the file.  The
+            tags are changed in it, to be written with the file's QC result,
+            instead of being written right away.
 
     """
     state = "PASS" if valid else "FAIL"
 
     log.debug("tagging file")
-    input_filename = context.get_input_filename("input_file")
-    file_ = fw_ref.fw_object
-    fail_tag = f"{tag}-FAIL"
-    pass_tag = f"{tag}-PASS"
+    stale_tag = f"{tag}-PASS" if state == "FAIL" else f"{tag}-FAIL"
     tag = f"{tag}-{state}"
-    input_object = context.get_input("input_file")
-    tags = file_.tags
-    if state == "PASS" and fail_tag in tags:
-        tags.remove(fail_tag)
-        context.metadata.update_file(input_filename, tags=tags)
-    elif state == "FAIL" and pass_tag in tags:
-        tags.remove(pass_tag)
-        context.metadata.update_file(input_filename, tags=tags)
-
-    context.metadata.add_file_tags(input_object, str(tag))
+    flush = writer is None
+    if writer is None:
+        target = (
+            file_entry if file_entry is not None else context.get_input("input_file")
+        )
+        writer = MetadataWriter(context, target)
+    writer.remove_tag(stale_tag)
+    writer.add_tag(tag)
+    if flush:
+        writer.flush()
 
 
 def cast_csv_val(val: t.Any, cast_type: type) -> t.Union[int, float, str, bool]:
@@ -256,6 +312,56 @@ def cast_csv_val(val: t.Any, cast_type: type) -> t.Union[int, float, str, bool]:
         return val
 
 
+def _cast_str(val: t.Any) -> str:
+    """Casts a value to str, returning strings (every value read from a csv) as-is."""
+    return val if type(val) is str else str(val)
+
+
+def _cast_int(val: t.Any) -> t.Union[int, t.Any]:
+    """Casts a value to int, skipping the conversion attempt for strings that can't be ints."""
+    if type(val) is not str:
+        return cast_csv_val(val, int)
+    # A string int() accepts always ends in a digit or whitespace.
+    last = val[-1:]
+    if not (last.isdigit() or last.isspace()):
+        return val
+    return cast_csv_val(val, int)
+
+
+def _cast_float(val: t.Any) -> t.Union[float, t.Any]:
+    """Casts a value to float, skipping the conversion attempt for strings that can't be floats."""
+    if type(val) is not str:
+        return cast_csv_val(val, float)
+    # A string float() accepts ends in a digit, ".", whitespace, or the end of
+    # "inf", "infinity" or "nan".
+    last = val[-1:]
+    if not (last.isdigit() or last.isspace() or last in ".fFyYnN"):
+        return val
+    return cast_csv_val(val, float)
+
+
+CSV_CASTERS = {str: _cast_str, int: _cast_int, float: _cast_float, bool: bool}
+
+
+def make_csv_caster(cast_type: type) -> t.Callable[[t.Any], t.Any]:
+    """Returns a function that casts a csv value like cast_csv_val(val, cast_type).
+
+    The common column types get specialized casters with cheap checks that
+    avoid raising and catching a ValueError for values that can't be cast.
+
+    Args:
+        cast_type: the type to cast values to
+
+    Returns:
+        a single-argument function performing the cast
+
+    """
+    caster = CSV_CASTERS.get(cast_type)
+    if caster is None:
+        caster = functools.partial(cast_csv_val, cast_type=cast_type)
+    return caster
+
+
 def get_loader_type(fw_ref: FwReference) -> str:
     """Gets the type of loader needed to load an object.
 
@@ -3,32 +3,100 @@
 Creates validators for different object/file types
 """
 
-import json
+import itertools
+import logging
+import os
 import typing as t
 from pathlib import Path
 
 import jsonschema
 from jsonschema.exceptions import ValidationError
 
+from fw_gear_file_validator import cache as schema_cache
+from fw_gear_file_validator import (
+    compiler,
+    incremental,
+    json_backend,
+    parallel,
+    streaming,
+    utils,
+)
 from fw_gear_file_validator import errors as err
-from fw_gear_file_validator import utils
+from fw_gear_file_validator.report import ErrorReport
+
+log = logging.getLogger(__name__)
+
+CSV_ENGINES = ("row", "columnar")
 
 # We are not supporting array, object, or null.
 JSON_TYPES = {"string": str, "number": float, "integer": int, "boolean": bool}
 
 
+def _limit_errors(
+    errors: t.Iterable[t.Any], limit: int, truncated: t.List[bool]
+) -> t.Iterator[t.Any]:
+    """Yields the first `limit` errors, then looks for one more.
+
+    Only a file with more errors than the limit was cut short, so one error
+    past the limit is looked for (and dropped).  `truncated` is appended
+    True once the iterator is consumed, if there was one.
+    """
+    errors = iter(errors)
+    yield from itertools.islice(errors, limit)
+    if next(errors, None) is not None:
+        truncated.append(True)
+
+
 class JsonValidator:
     """Json Validator class."""
 
-    def __init__(self, schema: t.Union[dict, Path, str]):
-        """Initializes a JsonValidator Object."""
+    def __init__(
+        self,
+        schema: t.Union[dict, Path, str],
+        cache: schema_cache.SchemaCache = None,
+        error_limit: t.Optional[int] = None,
+        aggregate: bool = False,
+    ):
+        """Initializes a JsonValidator Object.
+
+        Args:
+            schema: the validation schema, or the path to it
+            cache: if given, the parsed schema (and anything compiled from it)
+                is looked up in and stored to this cache.  Only used when the
+                schema is given as a path.
+            error_limit: if set, at most this many errors are reported for a
+                file.  If it has more, validation stops at the next one, and an
+                "error-limit" error is reported after them.
+            aggregate: if True, errors with the same code, column (or key path)
+                and expected value are reported as one error with their count,
+                see err.ErrorAggregator
+        """
+        self.error_limit = error_limit or None
+        self.aggregate = aggregate
+        self.cache = None
+        self.cache_key = None
+        self.cached = {}
         if isinstance(schema, str):
             schema = Path(schema)
         if isinstance(schema, Path):
-            with open(schema, "r", encoding="UTF-8") as schema_instance:
-                schema = json.load(schema_instance)
+            schema_bytes = schema.read_bytes()
+            if cache is not None:
+                self.cache = cache
+                self.cache_key, self.cached = cache.lookup(schema_bytes)
+            if "schema" in self.cached:
+                schema = self.cached["schema"]
+            else:
+                schema = json_backend.loads(schema_bytes)
+                self.update_cache(schema=schema)
         self.validator = jsonschema.Draft7Validator(schema)
 
+    def update_cache(self, **artifacts: t.Any) -> None:
+        """Adds artifacts computed from the schema to its cache entry, if caching."""
+        if self.cache is None:
+            return
+        self.cached = {**self.cached, **artifacts}
+        self.cache.store(self.cache_key, self.cached)
+
     def validate_file_not_empty(
         self, file_contents: t.Union[dict, list, None]
     ) -> t.Tuple[bool, t.List[dict]]:
@@ -47,25 +115,106 @@ class JsonValidator:
             return False, self.handle_errors([err.make_empty_file_error()])
         return True, []
 
-    def validate(self, d: dict) -> t.Tuple[bool, t.List[t.Dict]]:
+    def validate(
+        self,
+        d: t.Union[dict, streaming.JsonStream],
+        max_errors: t.Optional[int] = None,
+        fail_fast: bool = False,
+        report: ErrorReport = None,
+    ) -> t.Tuple[bool, t.List[t.Dict]]:
         """Performs validation on a dict.
 
         Args:
-            d: the dictionary to process
+            d: the dictionary to process, or a json file to stream
+            max_errors: if set, validation stops once this many errors were found
+            fail_fast: if True, validation stops at the first error (unless
+                max_errors is set)
+            report: if given, the errors are written to it as they are found,
+                instead of being returned
 
         Returns:
             valid: True if valid, False otherwise
-            errors: any errors reported during validation
+            errors: any errors reported during validation, [] if they were
+                written to the report
 
         """
         valid, empty_error = self.validate_file_not_empty(d)
         if not valid:
             return valid, empty_error
 
-        valid, errors = self.process_item(d)
-
+        if isinstance(d, streaming.JsonStream):
+            schema_errors = streaming.iter_stream_errors(self.validator, d)
+        else:
+            schema_errors = self.iter_item_errors(d)
+        written = report.count if report is not None else 0
+        errors = self.collect_errors(
+            schema_errors,
+            package=self.handle_errors,
+            max_errors=max_errors or (1 if fail_fast else None),
+            report=report,
+        )
+        valid = not errors and (report is None or report.count == written)
         return valid, errors
 
+    def collect_errors(
+        self,
+        errors: t.Iterable[t.Any],
+        package: t.Optional[
+            t.Callable[[t.List[ValidationError]], t.List[t.Dict]]
+        ] = None,
+        max_errors: t.Optional[int] = None,
+        report: ErrorReport = None,
+    ) -> t.List[t.Dict]:
+        """Collects the errors of a file, up to the error limit, aggregating them if configured.
+
+        The errors are consumed lazily, so once the error limit (or
+        max_errors) is reached the rest of the file isn't validated.  With a
+        report, they are also packaged and written one at a time, so they are
+        never all held in memory (unless they are aggregated, in which case
+        only the aggregated errors are written, at the end).
+
+        Args:
+            errors: the errors of the file, as they are found
+            package: converts the collected errors to packaged errors, if they
+                aren't packaged yet (e.g. handle_errors)
+            max_errors: if set, at most this many errors are collected.  Unlike
+                the error limit, no "error-limit" error is added when it is reached.
+            report: if given, the errors are written to it rather than returned
+
+        Returns:
+            the packaged errors, [] if they were written to the report
+
+        """
+        limit = min(filter(None, (self.error_limit, max_errors)), default=None)
+        truncated = []
+        if limit and limit == self.error_limit:
+            errors = _limit_errors(errors, limit, truncated)
+        elif limit:
+            errors = itertools.islice(errors, limit)
+        if package is not None and report is not None:
+            errors = (packaged for error in errors for packaged in package([error]))
+        elif package is not None:
+            errors = list(errors)
+            errors = package(errors) if errors else []
+        if self.aggregate:
+            aggregator = err.ErrorAggregator()
+            for error in errors:
+                aggregator.add(error)
+            collected = aggregator.errors()
+        elif report is not None:
+            report.write_all(errors)
+            collected = []
+        else:
+            collected = list(errors)
+        if truncated:
+            collected.extend(
+                self.handle_errors([err.make_error_limit_error(self.error_limit)])
+            )
+        if report is not None:
+            report.write_all(collected)
+            return []
+        return collected
+
     def process_item(self, d: dict) -> t.Tuple[bool, t.List[t.Dict]]:
         """Processes contents of dict and returns a tuple of valid and formatted errors.
 
@@ -77,12 +226,16 @@ class JsonValidator:
             (list[dict] or None): a list of errors or and empty list
 
         """
-        errors = list(self.validator.iter_errors(d))
+        errors = list(self.iter_item_errors(d))
         if errors:
             errors = self.handle_errors(errors)
         valid = False if errors else True
         return valid, errors
 
+    def iter_item_errors(self, d: dict) -> t.Iterator[ValidationError]:
+        """Yields the schema errors in a dict, as jsonschema.Validator.iter_errors does."""
+        return self.validator.iter_errors(d)
+
     @staticmethod
     def handle_errors(file_errors: list[ValidationError]) -> t.List[t.Dict]:
         """Processes errors into a standard output format.
@@ -134,25 +287,100 @@ class JsonValidator:
 class CsvValidator(JsonValidator):
     """CSV Validator class."""
 
-    def __init__(self, schema: t.Union[dict, Path, str]):
-        """Initializes a CsvValidator object."""
-        super().__init__(schema)
+    def __init__(
+        self,
+        schema: t.Union[dict, Path, str],
+        n_workers: int = 1,
+        engine: str = "row",
+        cache: schema_cache.SchemaCache = None,
+        error_limit: t.Optional[int] = None,
+        aggregate: bool = False,
+    ):
+        """Initializes a CsvValidator object.
+
+        Flat schemas are also compiled into a RowValidator, which validates the
+        rows with specialized per-column checks instead of the generic
+        jsonschema walk.
+
+        Args:
+            schema: the validation schema, or the path to it
+            n_workers: the number of processes to validate rows with.  1
+                validates in this process, 0 uses one process per cpu.
+            engine: "row" to validate row by row, or "columnar" to validate
+                whole columns at once with NumPy where the schema allows it.
+            cache: the cache for the parsed schema, its column datatypes and
+                its compiled row checks
+            error_limit: if set, at most this many errors are reported, and an
+                "error-limit" error is added if the file has more
+            aggregate: if True, similar errors are reported once, with their count
+        """
+        super().__init__(
+            schema, cache=cache, error_limit=error_limit, aggregate=aggregate
+        )
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self._column_types = None
+        if "row_plan" in self.cached:
+            plan = self.cached["row_plan"]
+        else:
+            plan = compiler.analyze_schema(self.validator, self.resolve_ref)
+            self.update_cache(row_plan=plan)
+        self.row_validator = (
+            None if plan is None else compiler.RowValidator(self.validator, plan)
+        )
+        self._screen_validator = None
+        if engine not in CSV_ENGINES:
+            raise ValueError(f"Unknown csv validation engine {engine}")
+        if engine == "columnar":
+            # NumPy is only imported by the runs that use the columnar engine.
+            from fw_gear_file_validator import columnar
+
+            if not columnar.supports(self):
+                log.info("Falling back to the row engine.")
+                engine = "row"
+        self.engine = engine
+
+    def resolve_ref(self, ref: str) -> dict:
+        """Returns the subschema that a `$ref` in the schema points at."""
+        _, subschema = self.validator.resolver.resolve(ref)
+        return subschema
 
     def get_column_dtypes(self) -> dict[str:type]:
         """Get the specified datatypes of each csv column from a Json Schema.
 
+        The datatypes are worked out once per validator, or taken from the
+        schema cache.
+
         Returns:
             A dictionary containing {column-name : python type} for every column
 
         """
-        column_types = {}
-        schema = self.validator.schema
-        for schema_property, property_val in schema["properties"].items():
-            if "$ref" in property_val:
-                _, property_val = self.validator.resolver.resolve(property_val["$ref"])
-            json_type = property_val.get("type")
-            column_types[schema_property] = self.convert_json_types_to_python(json_type)
-        return column_types
+        if self._column_types is not None:
+            return dict(self._column_types)
+        if "column_types" in self.cached:
+            python_types = {
+                py_type.__name__: py_type for py_type in JSON_TYPES.values()
+            }
+            column_types = {
+                column: python_types[type_name]
+                for column, type_name in self.cached["column_types"].items()
+            }
+        else:
+            column_types = {}
+            schema = self.validator.schema
+            for schema_property, property_val in schema["properties"].items():
+                if "$ref" in property_val:
+                    property_val = self.resolve_ref(property_val["$ref"])
+                json_type = property_val.get("type")
+                column_types[schema_property] = self.convert_json_types_to_python(
+                    json_type
+                )
+            self.update_cache(
+                column_types={
+                    column: py_type.__name__ for column, py_type in column_types.items()
+                }
+            )
+        self._column_types = column_types
+        return dict(column_types)
 
     @staticmethod
     def convert_json_types_to_python(json_type: str) -> type:
@@ -181,33 +409,83 @@ class CsvValidator(JsonValidator):
         return JSON_TYPES.get(json_type, str)  # default to type str if not supported
 
     def validate(
-        self, csv_dicts: t.List[t.Dict], drop_empty: bool = True
+        self,
+        csv_dicts: t.Iterable[t.Dict],
+        drop_empty: bool = True,
+        max_errors: t.Optional[int] = None,
+        fail_fast: bool = False,
+        row_index: incremental.RowIndex = None,
+        report: ErrorReport = None,
     ) -> t.Tuple[bool, t.List[t.Dict]]:
         """Performs the validation of a CSV file.
 
+        The rows are consumed as a stream: dropping empty values, casting,
+        schema validation and error packaging all happen one row at a time, so
+        only the errors are ever accumulated in memory.
+
+        With max_errors or fail_fast, validation stops as soon as enough
+        errors were found, and the cheapest checks run first: the header, then
+        for each row the compiled per-column checks, then the full schema if
+        those found nothing.  A row with errors in its columns therefore isn't
+        checked against the rest of the schema (e.g. cross-field rules).
+
         Args:
-            csv_dicts: the list of dicts generated by csv.DictReader
+            csv_dicts: the rows generated by csv.DictReader, as a list or any
+                other iterable (e.g. the stream returned by CsvLoader).  If the
+                stream raises err.FileFormatError, that error alone is reported.
+                If it has a byte_offset method, the byte offset of each row
+                with errors is added to their location.
             drop_empty: if True, remove empty columns from the csv_dicts before validating
+            max_errors: if set, validation stops once this many errors were found
+            fail_fast: if True, validation stops at the first error (unless
+                max_errors is set)
+            row_index: if given, rows found in its previous index reuse their
+                errors instead of being validated, and every row is added to
+                it (see incremental.RowIndex).  Not used with max_errors or
+                fail_fast, which don't validate rows completely.
+            report: if given, the errors are written to it as they are found,
+                instead of being returned
 
         Returns:
             valid: True if no errors, False otherwise.
-            errors: Any errors generated during validation.
+            errors: Any errors generated during validation, [] if they were
+                written to the report.
 
 
         """
-        valid, empty_error = self.validate_file_not_empty(csv_dicts)
-        if not valid:
-            return valid, empty_error
-
-        valid, header_errors = self.validate_header(csv_dicts)
-        if not valid:
-            return valid, header_errors
-
-        if drop_empty:
-            csv_dicts = [{k: v for k, v in row.items() if v} for row in csv_dicts]
-
-        valid, errors = self.process_file(csv_dicts)
-
+        # Aggregated errors aren't located by line.
+        byte_offset = (
+            None if self.aggregate else getattr(csv_dicts, "byte_offset", None)
+        )
+        try:
+            rows = iter(csv_dicts)
+            first_row = next(rows, None)
+            valid, empty_error = self.validate_file_not_empty(
+                [] if first_row is None else [first_row]
+            )
+            if not valid:
+                return valid, empty_error
+
+            valid, header_errors = self.validate_header([first_row])
+            if not valid:
+                return valid, header_errors
+
+            valid, errors = self.process_file(
+                itertools.chain([first_row], rows),
+                drop_empty=drop_empty,
+                max_errors=max_errors or (1 if fail_fast else None),
+                row_index=row_index,
+                byte_offset=byte_offset,
+                report=report,
+            )
+        except err.FileFormatError as e:
+            # A malformed row in a streamed file invalidates the whole file.
+            errors = self.handle_errors([e.error])
+            if report is None:
+                return False, errors
+            report.clear()
+            report.write_all(errors)
+            return False, []
         return valid, errors
 
     def validate_header(self, csv_dicts: t.List[t.Dict]) -> t.Tuple[bool, list]:
@@ -251,36 +529,194 @@ class CsvValidator(JsonValidator):
 
         return False, self.handle_errors(column_errors)
 
-    def process_file(self, csv_dicts: t.List[t.Dict]):
+    def process_file(
+        self,
+        csv_dicts: t.Iterable[t.Dict],
+        drop_empty: bool = False,
+        max_errors: t.Optional[int] = None,
+        row_index: incremental.RowIndex = None,
+        byte_offset: t.Optional[t.Callable[[int], t.Optional[int]]] = None,
+        report: ErrorReport = None,
+    ) -> t.Tuple[bool, t.List[t.Dict]]:
         """Processes the csv file one row at a time.
 
         Since each row can be considered its own little json file, we need to call the Parent JsonValidator's
         "process_item" once for each row and concatenate all errors.
 
         Args:
-            csv_dicts: the list of csv row dictionaries to process
+            csv_dicts: the csv row dictionaries to process
+            drop_empty: if True, remove empty columns from each row before validating
+            max_errors: if set, validation stops once this many errors were
+                found, checking each row with its cheapest checks first
+            row_index: if given, the results of the rows in its previous index
+                are reused, and every row is added to it.  Ignored with max_errors.
+            byte_offset: if given, returns the byte offset of a row from its
+                line number, to add to the location of its errors
+            report: if given, the errors are written to it rather than returned
 
         Returns:
             (bool): True if valid (no errors), false otherwise
             (list(dict) or None): a list of errors detected, or None
 
         """
-        csv_valid = True
-        csv_errors = []
+        if max_errors:
+            file_errors = self.iter_row_errors(
+                csv_dicts, drop_empty, screen=self.get_screen_validator()
+            )
+        elif row_index is not None:
+            # Only the new or changed rows are validated, so the engines
+            # validating chunks of the file at once wouldn't pay off.
+            file_errors = self.iter_row_errors(
+                csv_dicts, drop_empty, row_index=row_index
+            )
+        else:
+            file_errors = self.iter_file_errors(csv_dicts, drop_empty=drop_empty)
+        if byte_offset is not None:
+            file_errors = self.add_byte_offsets(file_errors, byte_offset)
+        written = report.count if report is not None else 0
+        csv_errors = self.collect_errors(
+            file_errors, max_errors=max_errors, report=report
+        )
+        csv_valid = not csv_errors and (report is None or report.count == written)
+        return csv_valid, csv_errors
+
+    def iter_file_errors(
+        self, csv_dicts: t.Iterable[t.Dict], drop_empty: bool = False
+    ) -> t.Iterator[t.Dict]:
+        """Lazily validates csv rows, yielding packaged errors as they are found.
+
+        With the columnar engine, chunks of rows are validated column by
+        column.  Otherwise, if the validator has more than one worker, chunks
+        of rows are validated in parallel processes.  Either way errors are
+        yielded in row order.
+
+        Args:
+            csv_dicts: the csv row dictionaries to process
+            drop_empty: if True, remove empty columns from each row before validating
+
+        Yields:
+            dict: a packaged error, with its csv location already set
+
+        """
+        if self.engine == "columnar":
+            from fw_gear_file_validator import columnar
+
+            return columnar.iter_columnar_errors(self, csv_dicts, drop_empty)
+        if self.n_workers > 1:
+            return parallel.iter_chunked_errors(
+                self.validator.schema, csv_dicts, drop_empty, self.n_workers
+            )
+        return self.iter_row_errors(csv_dicts, drop_empty)
+
+    def iter_row_errors(
+        self,
+        csv_dicts: t.Iterable[t.Dict],
+        drop_empty: bool = False,
+        first_row: int = 0,
+        row_nums: t.Optional[t.Iterable[int]] = None,
+        screen: compiler.RowValidator = None,
+        row_index: incremental.RowIndex = None,
+    ) -> t.Iterator[t.Dict]:
+        """Validates csv rows in this process, yielding packaged errors as they are found.
+
+        Args:
+            csv_dicts: the csv row dictionaries to process
+            drop_empty: if True, remove empty columns from each row before validating
+            first_row: the index of the first row in the file, used to locate errors
+            row_nums: the index of each row in the file, if they aren't consecutive
+            screen: if given, the errors this validator finds in a row are
+                reported, and the row is only validated against the full schema
+                if it finds none (see get_screen_validator)
+            row_index: if given, rows found in its previous index reuse their
+                errors instead of being validated, and every row is added to it
+
+        Yields:
+            dict: a packaged error, with its csv location already set
+
+        """
+        if row_nums is None:
+            row_nums = itertools.count(first_row)
         column_types = self.get_column_dtypes()
-        for (
-            row_num,
-            row_contents,
-        ) in enumerate(csv_dicts):
+        columns, cast_plan = None, ()
+        for row_num, row_contents in zip(row_nums, csv_dicts):
+            # Rows streamed from a csv all share the header's keys, so the plan
+            # is normally built once; it is only rebuilt if the keys change.
+            if tuple(row_contents) != columns:
+                columns = tuple(row_contents)
+                cast_plan = self.compile_cast_plan(columns, column_types)
+                if row_index is not None:
+                    row_index.start([list(columns), drop_empty])
+            if row_index is not None:
+                row_fingerprint = incremental.fingerprint(row_contents)
+                known_errors = row_index.lookup(row_fingerprint)
+                if known_errors is not None:
+                    yield from incremental.place_errors(known_errors, row_num)
+                    continue
             cast_row = {
-                key: utils.cast_csv_val(value, column_types.get(key, str))
-                for key, value in row_contents.items()
+                key: cast(value)
+                for (key, value), cast in zip(row_contents.items(), cast_plan)
+                if value or not drop_empty
             }
-            valid, errors = self.process_item(cast_row)
-            csv_valid = csv_valid & valid
+            if screen is not None:
+                row_errors = list(screen.iter_errors(cast_row))
+                if row_errors:
+                    errors = self.handle_errors(row_errors)
+                else:
+                    _, errors = self.process_item(cast_row)
+            else:
+                _, errors = self.process_item(cast_row)
             self.add_csv_location_spec(row_num, errors)
-            csv_errors.extend(errors)
-        return csv_valid, csv_errors
+            if row_index is not None:
+                row_index.add(row_fingerprint, errors)
+            yield from errors
+
+    def get_screen_validator(self) -> t.Union[compiler.RowValidator, None]:
+        """Returns a RowValidator with the compiled checks of the schema's columns, for screening rows.
+
+        It finds the errors in the `required` and `properties` of the schema
+        that the compiled checks can find, which are cheaper than the full
+        schema.  None if the schema is compiled into a RowValidator already,
+        since that one validates rows in the cheapest order itself.
+        """
+        if self.row_validator is not None:
+            return None
+        if self._screen_validator is None:
+            plan = compiler.analyze_properties(self.validator, self.resolve_ref)
+            if plan is None:
+                return None
+            # Columns without compiled checks are left to the full schema.
+            plan["columns"] = {
+                column: checks
+                for column, checks in plan["columns"].items()
+                if checks is not None
+            }
+            self._screen_validator = compiler.RowValidator(self.validator, plan)
+        return self._screen_validator
+
+    def iter_item_errors(self, d: dict) -> t.Iterator[ValidationError]:
+        """Yields the schema errors in a row, using the compiled RowValidator if there is one."""
+        if self.row_validator is None:
+            return super().iter_item_errors(d)
+        return self.row_validator.iter_errors(d)
+
+    def compile_cast_plan(
+        self, columns: t.Sequence[str], column_types: t.Optional[dict] = None
+    ) -> t.Tuple[t.Callable[[t.Any], t.Any], ...]:
+        """Builds the plan used to cast the values of csv rows to their schema types.
+
+        Args:
+            columns: the csv column names, in column order
+            column_types: the column datatypes, as returned by get_column_dtypes
+
+        Returns:
+            a tuple with the caster for each column, indexed by column position
+
+        """
+        if column_types is None:
+            column_types = self.get_column_dtypes()
+        return tuple(
+            utils.make_csv_caster(column_types.get(column, str)) for column in columns
+        )
 
     @staticmethod
     def add_csv_location_spec(
@@ -302,9 +738,35 @@ class CsvValidator(JsonValidator):
                 col_name = error["location"]["key_path"].split(".")[-1]
                 error["location"] = {"line": row_num + 1, "column_name": col_name}
 
+    @staticmethod
+    def add_byte_offsets(
+        errors: t.Iterable[t.Dict], byte_offset: t.Callable[[int], t.Optional[int]]
+    ) -> t.Iterator[t.Dict]:
+        """Include the byte offset of the row in the 'location' element of the errors.
+
+        The errors are located as they are found, while their row is still
+        the last one read.
+
+        Args:
+            errors (iterable(dict)): the errors, with their csv location already set
+            byte_offset: returns the byte offset of a row from its line number
+
+        Yields:
+            dict: the errors, with their byte offset set
+
+        """
+        for error in errors:
+            location = error["location"]
+            if isinstance(location, dict) and "line" in location:
+                location["byte_offset"] = byte_offset(location["line"])
+            yield error
+
 
 def initialize_validator(
-    file_type: str, schema: t.Union[dict, Path, str]
+    file_type: str,
+    schema: t.Union[dict, Path, str],
+    config: t.Optional[t.Dict[str, t.Any]] = None,
+    cache: schema_cache.SchemaCache = None,
 ) -> t.Union[JsonValidator, CsvValidator]:
     """Initialize the validator.
 
@@ -314,14 +776,28 @@ def initialize_validator(
     Args:
         file_type: the type of file we're validating
         schema: the validation JSON schema file.
+        config: the validator options, as returned by parser.parse_validator_config
+        cache: the cache to look the schema up in, when it's given as a path
 
     Returns:
         JsonValidator | CsvValidator
 
     """
+    config = config or {}
+    error_limit = config.get("error_limit")
+    aggregate = config.get("aggregate_errors", False)
     if file_type == "json":
-        return JsonValidator(schema)
+        return JsonValidator(
+            schema, cache=cache, error_limit=error_limit, aggregate=aggregate
+        )
     elif file_type == "csv":
-        return CsvValidator(schema)
+        return CsvValidator(
+            schema,
+            n_workers=config.get("n_workers", 1),
+            engine=config.get("engine", "row"),
+            cache=cache,
+            error_limit=error_limit,
+            aggregate=aggregate,
+        )
     else:
         raise ValueError("file type " + file_type + " Not supported")
@@ -1,17 +1,29 @@
 #!/usr/bin/env python
 """The run script."""
 
+import json
 import logging
+from pathlib import Path
 
 from flywheel_gear_toolkit import GearToolkitContext
 
-from fw_gear_file_validator import validator
+from fw_gear_file_validator import batch, validator
+from fw_gear_file_validator.cache import ContainerCache, SchemaCache
 from fw_gear_file_validator.errors import (
     add_flywheel_location_to_errors,
     save_errors_metadata,
 )
+from fw_gear_file_validator.incremental import RowIndexStore
+from fw_gear_file_validator.instrumentation import PROFILE_FILENAME, Profiler
 from fw_gear_file_validator.loader import Loader
-from fw_gear_file_validator.parser import parse_config
+from fw_gear_file_validator.metadata import MetadataWriter
+from fw_gear_file_validator.parser import (
+    parse_batch_config,
+    parse_config,
+    parse_profile_config,
+    parse_validator_config,
+)
+from fw_gear_file_validator.report import open_report, report_filename
 from fw_gear_file_validator.utils import add_tags_metadata, get_loader_type
 
 log = logging.getLogger(__name__)
@@ -19,28 +31,112 @@ log = logging.getLogger(__name__)
 
 def main(context: GearToolkitContext) -> None:  # pragma: no cover
     """Parses gear config, runs main algorithm, and performs flywheel-specific actions."""
-    (debug, tag, schema_file_path, fw_ref, loader_config) = parse_config(context)
+    batch_config = parse_batch_config(context)
+    if batch_config:
+        run_batch(context, batch_config)
+        return
+
+    profile = parse_profile_config(context)
+    profiler = Profiler(enabled=profile != "off")
+
+    with profiler.stage("parse_config"):
+        (debug, tag, schema_file_path, fw_ref, loader_config) = parse_config(context)
+        # Not on disk: the cached parents couldn't be checked for modifications.
+        fw_ref.container_cache = ContainerCache()
 
     loader_type = get_loader_type(fw_ref)
     loader = Loader.factory(loader_type, config=loader_config)
-    d, errors = loader.load_object(fw_ref.loc)
+    with profiler.stage("fetch_objects"):
+        location = fw_ref.loc
+    with profiler.stage("load") as stage:
+        d, errors = loader.load_object(location)
+        stage.errors = len(errors) if errors else 0
 
-    if errors:
-        errors = add_flywheel_location_to_errors(fw_ref, errors)
-        save_errors_metadata(errors, fw_ref, context)
-        add_tags_metadata(context, fw_ref, False, tag)
-        return
+    validator_config = parse_validator_config(context)
+    report = None
+    if validator_config["error_report"]:
+        report = open_report(
+            Path(context.output_dir) / report_filename(fw_ref.name), fw_ref
+        )
+    if not errors:
+        with profiler.stage("compile"):
+            # The schema is loaded by the validator, so it can be taken from the cache.
+            try:
+                schema_validator = validator.initialize_validator(
+                    loader_type,
+                    schema_file_path,
+                    config=validator_config,
+                    cache=SchemaCache(),
+                )
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                log.error("Invalid schema file.")
+                if report is not None:
+                    report.close()
+                return
+        options = {"fail_fast": validator_config["fail_fast"]}
+        row_store = RowIndexStore.default()
+        if row_store is not None and loader_type == "csv":
+            options["row_index"] = row_store.open(fw_ref, schema_validator)
+        if report is not None:
+            options["report"] = report
+        with profiler.stage("validate") as stage:
+            d = profiler.count_rows(d)
+            valid, errors = schema_validator.validate(d, **options)
+            stage.rows = profiler.rows_read(d)
+            stage.errors = len(errors) if report is None else report.count
+        if "row_index" in options:
+            row_store.save(options["row_index"])
+    else:
+        valid = False
+
+    # The QC result and tags of the input file are written together.
+    writer = MetadataWriter(context, context.get_input("input_file"))
+    with profiler.stage("save_metadata"):
+        if report is not None:
+            # The errors found while validating were written as they were found.
+            with report:
+                report.write_all(errors)
+            errors, error_report = [], report.summary()
+        else:
+            errors, error_report = add_flywheel_location_to_errors(fw_ref, errors), None
+        save_errors_metadata(
+            errors,
+            fw_ref,
+            context,
+            profile=profiler.summary() if profile == "qc" else None,
+            error_report=error_report,
+            writer=writer,
+        )
+    with profiler.stage("tag"):
+        add_tags_metadata(context, fw_ref, valid, tag, writer=writer)
+        writer.flush()
+
+    if profile == "file":
+        profiler.write(Path(context.output_dir) / PROFILE_FILENAME)
 
-    schema, errors = loader.load_schema(schema_file_path)
-    if errors:
-        log.error("Invalid schema file.")
-        return
-    schema_validator = validator.initialize_validator(loader_type, schema)
-    valid, errors = schema_validator.validate(d)
 
-    errors = add_flywheel_location_to_errors(fw_ref, errors)
-    save_errors_metadata(errors, fw_ref, context)
-    add_tags_metadata(context, fw_ref, valid, tag)
+def run_batch(
+    context: GearToolkitContext, batch_config: dict
+) -> None:  # pragma: no cover
+    """Validates the matching files in the destination container."""
+    container = context.get_destination_container()
+    if container.container_type == "analysis":
+        container = context.get_destination_parent()
+    container_cache = ContainerCache.default()
+    files = batch.find_files(
+        container,
+        files_tag=batch_config["files_tag"],
+        name_filter=batch_config["name_filter"],
+        container_cache=container_cache,
+    )
+    batch_validator = batch.BatchValidator(
+        context,
+        batch_config,
+        validator_config=parse_validator_config(context),
+        cache=SchemaCache(),
+        container_cache=container_cache,
+    )
+    batch_validator.run(files)
 
 
 if __name__ == "__main__":  # pragma: no cover
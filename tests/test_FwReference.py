@@ -1,3 +1,4 @@
+import time
 from pathlib import Path
 from unittest.mock import MagicMock
 
@@ -100,3 +101,54 @@ def test_get_lookup_path():
 
     url = f"fw://{group.label}"
     assert fw_ref.get_lookup_path(level="group") == url
+
+
+class StubClient:
+    """Client whose getters each take one (simulated) API round trip."""
+
+    LATENCY = 0.2
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        if not name.startswith("get_"):
+            raise AttributeError(name)
+        level = name[len("get_") :]
+
+        def getter(container_id):
+            self.calls.append(level)
+            time.sleep(self.LATENCY)
+            return {"id": container_id, "label": f"{level}-label"}
+
+        return getter
+
+
+def test_hierarchy_objects_fetched_concurrently():
+    parents = {
+        "group": "grp",
+        "project": "prj",
+        "subject": "sub",
+        "session": "ses",
+        "acquisition": "acq",
+    }
+    client = StubClient()
+    ref = FwReference(id="file-id", type="file", parents=parents, _client=client)
+
+    start = time.perf_counter()
+    hierarchy = ref.hierarchy_objects
+    elapsed = time.perf_counter() - start
+
+    assert list(hierarchy) == [
+        "group",
+        "project",
+        "subject",
+        "session",
+        "acquisition",
+        "file",
+    ]
+    assert hierarchy["session"]["id"] == "ses"
+    assert sorted(client.calls) == sorted(
+        ["project", "subject", "session", "acquisition", "file"]
+    )
+    assert elapsed < 2 * StubClient.LATENCY
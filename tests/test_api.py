@@ -0,0 +1,94 @@
+import gzip
+import json
+import shutil
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from fw_gear_file_validator import api
+
+ASSETS = Path(__file__).resolve().parent / "assets"
+SCHEMA = ASSETS / "test_schema_csv.json"
+
+
+def make_uploads(tmp_path):
+    for site in ("site1", "site2"):
+        (tmp_path / site).mkdir()
+        shutil.copy(ASSETS / "test_input_valid.csv", tmp_path / site / "valid.csv")
+        shutil.copy(ASSETS / "test_input_invalid.csv", tmp_path / site / "visits.csv")
+    (tmp_path / "notes.txt").write_text("not validated")
+    return tmp_path
+
+
+def test_expand_paths(tmp_path):
+    uploads = make_uploads(tmp_path)
+    paths = api.expand_paths(
+        [uploads / "**" / "visits.csv", uploads / "site1", uploads / "missing.csv"]
+    )
+    assert paths == [
+        uploads / "site1" / "visits.csv",
+        uploads / "site2" / "visits.csv",
+        uploads / "site1" / "valid.csv",
+        uploads / "missing.csv",
+    ]
+
+
+def test_expand_paths_exclude(tmp_path):
+    uploads = make_uploads(tmp_path)
+    schema = uploads / "schema.json"
+    shutil.copy(SCHEMA, schema)
+    assert api.expand_paths([uploads / "**" / "*.json"], exclude=[schema]) == []
+    assert api.expand_paths([schema], exclude=[schema]) == [schema]
+
+
+def test_validate_files_schema_in_directory(tmp_path, monkeypatch):
+    uploads = make_uploads(tmp_path)
+    shutil.copy(SCHEMA, uploads / "schema.json")
+    monkeypatch.chdir(uploads)
+    results = list(api.validate_files("schema.json", ["."]))
+    assert [(r["path"], r["state"]) for r in results] == [
+        ("site1/valid.csv", "PASS"),
+        ("site1/visits.csv", "FAIL"),
+        ("site2/valid.csv", "PASS"),
+        ("site2/visits.csv", "FAIL"),
+    ]
+
+
+def test_validate_files(tmp_path):
+    uploads = make_uploads(tmp_path)
+    paths = [uploads / "site1", uploads / "notes.txt"]
+    results = list(api.validate_files(SCHEMA, paths))
+    assert [(Path(r["path"]).name, r["state"]) for r in results] == [
+        ("valid.csv", "PASS"),
+        ("visits.csv", "FAIL"),
+        ("notes.txt", "ERROR"),
+    ]
+    assert results[1]["n_errors"] == len(results[1]["errors"]) == 1
+    assert results[1]["errors"][0]["location"]["line"] == 2
+
+    # Validating in parallel gives the same results, in the same order.
+    assert list(api.validate_files(SCHEMA, paths, n_jobs=2)) == results
+
+
+def test_validate_files_to_reports(tmp_path, monkeypatch):
+    (tmp_path / "uploads").mkdir()
+    uploads = make_uploads(tmp_path / "uploads")
+    monkeypatch.chdir(uploads)
+    report_dir = tmp_path / "reports"
+    results = list(api.validate_files(SCHEMA, ["*/visits.csv"], report_dir=report_dir))
+    assert [r["error_report"]["report"] for r in results] == [
+        "site1__visits.csv.errors.jsonl.gz",
+        "site2__visits.csv.errors.jsonl.gz",
+    ]
+    assert "errors" not in results[0]
+    with gzip.open(report_dir / results[0]["error_report"]["report"], "rt") as fp:
+        assert [json.loads(line)["code"] for line in fp] == ["type"]
+
+
+def test_validate_file_raises_unexpected_errors(tmp_path):
+    uploads = make_uploads(tmp_path)
+    local_validator = api.LocalValidator(SCHEMA)
+    local_validator.get_loader = MagicMock(side_effect=RuntimeError("bug"))
+    with pytest.raises(RuntimeError, match="bug"):
+        local_validator.validate_file(uploads / "site1" / "valid.csv")
@@ -0,0 +1,147 @@
+import gzip
+import json
+import shutil
+from pathlib import Path
+from unittest.mock import MagicMock, call
+
+import flywheel
+
+from fw_gear_file_validator import batch
+
+ASSETS = Path(__file__).resolve().parent / "assets"
+
+
+def make_file(name, tags=(), asset=None):
+    file_entry = MagicMock()
+    file_entry.name = name
+    file_entry.file_id = f"id-{name}"
+    file_entry.mimetype = None
+    file_entry.tags = list(tags)
+    file_entry.parents = {}
+    file_entry.download.side_effect = lambda path: shutil.copy(ASSETS / asset, path)
+    return file_entry
+
+
+def make_container(container_type, files=(), children_attr=None, children=()):
+    container = MagicMock()
+    container.container_type = container_type
+    container.files = list(files)
+    if children_attr:
+        getattr(container, children_attr).iter.return_value = list(children)
+    return container
+
+
+def test_find_files():
+    acquisition = make_container(
+        "acquisition", [make_file("a.csv", ["qc"]), make_file("b.json", ["qc"])]
+    )
+    session = make_container(
+        "session", [make_file("c.csv")], "acquisitions", [acquisition]
+    )
+
+    def names(**kwargs):
+        return [f.name for f in batch.find_files(session, **kwargs)]
+
+    assert names() == ["c.csv", "a.csv", "b.json"]
+    assert names(files_tag="qc") == ["a.csv", "b.json"]
+    assert names(name_filter="*.csv") == ["c.csv", "a.csv"]
+    assert names(files_tag="qc", name_filter="*.csv") == ["a.csv"]
+
+
+def test_batch_validator_run(tmp_path):
+    files = [
+        make_file("valid.csv", ["file-validator-FAIL"], "test_input_valid.csv"),
+        make_file("invalid.csv", asset="test_input_invalid.csv"),
+        make_file("notes.txt", asset="test_input_valid.csv"),
+    ]
+    context = MagicMock()
+    context.work_dir = tmp_path / "work"
+    context.output_dir = tmp_path
+    context.client.get_file.side_effect = lambda file_id: flywheel.FileEntry(
+        name=file_id, file_id=file_id
+    )
+    config = {
+        "tag": "file-validator",
+        "schema_file_path": ASSETS / "test_schema_csv.json",
+        "validation_level": "file",
+        "loader_config": {"add_parents": False},
+    }
+
+    batch_validator = batch.BatchValidator(context, config)
+    summary = batch_validator.run(files)
+
+    assert [r["state"] for r in summary["files"]] == ["PASS", "FAIL", "ERROR"]
+    assert (summary["passed"], summary["failed"], summary["errored"]) == (1, 1, 1)
+    assert summary["files"][1]["n_errors"] > 0
+    with open(tmp_path / batch.SUMMARY_FILENAME) as fp:
+        assert json.load(fp) == summary
+
+    # The validator is only built once, and downloads are cleaned up.
+    assert list(batch_validator._validators) == ["csv"]
+    assert not any((tmp_path / "work").iterdir())
+
+    # Results are written to each file through the SDK, with one call for the
+    # QC result and one for the tags, which are replaced.
+    qc_calls = context.metadata.add_gear_info.call_args_list
+    assert [c.kwargs["validation"]["state"] for c in qc_calls] == ["PASS", "FAIL"]
+    assert context.metadata.modify_container_file_info.call_count == 2
+    assert context.client.set_file_tags.call_args_list == [
+        call("id-valid.csv", ["file-validator-PASS"]),
+        call("id-invalid.csv", ["file-validator-FAIL"]),
+    ]
+    files[0].delete_tag.assert_not_called()
+
+    # The errors can be written to a report per file instead.
+    batch_validator = batch.BatchValidator(
+        context, config, validator_config={"error_report": True}
+    )
+    summary = batch_validator.run(files[1:2])
+    assert summary["files"][0]["n_errors"] > 0
+    report_path = tmp_path / "id-invalid.csv-invalid.csv.errors.jsonl.gz"
+    error_report = context.metadata.add_gear_info.call_args.kwargs["validation"][
+        "error_report"
+    ]
+    assert error_report["report"] == report_path.name
+    assert report_path.exists()
+    assert error_report["n_errors"] == summary["files"][0]["n_errors"]
+
+
+def test_batch_validator_run_in_parallel(tmp_path):
+    files = [
+        make_file(f"{name}-{i}.csv", asset=f"test_input_{name}.csv")
+        for i in range(3)
+        for name in ("valid", "invalid")
+    ] + [make_file("notes.txt", asset="test_input_valid.csv")]
+    context = MagicMock()
+    context.work_dir = tmp_path / "work"
+    context.output_dir = tmp_path
+    context.client.get_file.side_effect = lambda file_id: flywheel.FileEntry(
+        name=file_id, file_id=file_id
+    )
+    config = {
+        "tag": "file-validator",
+        "schema_file_path": ASSETS / "test_schema_csv.json",
+        "validation_level": "file",
+        "loader_config": {"add_parents": False},
+        "n_workers": 2,
+    }
+
+    summary = batch.BatchValidator(context, config).run(files)
+    assert [r["name"] for r in summary["files"]] == [f.name for f in files]
+    assert [r["state"] for r in summary["files"]] == ["PASS", "FAIL"] * 3 + ["ERROR"]
+    assert summary["files"][1]["n_errors"] > 0
+    assert sum(worker["tasks"] for worker in summary["workers"]) == 6
+    assert not any((tmp_path / "work").iterdir())
+    qc_calls = context.metadata.add_gear_info.call_args_list
+    states = sorted(c.kwargs["validation"]["state"] for c in qc_calls)
+    assert states == ["FAIL"] * 3 + ["PASS"] * 3
+
+    # Reports are written by the workers, with the location of the errors.
+    summary = batch.BatchValidator(
+        context, config, validator_config={"error_report": True}
+    ).run(files[1:2])
+    report_path = tmp_path / "id-invalid-0.csv-invalid-0.csv.errors.jsonl.gz"
+    with gzip.open(report_path, "rt") as fp:
+        errors = [json.loads(line) for line in fp]
+    assert len(errors) == summary["files"][0]["n_errors"]
+    assert errors[0]["flywheel_path"] == "fw://id-invalid-0.csv"
@@ -0,0 +1,181 @@
+import csv
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import flywheel
+
+from fw_gear_file_validator import cache as cache_module
+from fw_gear_file_validator import compiler, validator
+from fw_gear_file_validator.cache import (
+    ContainerCache,
+    DiskContainerStore,
+    SchemaCache,
+)
+from fw_gear_file_validator.utils import FwReference
+
+ASSETS = Path(__file__).resolve().parent / "assets"
+CSV_SCHEMA = ASSETS / "test_schema_csv.json"
+
+
+def load_rows(csv_name):
+    with open(ASSETS / csv_name) as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def test_lookup_miss_then_hit(tmp_path):
+    cache = SchemaCache(tmp_path)
+    key, entry = cache.lookup(b"{}")
+    assert entry == {}
+    cache.store(key, {"schema": {}})
+    assert cache.lookup(b"{}") == (key, {"schema": {}})
+    # The parsed schema is only kept in memory.
+    assert not (tmp_path / f"{key}.json").exists()
+
+    cache.store(key, {"schema": {}, "row_plan": None})
+    assert (tmp_path / f"{key}.json").exists()
+
+    # A new cache only has the files to go on.
+    assert SchemaCache(tmp_path).lookup(b"{}") == (key, {"row_plan": None})
+
+
+def test_cache_version_is_part_of_the_key(tmp_path, monkeypatch):
+    cache = SchemaCache(tmp_path)
+    key, _ = cache.lookup(b"{}")
+    cache.store(key, {"row_plan": None})
+
+    # Entries written by an older version of the cache aren't used.
+    monkeypatch.setattr(cache_module, "CACHE_VERSION", cache_module.CACHE_VERSION + 1)
+    new_key, entry = SchemaCache(tmp_path).lookup(b"{}")
+    assert new_key != key
+    assert entry == {}
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = SchemaCache(tmp_path)
+    (tmp_path / f"{cache.key(b'{}')}.json").write_text("{not json")
+    _, entry = cache.lookup(b"{}")
+    assert entry == {}
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = SchemaCache(tmp_path)
+    keys = []
+    for i in range(3):
+        key, _ = cache.lookup(str(i).encode())
+        cache.store(key, {"column_types": {"padding": "x" * 100}})
+        os.utime(tmp_path / f"{key}.json", (i, i))
+        keys.append(key)
+    size = (tmp_path / f"{keys[0]}.json").stat().st_size
+
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == sorted(keys[1:])
+
+
+def test_csv_validator_reuses_cached_artifacts(tmp_path):
+    cache = SchemaCache(tmp_path)
+    first = validator.CsvValidator(CSV_SCHEMA, cache=cache)
+    column_types = first.get_column_dtypes()
+    rows = load_rows("test_input_invalid.csv")
+    expected = first.validate(rows)
+
+    # A fresh process (and cache) should load everything from the cache file.
+    with (
+        patch.object(compiler, "analyze_schema") as analyze,
+        patch.object(validator.CsvValidator, "resolve_ref") as resolve,
+    ):
+        second = validator.CsvValidator(CSV_SCHEMA, cache=SchemaCache(tmp_path))
+        assert second.get_column_dtypes() == column_types
+        assert second.validate(rows) == expected
+    analyze.assert_not_called()
+    resolve.assert_not_called()
+    assert second.validator.schema == json.loads(CSV_SCHEMA.read_text())
+
+
+def test_schema_change_is_a_miss(tmp_path):
+    cache = SchemaCache(tmp_path / "cache")
+    validator.CsvValidator(CSV_SCHEMA, cache=cache)
+    schema = json.loads(CSV_SCHEMA.read_text())
+    schema["properties"]["extra"] = {"type": "integer"}
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(json.dumps(schema))
+
+    csv_validator = validator.CsvValidator(schema_path, cache=cache)
+    assert csv_validator.get_column_dtypes()["extra"] is int
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 2
+
+
+def test_container_cache_hit_and_expiry():
+    container_cache = ContainerCache()
+    fetch = MagicMock(return_value={"id": "ses", "modified": "t1"})
+    assert container_cache.get("session", "ses", fetch) == fetch.return_value
+    assert container_cache.get("session", "ses", fetch) == fetch.return_value
+    assert fetch.call_count == 1
+
+    container_cache.ttl = 0
+    container_cache.get("session", "ses", fetch)
+    assert fetch.call_count == 2
+
+
+def test_container_cache_invalidated_when_modified():
+    container_cache = ContainerCache()
+    fetch = MagicMock(return_value={"id": "ses", "modified": "t1"})
+    container_cache.get("session", "ses", fetch)
+
+    container_cache.observe("session", {"id": "ses", "modified": "t1"})
+    container_cache.get("session", "ses", fetch)
+    assert fetch.call_count == 1
+
+    container_cache.observe("session", {"id": "ses", "modified": "t2"})
+    container_cache.get("session", "ses", fetch)
+    assert fetch.call_count == 2
+
+
+def test_disk_container_store(tmp_path):
+    modified = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    session = flywheel.Session(
+        id="ses", label="ses-01", info={"a": 1}, age=40, modified=modified
+    )
+    ContainerCache(DiskContainerStore(tmp_path)).get("session", "ses", lambda: session)
+
+    # Another run finds the container on disk.
+    container_cache = ContainerCache(DiskContainerStore(tmp_path))
+    cached = container_cache.get("session", "ses", MagicMock())
+    assert type(cached) is type(session)
+    assert (cached.label, cached.info, cached.age) == ("ses-01", {"a": 1}, 40)
+
+    container_cache.observe("session", session)
+    assert (tmp_path / "session-ses.json").exists()
+    session.modified = modified.replace(year=2025)
+    container_cache.observe("session", session)
+    assert not (tmp_path / "session-ses.json").exists()
+
+
+def test_disk_container_store_evicts(tmp_path):
+    store = DiskContainerStore(tmp_path, max_entries=2)
+    for i in range(3):
+        store.set(f"key{i}", {"stored_at": 0, "modified": None, "container": {}})
+        os.utime(tmp_path / f"key{i}.json", (i, i))
+    store.evict()
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == ["key1", "key2"]
+
+
+def test_references_share_parent_containers():
+    client = MagicMock()
+    container_cache = ContainerCache()
+    parents = {"project": "prj", "session": "ses"}
+    for file_id in ("file1", "file2"):
+        ref = FwReference(
+            id=file_id,
+            type="file",
+            parents=parents,
+            _client=client,
+            container_cache=container_cache,
+        )
+        _ = ref.hierarchy_objects
+    assert client.get_project.call_count == 1
+    assert client.get_session.call_count == 1
+    assert client.get_file.call_count == 2
@@ -1,3 +1,7 @@
+import math
+
+import pytest
+
 from fw_gear_file_validator import utils
 
 JSON_TYPES = {"string": str, "number": float, "integer": int, "boolean": bool}
@@ -15,3 +19,20 @@ def test_cast_one_invalid():
     value = "123.456"
     new_value = utils.cast_csv_val(value, cast_type)
     assert new_value == value
+
+
+@pytest.mark.parametrize("cast_type", [str, int, float, bool])
+@pytest.mark.parametrize(
+    "value",
+    ["123", " 12 ", "-7", "1_000", "12.3", "1e5", ".5", "5.", "inf", "-Infinity"]
+    + ["nan", "any string", "", "12a", "0x10", 6, 6.5, True],
+)
+def test_make_csv_caster_matches_cast_csv_val(cast_type, value):
+    caster = utils.make_csv_caster(cast_type)
+    expected = utils.cast_csv_val(value, cast_type)
+    new_value = caster(value)
+    assert type(new_value) is type(expected)
+    if isinstance(expected, float) and math.isnan(expected):
+        assert math.isnan(new_value)
+    else:
+        assert new_value == expected
@@ -0,0 +1,22 @@
+import json
+from pathlib import Path
+
+from fw_gear_file_validator import cli
+
+ASSETS = Path(__file__).resolve().parent / "assets"
+
+
+def test_main(capsys):
+    schema = str(ASSETS / "test_schema_csv.json")
+    assert cli.main([schema, str(ASSETS / "test_input_valid.csv")]) == 0
+
+    invalid = str(ASSETS / "test_input_invalid.csv")
+    capsys.readouterr()
+    assert cli.main([schema, invalid, "--summary", "--error-limit", "5"]) == 1
+    result = json.loads(capsys.readouterr().out)
+    assert result == {"path": invalid, "n_errors": 1, "state": "FAIL"}
+
+
+def test_main_without_files(tmp_path):
+    schema = str(ASSETS / "test_schema_csv.json")
+    assert cli.main([schema, str(tmp_path / "*.csv")]) == 1
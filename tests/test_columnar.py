@@ -0,0 +1,77 @@
+import random
+from unittest.mock import patch
+
+import pytest
+
+from fw_gear_file_validator import columnar, validator
+
+pytest.importorskip("numpy")
+
+SCHEMA = {
+    "type": "object",
+    "required": ["id", "num"],
+    "definitions": {"num": {"type": "number", "minimum": 0, "maximum": 5}},
+    "properties": {
+        "id": {"type": "string", "pattern": "^NACC[0-9]+$", "maxLength": 10},
+        "num": {"$ref": "#/definitions/num"},
+        "int": {"type": "integer", "exclusiveMinimum": 0, "enum": [1, 2, 3, 99]},
+        "code": {"type": "string", "enum": ["a", "b"], "minLength": 1},
+        "score": {"type": "number", "exclusiveMaximum": 100.5},
+    },
+}
+
+CELLS = {
+    "id": ["NACC1", "NACC123456789", "X1", "", "NACC22"],
+    "num": ["0", "5", "5.0", "-1", "6", "", "abc", "1e0", "+2", "2.", ".5"],
+    "int": ["1", "2", "99", "0", "4", "", "1.5", "x", " 3", "-1", "1_0"],
+    "code": ["a", "b", "c", "", "aa"],
+    "score": ["100.5", "100.4", "-100", "", "inf", "nan", "1_000"],
+}
+
+
+# Values NumPy can parse, so every column is checked as a whole.
+PLAIN_CELLS = {
+    "id": ["NACC1", "NACC123456789", "X1", "NACC22"],
+    "num": ["0", "5", "5.0", "-1", "6", "", "+2", "2.", ".5"],
+    "int": ["1", "2", "99", "0", "4", "", "-1", "007"],
+    "code": ["a", "b", "c", "", "aa"],
+    "score": ["100.5", "100.4", "-100", ""],
+}
+
+
+def make_rows(n, cells, seed=0):
+    rng = random.Random(seed)
+    return [{col: rng.choice(vals) for col, vals in cells.items()} for _ in range(n)]
+
+
+@pytest.mark.parametrize("cells", [CELLS, PLAIN_CELLS])
+@pytest.mark.parametrize("drop_empty", [True, False])
+def test_columnar_matches_row_engine(cells, drop_empty):
+    rows = make_rows(500, cells)
+    row_validator = validator.CsvValidator(SCHEMA)
+    columnar_validator = validator.CsvValidator(SCHEMA, engine="columnar")
+    assert columnar_validator.engine == "columnar"
+    with patch.object(columnar, "CHUNK_SIZE", 64):
+        assert columnar_validator.validate(rows, drop_empty) == row_validator.validate(
+            rows, drop_empty
+        )
+
+
+def test_columnar_valid_file():
+    rows = [{"id": "NACC1", "num": "1", "int": "2", "code": "a", "score": "1"}] * 10
+    valid, errors = validator.CsvValidator(SCHEMA, engine="columnar").validate(rows)
+    assert valid
+    assert errors == []
+
+
+def test_columnar_falls_back_for_unsupported_schema():
+    schema = {**SCHEMA, "allOf": [{"required": ["int"]}]}
+    assert validator.CsvValidator(schema, engine="columnar").engine == "row"
+
+    schema = {"properties": {"a": {"anyOf": [{"type": "string"}]}}}
+    assert validator.CsvValidator(schema, engine="columnar").engine == "row"
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        validator.CsvValidator(SCHEMA, engine="other")
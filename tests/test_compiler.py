@@ -0,0 +1,75 @@
+import itertools
+
+import jsonschema
+import pytest
+
+from fw_gear_file_validator import compiler, validator
+
+SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema",
+    "title": "test",
+    "type": "object",
+    "required": ["str", "num"],
+    "definitions": {"num": {"type": "number", "minimum": 0, "maximum": 5}},
+    "properties": {
+        "str": {"type": "string", "maxLength": 3, "minLength": 1, "title": "a str"},
+        "num": {"$ref": "#/definitions/num"},
+        "int": {"type": "integer", "exclusiveMinimum": 0, "exclusiveMaximum": 10},
+        "enum": {"enum": ["a", "b", 1, None]},
+        "const": {"const": "x"},
+        "pattern": {"type": "string", "pattern": "^[A-Z]{2}[0-9]+$"},
+        "anyof": {"anyOf": [{"type": "integer"}, {"enum": ["NA"]}]},
+        "multi": {"type": ["string", "null"], "format": "date"},
+    },
+}
+
+VALUES = ["", "a", "abcd", "AB12", "x", "NA", 0, 1, 2.5, 5.0, 6, -1, 10, True, None]
+
+
+def make_rows():
+    columns = list(SCHEMA["properties"])
+    for i, values in enumerate(itertools.product(VALUES, repeat=2)):
+        for j, column in enumerate(columns):
+            row = {c: VALUES[(i + k) % len(VALUES)] for k, c in enumerate(columns)}
+            row[column], row[columns[(j + 1) % len(columns)]] = values
+            if i % 7 == 0:
+                row.pop("num")
+            yield row
+
+
+def test_analyze_schema():
+    v = jsonschema.Draft7Validator(SCHEMA)
+    plan = compiler.analyze_schema(v, lambda ref: v.resolver.resolve(ref)[1])
+    assert plan["required"] == ["str", "num"]
+    assert plan["columns"]["num"] == [
+        ["type", "number"],
+        ["minimum", 0],
+        ["maximum", 5],
+    ]
+    assert plan["columns"]["anyof"] is None
+    assert plan["columns"]["multi"] == [["type", ["string", "null"]]]
+
+
+@pytest.mark.parametrize("keyword", ["allOf", "if", "additionalProperties", "$ref"])
+def test_analyze_unsupported_schema(keyword):
+    schema = {**SCHEMA, keyword: {}}
+    v = jsonschema.Draft7Validator(schema)
+    assert compiler.analyze_schema(v, lambda ref: {}) is None
+
+
+def test_compiled_errors_match_jsonschema():
+    cvalidator = validator.CsvValidator(SCHEMA)
+    assert cvalidator.row_validator is not None
+    for row in make_rows():
+        compiled = cvalidator.handle_errors(cvalidator.row_validator.iter_errors(row))
+        generic = cvalidator.handle_errors(cvalidator.validator.iter_errors(row))
+        assert compiled == generic
+
+
+def test_csv_validator_falls_back_for_unsupported_schema():
+    schema = {**SCHEMA, "allOf": [{"required": ["int"]}]}
+    cvalidator = validator.CsvValidator(schema)
+    assert cvalidator.row_validator is None
+    valid, errors = cvalidator.process_item({"str": "a", "num": 1})
+    assert not valid
+    assert errors[0]["code"] == "required"
@@ -1,7 +1,9 @@
+import pickle
 from pathlib import Path
 from unittest.mock import MagicMock
 
 import flywheel
+import pytest
 
 from fw_gear_file_validator import errors, utils
 
@@ -31,6 +33,18 @@ def test_save_errors_metadata():
         file_name, "validation", state="FAIL", data=error_dict
     )
 
+    profile = {"stages": []}
+    errors.save_errors_metadata([], fw_ref, context, profile=profile)
+    context.metadata.add_qc_result.assert_called_with(
+        file_name, "validation", state="PASS", profile=profile
+    )
+
+    summary = {"report": "errors.jsonl.gz", "n_errors": 2, "codes": {"type": 2}}
+    errors.save_errors_metadata([], fw_ref, context, error_report=summary)
+    context.metadata.add_qc_result.assert_called_with(
+        file_name, "validation", state="FAIL", error_report=summary
+    )
+
 
 def test_validator_error_to_standard():
     from fw_gear_file_validator import validator
@@ -58,3 +72,59 @@ def test_validator_error_to_standard():
     standard_error = errors.validator_error_to_standard(test_errors[0])
     assert standard_error["location"] == {"key_path": "conditional_key1"}
     assert standard_error["code"] == "required"
+
+
+def file_error_dict(schema_error):
+    return errors.FileError(
+        type="error",
+        code=str(schema_error.validator),
+        location=schema_error.schema_path,
+        value=str(schema_error.instance),
+        expected=str(schema_error.schema),
+        message=schema_error.message,
+        timestamp=errors.TIMESTAMP,
+    ).model_dump()
+
+
+def test_error_record_matches_file_error():
+    from fw_gear_file_validator import validator
+
+    test_validator = validator.JsonValidator(test_allOf)
+    instances = [
+        {"required_key1": 1, "required_key2": "x"},
+        {"required_key1": "aser", "required_key2": 2},
+        {},
+        [],
+    ]
+    schema_errors = [
+        e for d in instances for e in test_validator.validator.iter_errors(d)
+    ]
+    schema_errors.append(errors.make_empty_file_error())
+    assert len(schema_errors) > 4
+
+    for schema_error in schema_errors:
+        record = errors.validator_error_to_standard(schema_error)
+        expected = file_error_dict(schema_error)
+        assert record == expected
+        assert record.to_dict() == expected
+        assert list(record) == list(expected)
+
+
+def test_error_record_shares_strings_and_pickles():
+    from fw_gear_file_validator import validator
+
+    test_validator = validator.JsonValidator({"items": {"type": "integer"}})
+    first, second = (
+        errors.validator_error_to_standard(e)
+        for e in test_validator.validator.iter_errors(["a", "b"])
+    )
+    assert first["expected"] is second["expected"]
+    assert first["location"]["key_path"] is second["location"]["key_path"]
+
+    first["flywheel_path"] = "fw://group/project"
+    assert first["flywheel_path"] == "fw://group/project"
+    assert len(first) == len(errors.ErrorRecord.FIELDS) + 1
+    assert pickle.loads(pickle.dumps(first)) == first
+    assert errors.to_dicts([first, {"a": 1}]) == [dict(first), {"a": 1}]
+    with pytest.raises(KeyError):
+        second["flywheel_path"]
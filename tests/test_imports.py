@@ -0,0 +1,52 @@
+"""Module to test the import time of the package."""
+
+import json
+import subprocess
+import sys
+
+from fw_gear_file_validator import errors
+
+# Modules that validating file contents must not import.
+HEAVY_MODULES = ["flywheel", "flywheel_gear_toolkit", "pydantic", "numpy"]
+# Seconds to import the validation modules, in a fresh interpreter.  They take
+# about 0.2 s; the flywheel SDK alone takes more than 0.4 s.
+IMPORT_BUDGET = 0.5
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+
+start = time.perf_counter()
+import fw_gear_file_validator.loader
+import fw_gear_file_validator.report
+import fw_gear_file_validator.validator
+elapsed = time.perf_counter() - start
+heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_imports():
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(result.stdout)
+
+
+def test_validation_imports_are_light():
+    measured = measure_imports()
+    assert measured["heavy"] == []
+    # The first run also compiles the modules' bytecode; keep the fastest of a few.
+    elapsed = min(
+        [measured["elapsed"]] + [measure_imports()["elapsed"] for _ in range(2)]
+    )
+    assert elapsed < IMPORT_BUDGET
+
+
+def test_file_error_is_imported_on_use():
+    file_error = errors.FileError(
+        type="error", code="type", location=["a", "b"], message="wrong type"
+    )
+    assert file_error.location == {"key_path": "a"}
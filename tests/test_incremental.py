@@ -0,0 +1,110 @@
+"""Module to test incremental.py"""
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fw_gear_file_validator import incremental, validator
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"id": {"type": "integer"}, "score": {"type": "number"}},
+    "required": ["id"],
+}
+
+
+def make_rows(n_rows):
+    return [
+        {"id": str(i), "score": "x" if i % 10 == 0 else "1.5"} for i in range(n_rows)
+    ]
+
+
+def validate(csv_validator, rows, row_store, fw_ref):
+    row_index = row_store.open(fw_ref, csv_validator)
+    with patch.object(
+        csv_validator, "process_item", wraps=csv_validator.process_item
+    ) as process_item:
+        result = csv_validator.validate(rows, row_index=row_index)
+    row_store.save(row_index)
+    return result, process_item.call_count
+
+
+def test_revalidation_only_validates_changed_rows(tmp_path):
+    csv_validator = validator.CsvValidator(SCHEMA)
+    row_store = incremental.RowIndexStore(tmp_path)
+    fw_ref = SimpleNamespace(parent_type="session", parent_id="abc", name="a.csv")
+    rows = make_rows(100)
+
+    (valid, errors), validated = validate(csv_validator, rows, row_store, fw_ref)
+    assert not valid
+    assert validated == 100
+    assert errors == csv_validator.validate(rows)[1]
+
+    # Fix a row, break another, and move the first row to the end.
+    rows[10] = {"id": "10", "score": "2"}
+    rows[11] = {"id": "eleven", "score": "2"}
+    rows.append(rows.pop(0))
+    (valid, errors), validated = validate(csv_validator, rows, row_store, fw_ref)
+    assert validated == 2
+    assert errors == csv_validator.validate(rows)[1]
+    assert errors[-1]["location"] == {"line": 100, "column_name": "score"}
+
+    # Another file, or another schema, has its own index.
+    other_ref = SimpleNamespace(parent_type="session", parent_id="abc", name="b.csv")
+    _, validated = validate(csv_validator, rows, row_store, other_ref)
+    assert validated == 100
+    other_validator = validator.CsvValidator({**SCHEMA, "required": []})
+    _, validated = validate(other_validator, rows, row_store, fw_ref)
+    assert validated == 100
+
+
+def test_revalidation_with_other_columns(tmp_path):
+    csv_validator = validator.CsvValidator(SCHEMA)
+    row_store = incremental.RowIndexStore(tmp_path)
+    fw_ref = SimpleNamespace(parent_type="session", parent_id="abc", name="a.csv")
+    validate(csv_validator, make_rows(10), row_store, fw_ref)
+
+    swapped = [{"score": row["id"], "id": row["score"]} for row in make_rows(10)]
+    (_, errors), validated = validate(csv_validator, swapped, row_store, fw_ref)
+    assert validated == 10
+    assert errors == csv_validator.validate(swapped)[1]
+
+
+def test_row_index_round_trip():
+    row_index = incremental.RowIndex(key="key")
+    row_index.start([["id"], True])
+    valid_row = incremental.fingerprint({"id": "1"})
+    bad_row = incremental.fingerprint({"id": "x"})
+    error = {"code": "type", "location": {"line": 3, "column_name": "id"}}
+    row_index.add(valid_row, [])
+    row_index.add(bad_row, [error])
+
+    loaded = incremental.RowIndex.from_dict(row_index.to_dict())
+    assert loaded.valid == {valid_row}
+    assert loaded.errors == {
+        bad_row: [{"code": "type", "location": {"column_name": "id"}}]
+    }
+
+    reloaded = incremental.RowIndex(previous=loaded)
+    reloaded.start([["id"], True])
+    assert reloaded.lookup(valid_row) == []
+    assert incremental.place_errors(reloaded.lookup(bad_row), 6) == [
+        {"code": "type", "location": {"line": 7, "column_name": "id"}}
+    ]
+    assert reloaded.lookup(incremental.fingerprint({"id": "2"})) is None
+    assert reloaded.reused == 2
+
+
+def test_row_index_store_ignores_unreadable_files(tmp_path):
+    row_store = incremental.RowIndexStore(tmp_path)
+    (tmp_path / "key.json").write_text("{not json")
+    assert row_store.get("key") is None
+    row_store.save(incremental.RowIndex(key="empty"))
+    assert not (tmp_path / "empty.json").exists()
+
+
+def test_row_index_store_default(tmp_path, monkeypatch):
+    monkeypatch.delenv(incremental.ROW_INDEX_DIR_ENV, raising=False)
+    assert incremental.RowIndexStore.default() is None
+
+    monkeypatch.setenv(incremental.ROW_INDEX_DIR_ENV, str(tmp_path))
+    assert incremental.RowIndexStore.default().directory == tmp_path
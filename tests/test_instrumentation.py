@@ -0,0 +1,51 @@
+import json
+
+from fw_gear_file_validator import instrumentation, validator
+from fw_gear_file_validator.instrumentation import Profiler
+from fw_gear_file_validator.loader import CsvLoader
+
+SCHEMA = {"type": "object", "properties": {"a": {"type": "integer"}}}
+
+
+def test_disabled_profiler_measures_nothing():
+    profiler = Profiler()
+    rows = iter([{"a": "1"}])
+    with profiler.stage("validate") as stage:
+        stage.rows = 1
+        assert profiler.count_rows(rows) is rows
+    assert profiler.stage("load") is profiler.stage("validate")
+    assert profiler.stages == []
+
+
+def test_profiler_records_stages(tmp_path):
+    path = tmp_path / "file.csv"
+    path.write_text("a\n1\nx\n2\n")
+    profiler = Profiler(enabled=True)
+    with profiler.stage("load"):
+        rows, _ = CsvLoader().load_object(path)
+    with profiler.stage("validate") as stage:
+        rows = profiler.count_rows(rows)
+        valid, errors = validator.CsvValidator(SCHEMA).validate(rows)
+        stage.rows = profiler.rows_read(rows)
+        stage.errors = len(errors)
+
+    assert not valid
+    # The counted rows still expose the byte offsets of the csv rows.
+    assert errors[0]["location"]["byte_offset"] == 4
+    assert [stage.name for stage in profiler.stages] == ["load", "validate"]
+    validate = profiler.stages[1].to_dict()
+    assert validate["rows"] == 3
+    assert validate["errors"] == 1
+    assert validate["wall_seconds"] > 0
+    assert "rows" not in profiler.stages[0].to_dict()
+
+    profiler.write(tmp_path / instrumentation.PROFILE_FILENAME)
+    summary = json.loads((tmp_path / instrumentation.PROFILE_FILENAME).read_text())
+    assert [stage["name"] for stage in summary["stages"]] == ["load", "validate"]
+    assert summary["total"]["peak_rss_mb"] > 0
+
+
+def test_rows_read_of_documents():
+    assert Profiler.rows_read([1, 2]) == 2
+    assert Profiler.rows_read({"a": 1}) == 1
+    assert Profiler.rows_read("text") is None
@@ -0,0 +1,59 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from fw_gear_file_validator import json_backend
+
+DOCUMENTS = [
+    b'{"a": 1, "b": [1.5, -0.0, true, null], "c": "\\u00e9\\n"}',
+    b'{"a": 1, "a": 2}',
+    b"[NaN, Infinity, -Infinity]",
+    b"[1e400, 0.1, 1E-7]",
+    b"[123456789012345678901234567890, -9223372036854775809]",
+    b'["\\ud800"]',
+    '{"café": "☃"}'.encode(),
+    b"  [ ]  ",
+    b'"text"',
+]
+
+INVALID = [b"", b"[1,]", b"[1] x", b"\xef\xbb\xbf[1]", b"{'a': 1}", b"[1"]
+
+
+@pytest.mark.parametrize("backend", list(json_backend.BACKENDS))
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_backends_match_stdlib(tmp_path, backend, document):
+    expected = json.loads(document.decode("UTF-8"))
+    path = tmp_path / "doc.json"
+    path.write_bytes(document)
+    loaded = json_backend.load_file(path, backend)
+    assert repr(loaded) == repr(expected)
+    assert repr(json_backend.loads(document, backend)) == repr(expected)
+
+
+@pytest.mark.parametrize("backend", list(json_backend.BACKENDS))
+@pytest.mark.parametrize("document", INVALID)
+def test_backends_raise_stdlib_errors(tmp_path, backend, document):
+    path = tmp_path / "doc.json"
+    path.write_bytes(document)
+    with pytest.raises(json.JSONDecodeError) as error:
+        json_backend.load_file(path, backend)
+    with pytest.raises(json.JSONDecodeError) as expected:
+        json.loads(document.decode("UTF-8"))
+    assert str(error.value) == str(expected.value)
+
+
+def test_default_backend():
+    with patch.dict("os.environ", {json_backend.BACKEND_ENV: "stdlib"}):
+        assert json_backend.default_backend() == "stdlib"
+    with patch.dict("os.environ", {json_backend.BACKEND_ENV: "other"}):
+        with pytest.raises(ValueError):
+            json_backend.default_backend()
+
+
+def test_long_digits_found_across_scan_chunks():
+    document = b"[" + b" " * 10 + b"1" * 19 + b"]"
+    for scan_size in (4, 8, 11, 1024):
+        with patch.object(json_backend, "SCAN_SIZE", scan_size):
+            assert json_backend._has_long_digits(document)
+            assert not json_backend._has_long_digits(document.replace(b"1", b"1 ", 1))
@@ -1,10 +1,22 @@
+import csv
 import io
 import json
 import tempfile
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-from fw_gear_file_validator.loader import CsvLoader, FwLoader, JsonLoader
+import flywheel
+import pytest
+
+from fw_gear_file_validator.errors import FileFormatError
+from fw_gear_file_validator.loader import (
+    PARENT_INCLUDE,
+    CsvLoader,
+    FwLoader,
+    JsonLoader,
+    project_container,
+    schema_projection,
+)
 from fw_gear_file_validator.utils import FwReference
 
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -71,6 +83,79 @@ def test_loader_init():
     client2.get_file.assert_called()
 
 
+def test_schema_projection():
+    schema = {
+        "type": "object",
+        "required": ["session"],
+        "properties": {
+            "session": {"type": "object", "properties": {"age": {"minimum": 0}}},
+            "subject": {"$ref": "#/definitions/subject"},
+            "acquisition": {"type": "object", "additionalProperties": False},
+        },
+        "definitions": {"subject": {"required": ["sex"]}},
+    }
+    assert schema_projection(schema) == {
+        "subject": {"sex"},
+        "session": {"age"},
+        "acquisition": None,
+    }
+    assert schema_projection({**schema, "allOf": [{"required": ["file"]}]}) is None
+    assert schema_projection({"required": ["file"]}) == {"file": set()}
+
+
+def test_project_container():
+    session = flywheel.Session(label="ses", age=40, info={"a": 1}, tags=["t"])
+    assert project_container(session, {"age", "info", "tags"}) == {
+        "info": {"a": 1},
+        "age": 40,
+    }
+    # The same fields as filtering the whole serialized container.
+    assert project_container(session) == {
+        k: v for k, v in session.to_dict().items() if k in PARENT_INCLUDE
+    }
+    assert project_container({"label": "ses", "id": "1"}) == {"label": "ses"}
+
+
+def test_fw_loader_fetches_referenced_levels(tmp_path):
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(
+        json.dumps(
+            {"properties": {"session": {"properties": {"age": {"maximum": 90}}}}}
+        )
+    )
+    client = MagicMock()
+    client.get_session.return_value = flywheel.Session(label="ses", age=40)
+    parents = {"project": "prj", "subject": "sub", "session": "ses"}
+    fw_ref = FwReference(
+        id="file-id", type="file", parents=parents, _client=client, contents="flywheel"
+    )
+
+    loader = FwLoader({"add_parents": True, "schema_file_path": schema_path})
+    assert loader.load_object(fw_ref.loc) == ({"session": {"age": 40}}, None)
+    client.get_session.assert_called_once_with("ses")
+    client.get_subject.assert_not_called()
+    client.get_project.assert_not_called()
+    client.get_file.assert_not_called()
+
+    # Levels already fetched aren't fetched again for the whole hierarchy.
+    assert list(fw_ref.hierarchy_objects) == ["project", "subject", "session", "file"]
+    client.get_session.assert_called_once()
+
+    # Without the parents, the file is loaded even though the schema doesn't name it.
+    file_entry = flywheel.FileEntry(name="visits.csv", size=10)
+    client.get_file.reset_mock(return_value=True)
+    client.get_file.return_value = file_entry
+    loader = FwLoader({"add_parents": False, "schema_file_path": schema_path})
+    fw_ref = FwReference(
+        id="file-id", type="file", parents=parents, _client=client, contents="flywheel"
+    )
+    assert loader.load_object(fw_ref) == (
+        {"file": project_container(file_entry)},
+        None,
+    )
+    client.get_file.assert_called_once_with("file-id")
+
+
 def test_load_empty_json():
     loader = JsonLoader()
     with tempfile.NamedTemporaryFile() as fp:
@@ -157,3 +242,46 @@ def test_validate_file_header_duplicate():
     mock_file = io.StringIO("header1,header2,header2\n")
     result = CsvLoader.validate_file_header(mock_file)
     assert result is not None
+
+
+def test_load_csv_streams_rows():
+    loader = CsvLoader()
+    csv_path = BASE_DIR / "assets" / "test_input_valid.csv"
+    rows, errors = loader.load_object(csv_path)
+    assert errors is None
+    assert not isinstance(rows, list)
+    with open(csv_path) as csv_file:
+        assert list(rows) == list(csv.DictReader(csv_file))
+
+
+def test_load_csv_malformed_row_raises_from_stream():
+    loader = CsvLoader()
+    with tempfile.NamedTemporaryFile(suffix=".csv") as fp:
+        fp.write(b"header1,header2\nvalue1,value2\nvalue1\n")
+        fp.flush()
+        rows, errors = loader.load_object(Path(fp.name))
+        assert errors is None
+        assert next(rows) == {"header1": "value1", "header2": "value2"}
+        with pytest.raises(FileFormatError) as e:
+            next(rows)
+    assert "Row 2 has 1 fields while the header has 2 fields" in e.value.error.message
+
+
+def test_load_csv_duplicate_header():
+    loader = CsvLoader()
+    with tempfile.NamedTemporaryFile(suffix=".csv") as fp:
+        fp.write(b"header1,header1\nvalue1,value2\n")
+        fp.flush()
+        rows, errors = loader.load_object(Path(fp.name))
+    assert rows is None
+    assert errors[0]["code"] == "invalid-header"
+
+
+def test_load_csv_opens_file_once(tmp_path):
+    path = tmp_path / "file.csv"
+    path.write_text("header1,header2\nvalue1,value2\nvalue3,value4\n")
+    with patch("fw_gear_file_validator.mapped_csv.open", wraps=open) as m:
+        rows, errors = CsvLoader().load_object(path)
+        assert len(list(rows)) == 2
+    assert errors is None
+    m.assert_called_once()
@@ -0,0 +1,85 @@
+import csv
+
+import pytest
+
+from fw_gear_file_validator import validator
+from fw_gear_file_validator.errors import FileFormatError
+from fw_gear_file_validator.loader import CsvLoader
+from fw_gear_file_validator.mapped_csv import MappedCsv
+
+CONTENTS = {
+    "simple": b"a,b\n1,2\n3,4\n",
+    "no trailing newline": b"a,b\n1,2\n3,4",
+    "crlf": b"a,b\r\n1,2\r\n3,4\r\n",
+    "lone cr": b"a,b\r1,2\r3,4\r",
+    "quoted": b'a,b\n"x,y",2\n"say ""hi""",4\n',
+    "quoted newlines": b'a,b\n"line 1\nline 2",2\n"x\r\ny\rz",3\n5,6\n',
+    "non ascii": "a,b\nété,ü\n€,\n".encode(),
+    "blank line": b"a,b\n1,2\n\n3,4\n",
+}
+
+
+def mapped_records(path, block_size):
+    with MappedCsv(path, block_size=block_size) as source:
+        return list(source), source
+
+
+@pytest.mark.parametrize("name", CONTENTS)
+@pytest.mark.parametrize("block_size", [1, 5, None])
+def test_records_match_csv_reader(tmp_path, name, block_size):
+    path = tmp_path / "file.csv"
+    path.write_bytes(CONTENTS[name])
+    records, _ = mapped_records(path, block_size)
+    with open(path) as fp:
+        assert records == list(csv.reader(fp))
+
+
+@pytest.mark.parametrize("block_size", [1, 5, None])
+def test_byte_offsets(tmp_path, block_size):
+    content = CONTENTS["quoted newlines"] + "é,\r\n7,8".encode()
+    path = tmp_path / "file.csv"
+    path.write_bytes(content)
+    records, source = mapped_records(path, block_size)
+    starts = [0, 4, 22, 33, 37, 42]
+    assert [source.byte_offset(i) for i in range(len(records))] == starts
+    assert content[starts[2] :].startswith(b'"x')
+    assert source.byte_offset(len(records)) is None
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "file.csv"
+    path.write_bytes(b"")
+    records, source = mapped_records(path, None)
+    assert records == []
+    assert source.byte_offset(0) is None
+
+
+def test_loader_malformed_row(tmp_path):
+    path = tmp_path / "file.csv"
+    path.write_bytes(b'a,b\n"1\n2",2\n3\n')
+    rows, errors = CsvLoader().load_object(path)
+    assert errors is None
+    with pytest.raises(FileFormatError) as e:
+        list(rows)
+    assert "Row 2 has 1 fields while the header has 2 fields" in e.value.error.message
+
+
+def test_loader_missing_file(tmp_path):
+    rows, errors = CsvLoader().load_object(tmp_path / "missing.csv")
+    assert rows is None
+    assert errors[0]["code"] == "malformed-file"
+
+
+def test_errors_have_byte_offsets(tmp_path):
+    schema = {
+        "type": "object",
+        "properties": {"a": {"type": "integer"}, "b": {"type": "string"}},
+    }
+    path = tmp_path / "file.csv"
+    path.write_bytes(b'a,b\n1,"x\ny"\nnope,z\n2,w\n')
+    rows, _ = CsvLoader().load_object(path)
+    valid, errors = validator.CsvValidator(schema).validate(rows)
+    assert not valid
+    assert [e["location"] for e in errors] == [
+        {"line": 2, "column_name": "a", "byte_offset": 12}
+    ]
@@ -0,0 +1,83 @@
+from unittest.mock import MagicMock
+
+import flywheel
+
+from fw_gear_file_validator import metadata
+from fw_gear_file_validator.utils import add_tags_metadata
+
+INPUT_FILE = {
+    "hierarchy": {"type": "session", "id": "ses"},
+    "location": {"name": "a.csv", "path": "/flywheel/v0/input/input_file/a.csv"},
+    "object": {"file_id": "abc", "tags": ["raw", "file-validator-FAIL"], "info": {}},
+}
+
+
+def make_context():
+    context = MagicMock()
+    context.get_input.return_value = INPUT_FILE
+    context.metadata.add_gear_info.side_effect = lambda _, file_obj, **qc: {
+        **file_obj.info,
+        "qc": qc,
+    }
+    return context
+
+
+def test_input_file_updates_are_written_together():
+    context = make_context()
+    writer = metadata.MetadataWriter(context, context.get_input("input_file"))
+    writer.add_qc_result("validation", state="PASS")
+    add_tags_metadata(context, None, True, "file-validator", writer=writer)
+    context.metadata.update_file_metadata.assert_not_called()
+
+    writer.flush()
+    context.metadata.update_file_metadata.assert_called_once_with(
+        INPUT_FILE,
+        container_type="session",
+        info={"qc": {"validation": {"state": "PASS"}}},
+        tags=["raw", "file-validator-PASS"],
+    )
+    # The tags come from the input object, the file isn't fetched.
+    context.client.get_file.assert_not_called()
+
+    # Tags that don't change aren't written.
+    context.metadata.update_file_metadata.reset_mock()
+    add_tags_metadata(context, None, True, "file-validator", writer=writer)
+    writer.flush()
+    context.metadata.update_file_metadata.assert_not_called()
+
+
+def test_sdk_file_updates():
+    context = make_context()
+    file_entry = flywheel.FileEntry(
+        name="b.csv",
+        file_id="def",
+        tags=["file-validator-PASS"],
+        info={},
+        parent_ref={"type": "acquisition", "id": "acq"},
+        parents={"acquisition": "acq"},
+    )
+    add_tags_metadata(context, None, True, "file-validator", file_entry=file_entry)
+    context.client.set_file_tags.assert_not_called()
+
+    writer = metadata.MetadataWriter(context, file_entry)
+    writer.add_qc_result("validation", state="FAIL", data=[])
+    add_tags_metadata(context, None, False, "file-validator", writer=writer)
+    writer.flush()
+    (file_obj,) = context.metadata.modify_container_file_info.call_args.args
+    assert (file_obj.name, file_obj.parent_id) == ("b.csv", "acq")
+    assert context.metadata.modify_container_file_info.call_args.kwargs == {
+        "qc": {"validation": {"state": "FAIL", "data": []}}
+    }
+    context.client.set_file_tags.assert_called_once_with("def", ["file-validator-FAIL"])
+
+
+def test_input_file_without_tags():
+    context = make_context()
+    context.get_input.return_value = {**INPUT_FILE, "object": {"file_id": "abc"}}
+    context.client.get_file.return_value = flywheel.FileEntry(tags=["raw"])
+    add_tags_metadata(context, None, False, "file-validator")
+    context.client.get_file.assert_called_once_with("abc")
+    assert context.metadata.update_file_metadata.call_args.kwargs["tags"] == [
+        "raw",
+        "file-validator-FAIL",
+    ]
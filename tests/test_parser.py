@@ -70,6 +70,66 @@ def test_parse_config():
     assert debug is False
 
 
+def test_parse_validator_config():
+    context = MagicMock()
+    context.config = {
+        "n_workers": 4,
+        "csv_engine": "columnar",
+        "error_limit": 100,
+        "aggregate_errors": True,
+        "fail_fast": True,
+        "error_report": True,
+    }
+    assert parser.parse_validator_config(context) == {
+        "n_workers": 4,
+        "engine": "columnar",
+        "error_limit": 100,
+        "aggregate_errors": True,
+        "fail_fast": True,
+        "error_report": True,
+    }
+
+    context.config = {}
+    assert parser.parse_validator_config(context) == {
+        "n_workers": 1,
+        "engine": "row",
+        "error_limit": 0,
+        "aggregate_errors": False,
+        "fail_fast": False,
+        "error_report": False,
+    }
+
+
+def test_parse_profile_config():
+    context = MagicMock()
+    context.config = {}
+    assert parser.parse_profile_config(context) == "off"
+    context.config = {"profile": "qc"}
+    assert parser.parse_profile_config(context) == "qc"
+    context.config = {"profile": "everything"}
+    with pytest.raises(ValueError):
+        parser.parse_profile_config(context)
+
+
+def test_parse_batch_config():
+    context = MagicMock()
+    context.get_input.return_value = None
+    context.get_input_path.side_effect = context_get_input_path_side_effect
+    context.config = {**CONFIG_JSON["config"], "batch_tag": "", "batch_name_filter": ""}
+    assert parser.parse_batch_config(context) is None
+
+    context.config["batch_name_filter"] = "*.csv"
+    batch_config = parser.parse_batch_config(context)
+    assert batch_config["files_tag"] is None
+    assert batch_config["name_filter"] == "*.csv"
+    assert batch_config["validation_level"] == "file"
+    assert batch_config["n_workers"] == 1
+
+    context.get_input.return_value = CONFIG_JSON["inputs"]["input_file"]
+    with pytest.raises(ValueError):
+        parser.parse_batch_config(context)
+
+
 def test_identify_json_type():
     ext = ".json"
     str_ext = parser.identify_file_type(ext=ext)
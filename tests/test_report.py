@@ -0,0 +1,82 @@
+import gzip
+import json
+
+from fw_gear_file_validator import report, validator
+from fw_gear_file_validator.loader import CsvLoader
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"id": {"type": "integer"}, "score": {"type": "number"}},
+}
+
+
+def read_report(path):
+    with gzip.open(path, "rt", encoding="UTF-8") as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_csv_errors_are_streamed_to_the_report(tmp_path):
+    csv_path = tmp_path / "upload.csv"
+    csv_path.write_text("id,score\n" + "x,1\n1,y\n" * 1500)
+    csv_validator = validator.CsvValidator(SCHEMA)
+    rows, _ = CsvLoader().load_object(csv_path)
+    expected = csv_validator.validate(rows)[1]
+
+    rows, _ = CsvLoader().load_object(csv_path)
+    with report.ErrorReport(tmp_path / "errors.jsonl.gz") as error_report:
+        valid, errors = csv_validator.validate(rows, report=error_report)
+    assert not valid
+    assert errors == []
+    assert read_report(tmp_path / "errors.jsonl.gz") == [dict(e) for e in expected]
+    assert expected[1]["location"]["byte_offset"] == 13
+    assert error_report.summary() == {
+        "report": "errors.jsonl.gz",
+        "n_errors": 3000,
+        "codes": {"type": 3000},
+    }
+
+
+def test_report_with_limit_and_aggregation(tmp_path):
+    rows = [{"id": "x", "score": "1"}] * 10
+    csv_validator = validator.CsvValidator(SCHEMA, error_limit=3, aggregate=True)
+    with report.ErrorReport(tmp_path / "errors.jsonl.gz") as error_report:
+        valid, errors = csv_validator.validate(rows, report=error_report)
+    assert (valid, errors) == (False, [])
+    assert [(e["code"], e.get("count")) for e in read_report(error_report.path)] == [
+        ("type", 3),
+        ("error-limit", None),
+    ]
+
+    jvalidator = validator.JsonValidator(
+        {"type": "array", "items": {"type": "integer"}}
+    )
+    with report.ErrorReport(tmp_path / "json.jsonl.gz") as error_report:
+        assert jvalidator.validate([1, 2], report=error_report) == (True, [])
+        assert jvalidator.validate(["a", 2], report=error_report) == (False, [])
+    assert error_report.count == 1
+
+
+def test_malformed_file_replaces_the_report(tmp_path):
+    csv_path = tmp_path / "upload.csv"
+    csv_path.write_text("id,score\nx,1\n1,2,3\n")
+    rows, _ = CsvLoader().load_object(csv_path)
+    with report.ErrorReport(tmp_path / "errors.jsonl.gz") as error_report:
+        valid, _ = validator.CsvValidator(SCHEMA).validate(rows, report=error_report)
+    assert not valid
+    assert [e["code"] for e in read_report(error_report.path)] == ["malformed-file"]
+
+
+def test_report_prepares_errors(tmp_path):
+    def prepare(errors):
+        for error in errors:
+            error["flywheel_path"] = "fw://group/project"
+        return errors
+
+    with report.ErrorReport(tmp_path / "errors.jsonl.gz", prepare=prepare) as r:
+        r.write_all({"code": "type", "location": ""} for _ in range(3))
+    assert (
+        read_report(r.path)
+        == [{"code": "type", "location": "", "flywheel_path": "fw://group/project"}] * 3
+    )
+    assert report.report_filename("a.csv") == "a.csv.errors.jsonl.gz"
+    assert report.report_filename("a.csv", "123") == "123-a.csv.errors.jsonl.gz"
@@ -0,0 +1,60 @@
+import os
+import time
+
+import pytest
+
+from fw_gear_file_validator import scheduler
+
+
+def square(task):
+    if task < 0:
+        raise ValueError(f"negative task {task}")
+    return task * task
+
+
+def test_scheduler_run():
+    prepared = []
+
+    def prepare(item):
+        prepared.append(item)
+        return f"item {item}", int(item)
+
+    def finish(item, state, outcome):
+        return item, state, outcome
+
+    task_scheduler = scheduler.Scheduler(
+        n_workers=2, n_threads=2, max_pending=3, handled=(ValueError,)
+    )
+    items = ["1", "-2", "x"] + [str(i) for i in range(3, 13)]
+    results = task_scheduler.run(items, prepare, square, finish)
+
+    assert next(results) == ("1", "item 1", 1)
+    item, state, outcome = next(results)
+    assert (item, state, str(outcome)) == ("-2", "item -2", "negative task -2")
+    item, state, outcome = next(results)
+    assert (item, state, type(outcome)) == ("x", None, ValueError)
+
+    # Items are only prepared max_pending ahead of the results that are taken,
+    # however long the threads are given to run ahead.
+    for taken in range(4, len(items) + 1):
+        time.sleep(0.02)
+        assert len(prepared) <= task_scheduler.max_pending + taken - 1
+        item, _, outcome = next(results)
+        assert outcome == int(item) ** 2
+    assert len(prepared) == len(items)
+
+    workers = task_scheduler.summary()
+    # The tasks that raised, or were never prepared, aren't counted.
+    assert sum(worker["tasks"] for worker in workers) == len(items) - 2
+    assert os.getpid() not in [worker["worker"] for worker in workers]
+
+
+def test_scheduler_raises_unhandled_errors():
+    def prepare(item):
+        return item, int(item)
+
+    task_scheduler = scheduler.Scheduler(n_workers=1, n_threads=1)
+    results = task_scheduler.run(["1", "x"], prepare, square, lambda *args: args)
+    assert next(results) == ("1", "1", 1)
+    with pytest.raises(ValueError, match="invalid literal"):
+        next(results)
@@ -0,0 +1,117 @@
+import json
+import random
+from unittest.mock import patch
+
+import pytest
+
+from fw_gear_file_validator import streaming, validator
+from fw_gear_file_validator.loader import JsonLoader
+
+RECORD_SCHEMA = {
+    "type": "object",
+    "required": ["id"],
+    "properties": {
+        "id": {"type": "string", "pattern": "^NACC[0-9]+$"},
+        "age": {"type": "integer", "minimum": 0},
+        "scores": {"type": "array", "items": {"type": "number"}, "maxItems": 3},
+    },
+}
+
+ARRAY_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema",
+    "type": "array",
+    "definitions": {"record": RECORD_SCHEMA},
+    "items": {"$ref": "#/definitions/record"},
+}
+
+OBJECT_SCHEMA = {
+    "type": "object",
+    "required": ["header", "records", "footer"],
+    "properties": {
+        "header": {"type": "string", "maxLength": 5},
+        "records": {"type": "array", "items": RECORD_SCHEMA},
+        "count": {"type": "integer"},
+    },
+}
+
+VALUES = {
+    "id": ["NACC1", "X", 1, "NACC 2", "NACC99999"],
+    "age": [1, -1, 1.5, "1", None, 12345678901234567890],
+    "scores": [[], [1, 2.5], ["a"], [1, 2, 3, 4], "x"],
+    "other": [{"nested": [1, {"a": "b\\"}]}, 'quote " and \\u00e9', 1e300],
+}
+
+
+def make_records(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {key: rng.choice(vals) for key, vals in VALUES.items() if rng.random() < 0.8}
+        for _ in range(n)
+    ]
+
+
+def stream_errors(tmp_path, schema, document, chunk_size=7, indent=None):
+    path = tmp_path / "doc.json"
+    path.write_text(json.dumps(document, indent=indent))
+    json_validator = validator.JsonValidator(schema)
+    stream = streaming.JsonStream(path, chunk_size=chunk_size)
+    return json_validator.validate(stream), json_validator.validate(document)
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_stream_array_matches_whole_document(tmp_path, indent):
+    streamed, whole = stream_errors(
+        tmp_path, ARRAY_SCHEMA, make_records(200), indent=indent
+    )
+    assert not whole[0]
+    assert streamed == whole
+
+
+def test_stream_object_matches_whole_document(tmp_path):
+    document = {"records": make_records(50), "header": "too long", "count": 1.5}
+    streamed, whole = stream_errors(tmp_path, OBJECT_SCHEMA, document)
+    assert [e["code"] for e in whole[1]][:1] == ["required"]
+    assert streamed == whole
+
+
+@pytest.mark.parametrize("document", [[], {}, [1], {"a": 1}, "text", 0])
+def test_stream_small_documents(tmp_path, document):
+    streamed, whole = stream_errors(tmp_path, {"type": "array"}, document)
+    assert streamed == whole
+
+
+def test_not_streamable_schema_loads_whole_document(tmp_path):
+    schema = {**ARRAY_SCHEMA, "maxItems": 3}
+    assert not streaming.is_streamable(
+        schema, "array", validator.JsonValidator(schema).validator
+    )
+    with patch.object(streaming.JsonStream, "load", autospec=True) as load:
+        load.side_effect = lambda stream: json.loads(stream.file_path.read_text())
+        streamed, whole = stream_errors(tmp_path, schema, make_records(10))
+    load.assert_called()
+    assert streamed == whole
+
+
+@pytest.mark.parametrize("text", ["[1, 2,]", "[1 2]", '{"a" 1}', "[1] 2", "{1: 2}"])
+def test_stream_invalid_json(tmp_path, text):
+    path = tmp_path / "doc.json"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(streaming.JsonStream(path, chunk_size=2))
+
+
+def test_stream_numbers_across_chunks(tmp_path):
+    document = [123456789, -0.5e10, True, None, "x" * 20]
+    path = tmp_path / "doc.json"
+    path.write_text(json.dumps(document))
+    stream = streaming.JsonStream(path, chunk_size=3)
+    assert [item for _, item in stream] == document
+
+
+def test_json_loader_stream_config(tmp_path):
+    path = tmp_path / "doc.json"
+    path.write_text("[]")
+    stream, errors = JsonLoader({"stream_json": True}).load_object(path)
+    assert isinstance(stream, streaming.JsonStream)
+    assert errors is None
+    assert JsonLoader().load_object(path) == ([], None)
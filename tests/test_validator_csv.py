@@ -1,10 +1,12 @@
 import csv
 import json
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
-from fw_gear_file_validator import validator
+from fw_gear_file_validator import parallel, validator
+from fw_gear_file_validator.errors import FileFormatError, make_malformed_file_error
 
 # from fw_gear_{{gear_package}}.parser import parse_config
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -123,5 +125,184 @@ def test_missing_value():
         },
     }
     cvalidator = validator.CsvValidator(schema)
-    valid, errors = cvalidator.validate([{"list": "ab"}])
+    valid, _errors = cvalidator.validate([{"list": "ab"}])
     assert not valid
+
+
+def test_validate_csv_stream():
+    schema = {
+        "required": ["list", "num"],
+        "properties": {
+            "list": {"type": "string", "maxLength": 3},
+            "num": {"type": "number"},
+        },
+    }
+    cvalidator = validator.CsvValidator(schema)
+    rows = ({"list": "ab", "num": str(i)} for i in range(5))
+    valid, errors = cvalidator.validate(rows)
+    assert valid
+    assert errors == []
+
+    rows = iter([{"list": "ab", "num": "1"}, {"list": "abcd", "num": ""}])
+    valid, errors = cvalidator.validate(rows)
+    assert not valid
+    assert [e["location"] for e in errors] == [
+        {"line": 2, "column_name": "num"},
+        {"line": 2, "column_name": "list"},
+    ]
+
+
+def test_malformed_stream_csv():
+    schema = {"properties": {"list": {"type": "string"}, "num": {"type": "number"}}}
+    cvalidator = validator.CsvValidator(schema)
+
+    def rows():
+        yield {"list": "ab", "num": "1"}
+        raise FileFormatError(make_malformed_file_error())
+
+    valid, errors = cvalidator.validate(rows())
+    assert not valid
+    assert len(errors) == 1
+    assert errors[0]["code"] == "malformed-file"
+
+
+def test_compile_cast_plan():
+    schema = {
+        "properties": {
+            "text": {"type": "string"},
+            "int": {"type": "integer"},
+            "num": {"type": "number"},
+        }
+    }
+    cvalidator = validator.CsvValidator(schema)
+    plan = cvalidator.compile_cast_plan(("num", "text", "other", "int"))
+    assert [cast("12") for cast in plan] == [12.0, "12", "12", 12]
+    assert [cast("x") for cast in plan] == ["x", "x", "x", "x"]
+
+
+def test_parallel_csv_matches_serial():
+    set_csv_path("test_input_invalid.csv")
+    csv_path = CONFIG_JSON["inputs"]["input_file"]["location"]["path"]
+    schema_path = CONFIG_JSON["inputs"]["validation_schema"]["location"]["path"]
+    with open(csv_path) as csv_file:
+        csv_table = list(csv.DictReader(csv_file)) * 25
+
+    serial_validator = validator.CsvValidator(schema_path)
+    parallel_validator = validator.CsvValidator(schema_path, n_workers=2)
+    with patch.object(parallel, "CHUNK_SIZE", 7):
+        assert parallel_validator.validate(csv_table) == serial_validator.validate(
+            csv_table
+        )
+    _, errors = parallel_validator.validate(csv_table)
+    assert [e["location"]["line"] for e in errors] == list(range(2, 51, 2))
+
+
+ROW_SCHEMA = {
+    "type": "object",
+    "properties": {"id": {"type": "integer"}, "score": {"type": "number"}},
+}
+
+
+def counted_rows(n, consumed):
+    for i in range(n):
+        consumed.append(i)
+        yield {"id": "x", "score": str(i)}
+
+
+@pytest.mark.parametrize("engine", ["row", "columnar"])
+def test_error_limit_stops_early(engine):
+    csv_validator = validator.CsvValidator(ROW_SCHEMA, engine=engine, error_limit=5)
+    consumed = []
+    valid, errors = csv_validator.validate(counted_rows(100_000, consumed))
+    assert not valid
+    assert [e["code"] for e in errors] == ["type"] * 5 + ["error-limit"]
+    assert len(consumed) < 100_000
+
+
+@pytest.mark.parametrize("engine", ["row", "columnar"])
+def test_error_limit_not_reached(engine):
+    # A file with exactly error_limit errors wasn't cut short.
+    csv_validator = validator.CsvValidator(ROW_SCHEMA, engine=engine, error_limit=2)
+    rows = [{"id": "x", "score": "1"}, {"id": "y", "score": "1"}]
+    valid, errors = csv_validator.validate(rows + [{"id": "1", "score": "1"}] * 5)
+    assert not valid
+    assert [e["code"] for e in errors] == ["type", "type"]
+
+    valid, errors = csv_validator.validate(rows + [{"id": "z", "score": "1"}])
+    assert [e["code"] for e in errors] == ["type", "type", "error-limit"]
+
+
+def test_aggregate_errors():
+    csv_validator = validator.CsvValidator(ROW_SCHEMA, aggregate=True)
+    rows = [{"id": "x", "score": "1"}, {"id": "y", "score": "z"}] * 10
+    valid, errors = csv_validator.validate(rows)
+    assert not valid
+    by_column = {e["location"]["column_name"]: e for e in errors}
+    assert by_column["id"]["count"] == 20
+    assert by_column["id"]["lines"] == list(range(1, 11))
+    assert by_column["id"]["sample_values"] == ["x", "y"]
+    assert by_column["score"]["count"] == 10
+    assert by_column["score"]["lines"][:2] == [2, 4]
+
+
+def test_aggregate_errors_with_limit():
+    csv_validator = validator.CsvValidator(ROW_SCHEMA, error_limit=3, aggregate=True)
+    valid, errors = csv_validator.validate([{"id": "x", "score": "1"}] * 10)
+    assert not valid
+    assert [(e["code"], e.get("count")) for e in errors] == [
+        ("type", 3),
+        ("error-limit", None),
+    ]
+
+
+@pytest.mark.parametrize("engine", ["row", "columnar"])
+def test_fail_fast(engine):
+    csv_validator = validator.CsvValidator(ROW_SCHEMA, engine=engine)
+    consumed = []
+    valid, errors = csv_validator.validate(
+        counted_rows(100_000, consumed), fail_fast=True
+    )
+    assert not valid
+    assert len(errors) == 1
+    assert errors[0]["location"] == {"line": 1, "column_name": "id"}
+    assert len(consumed) < 100_000
+
+    consumed = []
+    valid, errors = csv_validator.validate(
+        counted_rows(100_000, consumed), max_errors=3
+    )
+    assert [e["location"]["line"] for e in errors] == [1, 2, 3]
+    assert len(consumed) < 100_000
+
+
+def test_fail_fast_keeps_error_limit():
+    csv_validator = validator.CsvValidator(ROW_SCHEMA, error_limit=2)
+    _, errors = csv_validator.validate([{"id": "x", "score": "1"}] * 10, max_errors=5)
+    assert [e["code"] for e in errors] == ["type", "type", "error-limit"]
+
+    _, errors = csv_validator.validate([{"id": "x", "score": "1"}] * 10, max_errors=1)
+    assert [e["code"] for e in errors] == ["type"]
+
+
+def test_fail_fast_screens_columns_first():
+    schema = {
+        **ROW_SCHEMA,
+        "allOf": [
+            {
+                "if": {"properties": {"score": {"const": 1}}},
+                "then": {"required": ["name"]},
+            }
+        ],
+    }
+    csv_validator = validator.CsvValidator(schema)
+    assert csv_validator.row_validator is None
+    rows = [{"id": "1", "score": "1"}, {"id": "x", "score": "2"}]
+    valid, errors = csv_validator.validate(rows, fail_fast=True)
+    assert not valid
+    assert [(e["code"], e["location"]["line"]) for e in errors] == [("required", 1)]
+
+    valid, errors = csv_validator.validate(rows[1:], fail_fast=True)
+    assert [(e["code"], e["location"]["column_name"]) for e in errors] == [
+        ("type", "id")
+    ]
+    assert csv_validator.get_screen_validator() is not None
@@ -58,3 +58,32 @@ def test_empty_json():
     assert valid is False
     assert len(errors) == 1
     assert errors[0]["code"] == "empty-file"
+
+
+def test_json_error_limit():
+    schema = {"type": "array", "items": {"type": "integer"}}
+    jvalidator = validator.JsonValidator(schema, error_limit=2)
+    valid, errors = jvalidator.validate(["a", "b", "c", 1])
+    assert not valid
+    assert [e["code"] for e in errors] == ["type", "type", "error-limit"]
+
+    valid, errors = jvalidator.validate(["a", "b", 1])
+    assert not valid
+    assert [e["code"] for e in errors] == ["type", "type"]
+
+    jvalidator = validator.JsonValidator(schema, error_limit=2, aggregate=True)
+    valid, errors = jvalidator.validate(["a", "b", "c", 1])
+    assert errors[0]["count"] == 2
+    assert errors[0]["location"] == {"key_path": "items"}
+    assert errors[0]["sample_values"] == ["a", "b"]
+
+
+def test_json_fail_fast():
+    schema = {"type": "array", "items": {"type": "integer"}}
+    jvalidator = validator.JsonValidator(schema)
+    valid, errors = jvalidator.validate(["a", "b", "c", 1], fail_fast=True)
+    assert not valid
+    assert [e["code"] for e in errors] == ["type"]
+
+    valid, errors = jvalidator.validate(["a", "b", "c", 1], max_errors=2)
+    assert [e["code"] for e in errors] == ["type", "type"]